@@ -0,0 +1,85 @@
+"""
+编码配置基准
+在合成的测试图片上比较各输出格式、各编码配置的编码耗时（毫秒/百万像素）和文件大小
+
+用法：
+    python -m benchmarks.encoder_profiles
+    python -m benchmarks.encoder_profiles --count 8 --width 4000 --height 3000 --formats JPEG WEBP
+"""
+
+import argparse
+import io
+import random
+import time
+
+from PIL import Image, ImageDraw, ImageFilter
+
+from core.encoder_profiles import ENCODER_PROFILE_NAMES, EncoderProfile, encoder_options
+
+DEFAULT_FORMATS = ['JPEG', 'WEBP', 'PNG', 'TIFF']
+
+
+def make_corpus(count: int, width: int, height: int, seed: int = 0):
+    """
+    生成合成测试图片：渐变背景 + 色块 + 噪点，近似照片的高低频混合内容
+    """
+    rng = random.Random(seed)
+    corpus = []
+    for _ in range(count):
+        gradient = Image.linear_gradient('L').resize((width, height))
+        base = Image.merge('RGB', (gradient,
+                                   gradient.rotate(90).resize((width, height)),
+                                   Image.new('L', (width, height), rng.randint(0, 255))))
+        draw = ImageDraw.Draw(base)
+        for _ in range(40):
+            x0, y0 = rng.randint(0, width), rng.randint(0, height)
+            x1, y1 = x0 + rng.randint(20, width // 4), y0 + rng.randint(20, height // 4)
+            draw.ellipse((x0, y0, x1, y1), fill=tuple(rng.randint(0, 255) for _ in range(3)))
+        base = base.filter(ImageFilter.GaussianBlur(2))
+        noise = Image.effect_noise((width, height), 24).convert('RGB')
+        corpus.append(Image.blend(base, noise, 0.15))
+    return corpus
+
+
+def bench(corpus, image_format: str, profile: EncoderProfile, quality: int, repeat: int):
+    """返回 (毫秒/百万像素, 平均字节数)"""
+    options = encoder_options(image_format, quality, profile)
+    megapixels = sum(img.width * img.height for img in corpus) / 1e6
+    best = None
+    total_bytes = 0
+    for _ in range(repeat):
+        total_bytes = 0
+        start = time.perf_counter()
+        for img in corpus:
+            buffer = io.BytesIO()
+            img.save(buffer, format=image_format, **options)
+            total_bytes += buffer.tell()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best * 1000 / megapixels, total_bytes / len(corpus)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="编码配置基准")
+    parser.add_argument('--count', type=int, default=4, help="测试图片数量")
+    parser.add_argument('--width', type=int, default=3000)
+    parser.add_argument('--height', type=int, default=2000)
+    parser.add_argument('--quality', type=int, default=95, help="有损格式的质量")
+    parser.add_argument('--repeat', type=int, default=3, help="重复次数，取最快的一次")
+    parser.add_argument('--formats', nargs='+', default=DEFAULT_FORMATS, choices=DEFAULT_FORMATS)
+    args = parser.parse_args(argv)
+
+    corpus = make_corpus(args.count, args.width, args.height)
+    print(f"测试图片: {args.count} 张 {args.width}x{args.height}, 质量 {args.quality}")
+    print(f"{'格式':<6}{'配置':<10}{'ms/MP':>10}{'平均大小(KB)':>16}{'相对大小':>10}")
+    for image_format in args.formats:
+        baseline = None
+        for profile in EncoderProfile:
+            ms_per_mp, avg_bytes = bench(corpus, image_format, profile, args.quality, args.repeat)
+            baseline = baseline or avg_bytes
+            print(f"{image_format:<6}{ENCODER_PROFILE_NAMES[profile]:<10}{ms_per_mp:>10.1f}"
+                  f"{avg_bytes / 1024:>16.1f}{avg_bytes / baseline:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
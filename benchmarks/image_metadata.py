@@ -0,0 +1,95 @@
+"""
+图片元数据内存基准
+用合成的 exiftool 输出比较两种表示占用的内存：
+    旧：每张图片保存完整EXIF字典 + 参数字典 + 普通对象属性（与 ImageContainer 相同，不含图片对象）
+    新：ImageMetadata（__slots__，字符串驻留，不保存EXIF字典）
+实际的 ImageContainer 还持有打开的 PIL 图片，旧表示的真实占用更高
+
+用法：
+    python -m benchmarks.image_metadata
+    python -m benchmarks.image_metadata --count 100000 --tags 300
+"""
+
+import argparse
+import random
+import tracemalloc
+from pathlib import Path
+
+from core.image_metadata import ImageMetadata, get_datetime, get_focal_length, parse_geo_info
+
+MAKES = ['FUJIFILM', 'SONY', 'Canon', 'NIKON CORPORATION']
+MODELS = ['X-T5', 'ILCE-7M4', 'EOS R5', 'Z 8']
+LENSES = ['XF23mmF1.4 R', 'FE 24-70mm F2.8 GM II', 'RF24-105mm F4 L IS USM', 'NIKKOR Z 50mm f/1.8 S']
+
+
+def make_exif(rng: random.Random, tags: int) -> dict:
+    """
+    合成一张图片的 exiftool 输出：每次解析输出都会生成新的字符串对象，这里同样逐个拼接
+    """
+    index = rng.randrange(len(MAKES))
+    exif = {
+        'Make': ''.join(MAKES[index]),
+        'CameraModelName': ''.join(MODELS[index]),
+        'LensModel': ''.join(LENSES[index]),
+        'FocalLength': f"{rng.choice([23, 35, 50, 85])}.0 mm (35 mm equivalent: 35.0 mm)",
+        'FNumber': str(rng.choice([1.4, 2.0, 2.8, 4.0])),
+        'ExposureTime': f"1/{rng.choice([60, 125, 250, 500])}",
+        'ISO': str(rng.choice([100, 400, 1600, 6400])),
+        'CreateDate': f"2024-0{rng.randint(1, 9)}-1{rng.randint(0, 9)} 1{rng.randint(0, 9)}:30:00",
+        'Orientation': 'Horizontal (normal)',
+    }
+    for i in range(tags - len(exif)):
+        exif[f"Tag{i:03d}Name"] = f"value {rng.randrange(1 << 30)}"
+    return exif
+
+
+class _DictRecord:
+    """旧表示：普通对象 + 完整EXIF字典 + 参数字典"""
+
+    def __init__(self, path: Path, exif: dict):
+        self.path = path
+        self.name = path.name
+        self.exif = exif
+        self.make = exif.get('Make', '')
+        self.model = exif.get('CameraModelName', '')
+        self.lens_model = exif.get('LensModel', '')
+        self.date = get_datetime(exif)
+        self.focal_length, self.focal_length_in_35mm_film = get_focal_length(exif)
+        self.f_number = exif.get('FNumber', '')
+        self.exposure_time = exif.get('ExposureTime', '') + 's'
+        self.iso = exif.get('ISO', '')
+        self.original_width, self.original_height = 6240, 4160
+        self._param_dict = {
+            'Model': self.model, 'Make': self.make, 'LensModel': self.lens_model,
+            'Datetime': self.date.strftime('%Y-%m-%d %H:%M'), 'Date': self.date.strftime('%Y-%m-%d'),
+            'Filename': path.stem, 'GeoInfo': parse_geo_info(exif),
+            'CameraMake_CameraModel': f"{self.make} {self.model}",
+        }
+
+
+def measure(label: str, build, count: int, tags: int) -> int:
+    rng = random.Random(0)
+    tracemalloc.start()
+    records = [build(Path(f"/photos/DSCF{i:05d}.JPG"), make_exif(rng, tags)) for i in range(count)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"  {label:<24}{current / 1024 / 1024:>10.1f} MB  ({current / count:,.0f} B/张)")
+    del records
+    return current
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="图片元数据内存占用基准")
+    arg_parser.add_argument('--count', type=int, default=20_000, help="图片数量")
+    arg_parser.add_argument('--tags', type=int, default=200, help="每张图片的EXIF条目数量")
+    args = arg_parser.parse_args()
+
+    print(f"{args.count} 张图片，每张 {args.tags} 个EXIF条目:")
+    old = measure("完整EXIF字典", _DictRecord, args.count, args.tags)
+    new = measure("ImageMetadata", lambda path, exif: ImageMetadata.from_exif(path, exif, 6240, 4160),
+                  args.count, args.tags)
+    print(f"  内存减少 {(1 - new / old) * 100:.1f}%")
+
+
+if __name__ == '__main__':
+    main()
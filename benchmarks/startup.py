@@ -0,0 +1,79 @@
+"""
+启动时间基准
+每次测量都在新的Python进程中运行，避免模块缓存影响，输出多次运行的中位数：
+    import core.init          导入配置和Processor模块
+    首个Processor             从注册表创建第一个Processor并组成处理链
+    import gui.main_window    导入主窗口及其依赖（PyQt5）
+    显示主窗口                创建 QApplication 和 MainWindow 并显示（offscreen，不进入事件循环）
+
+用法：
+    python -m benchmarks.startup
+    python -m benchmarks.startup --runs 10
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+
+# 在子进程中执行，打印各阶段的累计耗时（秒），每行 "名称 耗时"
+_PROBE = r'''
+import time
+t0 = time.perf_counter()
+import core.init
+t1 = time.perf_counter()
+core.init.get_registry().build_chain(['simple'])
+t2 = time.perf_counter()
+print("import core.init", t1 - t0)
+print("首个Processor", t2 - t1)
+if {gui}:
+    import gui.main_window
+    t3 = time.perf_counter()
+    from PyQt5.QtWidgets import QApplication
+    app = QApplication([])
+    window = gui.main_window.MainWindow()
+    window.show()
+    app.processEvents()
+    t4 = time.perf_counter()
+    print("import gui.main_window", t3 - t2)
+    print("显示主窗口", t4 - t3)
+    print("合计", t4 - t0)
+else:
+    print("合计", t2 - t0)
+'''
+
+
+def run_once(gui: bool) -> dict:
+    env = dict(os.environ)
+    env.setdefault('QT_QPA_PLATFORM', 'offscreen')
+    output = subprocess.run([sys.executable, '-c', _PROBE.format(gui=gui)],
+                            cwd=Path(__file__).resolve().parent.parent, env=env,
+                            capture_output=True, text=True, check=True).stdout
+    timings = {}
+    for line in output.splitlines():
+        name, _, value = line.rpartition(' ')
+        try:
+            timings[name] = float(value)
+        except ValueError:
+            # 应用自身的输出
+            continue
+    return timings
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="启动时间基准")
+    arg_parser.add_argument('--runs', type=int, default=5, help="运行次数")
+    arg_parser.add_argument('--no-gui', action='store_true', help="只测量核心模块，不导入PyQt5")
+    args = arg_parser.parse_args()
+
+    runs = [run_once(not args.no_gui) for _ in range(args.runs)]
+    print(f"{args.runs} 次运行的中位数:")
+    for name in runs[0]:
+        values = [run[name] for run in runs if name in run]
+        print(f"  {name:<24}{statistics.median(values) * 1000:>8.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,5 @@
+"""
+命令行工具，不依赖PyQt5，可以在没有图形界面的机器上运行：
+    python -m cli --help          批量处理
+    python -m cli.watch --help    监视文件夹，自动处理新图片
+"""
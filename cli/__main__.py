@@ -0,0 +1,7 @@
+import sys
+
+from cli.batch import main
+
+# 多进程处理时子进程会重新导入主模块，只在直接运行时执行
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,526 @@
+"""
+命令行批量处理
+与图形界面使用相同的Processor和批量处理流程（run_batch），不导入PyQt5；
+处理日志输出到标准错误，结束后把JSON格式的处理摘要写到标准输出（或 --summary 指定的文件）
+
+用法：
+    python -m cli photos/*.jpg -c watermark_left_logo,rounded_corner -o out
+    python -m cli photos/ -c chain_export.json --format png --jobs 4 --summary summary.json
+    python -m cli --list-processors
+    python -m cli photos/ -c watermark_left_logo --job-db      # 记录处理进度，中断后可以继续
+    python -m cli --resume                                      # 继续上次中断的任务
+    python -m cli @failed.txt -c watermark_left_logo           # 处理列表文件中的图片（如导出的失败列表）
+"""
+
+import argparse
+import json
+import math
+import os
+import signal
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import redirect_stdout
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from glob import glob
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+
+from config.constant import IMAGE_EXTENSIONS
+from core.batch_processor import BatchOptions, BatchResult, plan_outputs, run_batch
+from core.cancellation import CancelToken
+from core.encoder_profiles import EncoderProfile
+from core.image_processor import ProcessorChain
+from core.init import get_config, get_registry
+from core.job_store import (DEFAULT_JOB_STORE_PATH, MEMORY_STORE, ItemOutcome, ItemStatus, JobInfo, JobStore,
+                            RetryPolicy, batch_process, is_transient, outcomes_from_result, run_job)
+from core.processor_registry import BUILTIN_PROCESSORS, ProcessorRegistry, create_custom_processor
+from core.processor_store import ProcessorStore, config_from_dict
+
+# 摘要格式版本，字段有不兼容的变化时增加
+SUMMARY_VERSION = 1
+# 多进程处理时每批最多的图片数量：批次越小，负载越均衡，取消也越快
+MAX_SHARD_SIZE = 16
+
+EXIT_OK = 0
+EXIT_FAILED = 1       # 有图片处理失败或没有找到图片
+EXIT_CANCELLED = 130  # Ctrl+C
+
+
+@dataclass
+class ChainStep:
+    """处理链中的一步：内置Processor的ID，或自定义Processor的配置（字典，可以传给子进程）"""
+    processor_id: str
+    config: Optional[dict] = None
+
+    def create(self, registry: ProcessorRegistry):
+        if self.config is None:
+            return registry.get(self.processor_id)
+        return create_custom_processor(registry.config, config_from_dict(self.config))
+
+
+def _resolve_id(store: ProcessorStore, processor_id: str, exported: Optional[Dict[str, dict]] = None) -> ChainStep:
+    if exported and processor_id in exported:
+        return ChainStep(processor_id, exported[processor_id])
+    if processor_id in BUILTIN_PROCESSORS:
+        return ChainStep(processor_id)
+    processor_config = store.get(processor_id)
+    if processor_config is None:
+        raise ValueError(f"未找到Processor: {processor_id}")
+    return ChainStep(processor_id, processor_config.to_dict())
+
+
+def steps_from_data(data, store: ProcessorStore) -> List[ChainStep]:
+    """
+    从JSON数据解析处理链：ID和Processor配置组成的列表、单个Processor配置（包括组合Processor），
+    或Processor对话框"导出JSON"生成的数据
+    """
+    if isinstance(data, list):
+        return [_resolve_id(store, item) if isinstance(item, str) else ChainStep(item['id'], item)
+                for item in data]
+    if "processor_configs" in data:
+        # Processor对话框导出的文件：按 processor_order 的顺序组成处理链
+        exported = {config_dict['id']: config_dict for config_dict in data["processor_configs"]}
+        return [_resolve_id(store, processor_id, exported)
+                for processor_id in data.get("processor_order") or list(exported)]
+    return [ChainStep(data['id'], data)]
+
+
+def _check_steps(steps: List[ChainStep]):
+    # 提前检查配置，避免在子进程中才出错
+    for step in steps:
+        if step.config is not None:
+            config_from_dict(step.config)
+
+
+def resolve_chain(specs: List[str]) -> List[ChainStep]:
+    """
+    解析 --chain 参数，每项（可以用逗号分隔多项）是内置Processor的ID、已保存的自定义Processor的ID，
+    或导出的JSON文件，格式见 steps_from_data
+    :raise ValueError: 找不到Processor或配置无效
+    """
+    store = get_registry().store
+    steps = []
+    try:
+        for spec in specs:
+            for item in filter(None, (part.strip() for part in spec.split(','))):
+                path = Path(item)
+                if path.suffix.lower() == '.json' or path.is_file():
+                    with open(path, 'r', encoding='utf-8') as f:
+                        steps.extend(steps_from_data(json.load(f), store))
+                else:
+                    steps.append(_resolve_id(store, item))
+        _check_steps(steps)
+    except (OSError, KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"无法解析处理链: {e}") from e
+    finally:
+        # 子进程不能继承打开的数据库连接
+        store.close()
+    return steps
+
+
+def resolve_chain_data(data) -> List[ChainStep]:
+    """
+    解析JSON格式的处理链（如HTTP请求中的处理链），格式见 steps_from_data；不读取本地文件
+    :raise ValueError: 找不到Processor或配置无效
+    """
+    store = get_registry().store
+    try:
+        steps = steps_from_data(data, store)
+        _check_steps(steps)
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"无法解析处理链: {e}") from e
+    finally:
+        store.close()
+    return steps
+
+
+def build_chain(steps: List[ChainStep]) -> ProcessorChain:
+    registry = get_registry()
+    processor_chain = ProcessorChain()
+    for step in steps:
+        processor_chain.add(step.create(registry))
+    return processor_chain
+
+
+def collect_inputs(patterns: List[str], recursive: bool = False) -> List[Path]:
+    """
+    展开输入：文件、文件夹（其中的图片）或通配符（支持 **），按出现顺序去重；
+    @开头的是列表文件，每行一个输入（如 python -m cli.jobs export-failed 导出的失败列表）
+    """
+    files = []
+    seen = set()
+    expanded = []
+    for pattern in patterns:
+        if pattern.startswith('@'):
+            try:
+                with open(pattern[1:], 'r', encoding='utf-8') as f:
+                    expanded.extend(line.strip() for line in f if line.strip())
+            except OSError as e:
+                print(f"警告: 无法读取列表文件 {pattern[1:]}: {e}", file=sys.stderr)
+        else:
+            expanded.append(pattern)
+    for pattern in expanded:
+        matches = sorted(glob(pattern, recursive=True)) if any(c in pattern for c in '*?[') else [pattern]
+        if not matches:
+            print(f"警告: 没有匹配的文件: {pattern}", file=sys.stderr)
+        for match in matches:
+            path = Path(match)
+            if path.is_dir():
+                candidates = sorted(p for p in (path.rglob('*') if recursive else path.iterdir()) if p.is_file())
+            elif path.is_file():
+                candidates = [path]
+            else:
+                print(f"警告: 文件不存在: {path}", file=sys.stderr)
+                continue
+            for candidate in candidates:
+                if candidate.suffix.lower() in IMAGE_EXTENSIONS and candidate not in seen:
+                    seen.add(candidate)
+                    files.append(candidate)
+    return files
+
+
+def output_overrides(args) -> dict:
+    """命令行参数中指定的输出设置，覆盖 config.yaml 中保存的设置（不写回配置文件）"""
+    overrides = {key: value for key, value in (
+        ('output_path', args.output_dir), ('prefix', args.prefix), ('suffix', args.suffix),
+        ('format', args.format), ('quality', args.quality), ('encoder_profile', args.encoder_profile),
+        ('allow_scale', args.allow_scale), ('strip_gps', args.strip_gps), ('output_height', args.height),
+    ) if value is not None}
+    if args.max_kb is not None:
+        overrides.update(size_mode='max_bytes', max_kb=args.max_kb)
+    if args.force_size or args.height is not None:
+        overrides['force_size'] = True
+    return overrides
+
+
+def summarize(result: BatchResult) -> List[dict]:
+    """每个源文件的处理结果，只包含可以序列化为JSON的值"""
+    failed = set(result.failed)
+    outputs = set(result.outputs)
+    copied = set(result.copied)
+    records = []
+    for source_path, target_path in result.plan.items():
+        record = {'source': str(source_path), 'output': None}
+        if source_path in failed:
+            record['status'] = 'failed'
+            error = result.errors.get(source_path)
+            if error is not None:
+                record.update(error=str(error) or type(error).__name__, transient=is_transient(error))
+        elif target_path in outputs:
+            record.update(status='copied' if target_path in copied else 'processed', output=str(target_path))
+            try:
+                record['bytes'] = target_path.stat().st_size
+            except OSError:
+                pass
+            size_target = result.size_targets.get(target_path)
+            if size_target is not None:
+                record.update(quality=size_target.quality, scale=size_target.scale, fitted=size_target.fitted)
+        else:
+            # 取消后没有处理
+            record['status'] = 'skipped'
+        records.append(record)
+    return records
+
+
+# 子进程中的Processor链，由 _init_worker 创建
+_worker_chain: Optional[ProcessorChain] = None
+
+
+def _init_worker(steps: List[ChainStep], overrides: dict):
+    global _worker_chain
+    # 由主进程处理 Ctrl+C：已开始的批次处理完，未开始的批次取消
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    get_config().update_output_settings(save=False, **overrides)
+    _worker_chain = build_chain(steps)
+
+
+def _run_shard(plan: Dict[Path, Path], options: BatchOptions) -> Tuple[List[dict], List[ItemOutcome]]:
+    with redirect_stdout(sys.stderr):
+        result = run_batch(list(plan), _worker_chain, options, plan=plan)
+    return summarize(result), outcomes_from_result(result)
+
+
+def run_parallel(plan: Dict[Path, Path], steps: List[ChainStep], overrides: dict, options: BatchOptions,
+                 jobs: int, token: CancelToken,
+                 on_shard: Optional[Callable[[List[ItemOutcome]], None]] = None) -> List[dict]:
+    """
+    按批次在多个进程中处理，输出路径已经在 plan 中统一分配，批次之间不会重名
+    :param on_shard: 每批处理完成时在主进程中调用，参数为该批每张图片的处理结果（用于记录任务进度）
+    """
+    items = list(plan.items())
+    size = max(1, min(MAX_SHARD_SIZE, math.ceil(len(items) / jobs)))
+    shards = [dict(items[i:i + size]) for i in range(0, len(items), size)]
+    results: List[Optional[List[dict]]] = [None] * len(shards)
+    done = 0
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(steps, overrides)) as executor:
+        futures = {executor.submit(_run_shard, shard, options): n for n, shard in enumerate(shards)}
+        pending = set(futures)
+        while pending:
+            finished, pending = wait(pending, timeout=0.2, return_when=FIRST_COMPLETED)
+            for future in finished:
+                n = futures[future]
+                if future.cancelled():
+                    continue
+                try:
+                    results[n], outcomes = future.result()
+                except Exception as e:
+                    # 子进程异常退出等，整批按临时性错误处理
+                    print(f"Error: 第 {n + 1} 批处理失败: {e}", file=sys.stderr)
+                    results[n] = [{'source': str(source_path), 'output': None, 'status': 'failed', 'error': str(e)}
+                                  for source_path in shards[n]]
+                    outcomes = [ItemOutcome(source_path, ItemStatus.FAILED, error=str(e), transient=True)
+                                for source_path in shards[n]]
+                if on_shard is not None:
+                    on_shard(outcomes)
+                done += len(shards[n])
+                print(f"[{done}/{len(items)}]", file=sys.stderr)
+            if token.cancelled:
+                for future in pending:
+                    future.cancel()
+    records = []
+    for shard, shard_records in zip(shards, results):
+        records.extend(shard_records if shard_records is not None else
+                       [{'source': str(source_path), 'output': None, 'status': 'skipped'} for source_path in shard])
+    return records
+
+
+def add_chain_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument('-c', '--chain', action='append',
+                        help="Processor：内置或已保存的自定义Processor的ID、导出的JSON文件，"
+                             "可以重复或用逗号分隔，默认不做处理")
+    parser.add_argument('-r', '--recursive', action='store_true', help="包含文件夹的子文件夹中的图片")
+
+
+def add_output_arguments(parser: argparse.ArgumentParser):
+    output = parser.add_argument_group("输出设置（未指定的使用 config.yaml 中的设置）")
+    output.add_argument('-o', '--output-dir', help="输出目录")
+    output.add_argument('--prefix', help="文件名前缀")
+    output.add_argument('--suffix', help="文件名后缀，为空时使用时间戳")
+    output.add_argument('--format', type=str.upper, help="输出格式，如 JPG、PNG、WEBP")
+    output.add_argument('--quality', type=int, help="图片质量 (1-100)")
+    output.add_argument('--encoder-profile', choices=[profile.value for profile in EncoderProfile], help="编码配置")
+    output.add_argument('--max-kb', type=int, help="文件大小上限 (KB)")
+    output.add_argument('--allow-scale', action='store_true', default=None, help="限制文件大小时允许缩小尺寸")
+    output.add_argument('--strip-gps', action='store_true', default=None, help="移除GPS位置信息")
+    output.add_argument('--force-size', action='store_true', help="处理后调整到输出高度")
+    output.add_argument('--height', type=int, help="输出高度（像素），指定时同时启用 --force-size")
+
+
+def prepare(parser: argparse.ArgumentParser, args) -> Tuple[List[ChainStep], dict, BatchOptions]:
+    """
+    按 add_chain_arguments / add_output_arguments 的参数解析处理链和输出设置，参数错误时退出
+    :return: (处理链, 输出设置的覆盖项, BatchOptions)
+    """
+    try:
+        steps = resolve_chain(args.chain or ['empty'])
+    except ValueError as e:
+        parser.error(str(e))
+    overrides = output_overrides(args)
+    if overrides.get('force_size'):
+        steps.append(ChainStep('fit size'))
+
+    config = get_config()
+    config.update_output_settings(save=False, **overrides)
+    options = BatchOptions.from_output_settings(config.get_output_settings(),
+                                                use_equivalent_focal_length=config.use_equivalent_focal_length())
+    return steps, overrides, options
+
+
+def add_job_arguments(parser: argparse.ArgumentParser):
+    job = parser.add_argument_group("任务记录和重试")
+    job.add_argument('--job-db', nargs='?', const=str(DEFAULT_JOB_STORE_PATH),
+                     help=f"把每张图片的处理进度记录到数据库（默认 {DEFAULT_JOB_STORE_PATH}），中断后可以用 --resume 继续")
+    job.add_argument('--resume', nargs='?', const='last', metavar='JOB_ID',
+                     help="继续未完成的任务，不指定ID时继续最近的任务；使用任务创建时的处理链和输出设置")
+    job.add_argument('--retries', type=int, default=2, help="临时性错误（如IO错误）的重试次数")
+    job.add_argument('--retry-delay', type=float, default=RetryPolicy.delay,
+                     help="第一次重试前等待的秒数，之后每次加倍")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(
+        prog='python -m cli', description="命令行批量处理图片（与图形界面使用相同的Processor）")
+    parser.add_argument('inputs', nargs='*', help="图片文件、文件夹、通配符（如 'photos/**/*.jpg'）或 @列表文件")
+    add_chain_arguments(parser)
+    parser.add_argument('-j', '--jobs', type=int, default=1, help="并行处理的进程数，0 表示CPU核数")
+    parser.add_argument('--summary', default='-', help="处理摘要（JSON）的输出文件，默认为标准输出")
+    parser.add_argument('--dry-run', action='store_true', help="只计算输出文件名，不处理")
+    parser.add_argument('--list-processors', action='store_true', help="列出可用的Processor ID")
+    add_output_arguments(parser)
+    add_job_arguments(parser)
+    return parser
+
+
+def job_params(steps: List[ChainStep], overrides: dict, options: BatchOptions) -> dict:
+    """保存到任务记录中的参数，继续处理时用 restore_job 恢复"""
+    return {'source': 'cli', 'steps': [asdict(step) for step in steps], 'overrides': overrides,
+            'options': options.to_dict()}
+
+
+def find_job(store: JobStore, spec: str, resumable: bool = True) -> JobInfo:
+    """
+    按ID查找任务，'last' 表示最近的任务
+    :param resumable: 'last' 是否只查找命令行创建的未完成任务
+    :raise ValueError: 找不到任务
+    """
+    if spec == 'last':
+        jobs = store.jobs(active_only=resumable)
+        if resumable:
+            jobs = [job for job in jobs if job.params.get('source') == 'cli']
+        if not jobs:
+            raise ValueError(f"{store.path} 中没有{'未完成的' if resumable else ''}任务")
+        return jobs[0]
+    try:
+        job = store.get_job(int(spec))
+    except ValueError:
+        raise ValueError(f"任务ID无效: {spec}")
+    if job is None:
+        raise ValueError(f"未找到任务: {spec}")
+    return job
+
+
+def restore_job(job: JobInfo) -> Tuple[List[ChainStep], dict, BatchOptions]:
+    """恢复任务创建时的处理链和输出设置"""
+    if job.params.get('source') != 'cli':
+        raise ValueError(f"任务 {job.id} 不是由命令行创建的")
+    steps = [ChainStep(**step) for step in job.params['steps']]
+    overrides = job.params.get('overrides', {})
+    get_config().update_output_settings(save=False, **overrides)
+    return steps, overrides, BatchOptions.from_dict(job.params['options'])
+
+
+def job_records(store: JobStore, job_id: int, details: Dict[str, dict]) -> List[dict]:
+    """
+    任务中每张图片的处理结果
+    :param details: 本次处理的图片的详细结果（summarize 的格式），其他图片（如上次运行已完成的）只有任务记录中的信息
+    """
+    records = []
+    for item in store.items(job_id):
+        record = dict(details.get(str(item.source)) or
+                      {'source': str(item.source), 'output': str(item.output) if item.output else None})
+        if item.status == ItemStatus.DONE:
+            if record.get('status') not in ('processed', 'copied'):
+                record['status'] = 'processed'
+        elif item.status == ItemStatus.FAILED:
+            record.update(status='failed', error=item.error)
+        else:
+            record['status'] = 'skipped'
+        record['attempts'] = item.attempts
+        if item.elapsed is not None:
+            record['seconds'] = round(item.elapsed, 3)
+        records.append(record)
+    return records
+
+
+def write_summary(summary: dict, destination: str):
+    text = json.dumps(summary, ensure_ascii=False, indent=2, default=str)
+    if destination == '-':
+        print(text)
+        return
+    Path(destination).write_text(text + '\n', encoding='utf-8')
+    print(f"处理摘要已保存到: {destination}", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+
+    if args.list_processors:
+        registry = get_registry()
+        for processor_id in registry.builtin_ids():
+            print(processor_id)
+        for processor_config in registry.custom_configs():
+            print(f"{processor_config.id}\t{processor_config.name}")
+        return EXIT_OK
+    if args.resume is None and not args.inputs:
+        parser.error("需要指定输入图片")
+    if args.resume is not None and args.dry_run:
+        parser.error("--dry-run 不能与 --resume 同时使用")
+
+    jobs = args.jobs if args.jobs > 0 else (os.cpu_count() or 1)
+    policy = RetryPolicy(max_attempts=max(0, args.retries) + 1, delay=args.retry_delay)
+    if args.resume is not None:
+        store = JobStore(args.job_db or DEFAULT_JOB_STORE_PATH)
+        try:
+            job = find_job(store, args.resume)
+            steps, overrides, options = restore_job(job)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.inputs or args.chain:
+            print("警告: 继续处理时使用任务创建时的图片和处理链，忽略命令行中指定的", file=sys.stderr)
+        job_id = job.id
+        file_list = [item.source for item in store.items(job_id)]
+        plan = {}
+    else:
+        steps, overrides, options = prepare(parser, args)
+        # 所有批次使用同一个时间戳后缀
+        options.suffix = options.resolve_suffix()
+        file_list = collect_inputs(args.inputs, args.recursive)
+        plan = plan_outputs(file_list, options)
+        # 不记录到数据库时只在内存中记录，用于重试
+        store = JobStore(args.job_db or MEMORY_STORE)
+        job_id = None
+        if not args.dry_run and file_list:
+            job_id = store.create_job(plan, job_params(steps, overrides, options))
+
+    started = time.time()
+    token = CancelToken()
+    details: Dict[str, dict] = {}
+    previous_handler = signal.signal(signal.SIGINT, lambda signum, frame: token.cancel())
+    try:
+        with redirect_stdout(sys.stderr):
+            if job_id is None:
+                records = [{'source': str(source_path), 'output': str(target_path), 'status': 'planned'}
+                           for source_path, target_path in plan.items()]
+            else:
+                if jobs == 1 or len(file_list) == 1:
+                    def on_progress(i, total, path):
+                        print(f"[{i}/{total}] {path.name}")
+                        return True
+                    merged = BatchResult()
+                    run_job(store, job_id, batch_process(build_chain(steps), options, merged), policy, token,
+                            progress_callback=on_progress)
+                    details.update((record['source'], record) for record in summarize(merged))
+                else:
+                    def process(shard_plan, _, record):
+                        details.update((r['source'], r) for r in run_parallel(
+                            shard_plan, steps, overrides, options, jobs, token, on_shard=record))
+                    # 一次取出全部图片，每批处理完成时记录
+                    run_job(store, job_id, process, policy, token, chunk_size=None)
+                records = job_records(store, job_id, details)
+    finally:
+        signal.signal(signal.SIGINT, previous_handler)
+        store.close()
+
+    counts = {'total': len(records)}
+    for status in ('processed', 'copied', 'failed', 'skipped', 'planned'):
+        counts[status] = sum(1 for record in records if record['status'] == status)
+    persistent = args.job_db is not None or args.resume is not None
+    write_summary({
+        'version': SUMMARY_VERSION,
+        'job_id': job_id if persistent else None,
+        'started_at': datetime.fromtimestamp(started).isoformat(timespec='seconds'),
+        'elapsed_seconds': round(time.time() - started, 3),
+        'jobs': jobs,
+        'dry_run': args.dry_run,
+        'cancelled': token.cancelled,
+        'chain': [step.processor_id for step in steps],
+        'options': options.to_dict(),
+        'retries': policy.max_attempts - 1,
+        'counts': counts,
+        'files': records,
+    }, args.summary)
+
+    if persistent and job_id is not None:
+        if token.cancelled:
+            print(f"可以用 python -m cli --resume {job_id} 继续处理", file=sys.stderr)
+        elif counts['failed']:
+            print(f"可以用 python -m cli.jobs export-failed {job_id} failed.txt 导出失败的图片", file=sys.stderr)
+    if token.cancelled:
+        return EXIT_CANCELLED
+    if not file_list:
+        print("没有找到需要处理的图片", file=sys.stderr)
+        return EXIT_FAILED
+    return EXIT_FAILED if counts['failed'] else EXIT_OK
@@ -0,0 +1,69 @@
+"""
+查看批量处理任务记录（python -m cli --job-db 或图形界面创建的任务），导出失败的图片
+
+用法：
+    python -m cli.jobs list
+    python -m cli.jobs show 12 --status failed
+    python -m cli.jobs export-failed 12 failed.txt     # 之后可以用 python -m cli @failed.txt ... 重新处理
+    python -m cli.jobs export-failed last failed.csv   # .csv / .json 包含失败原因和尝试次数
+"""
+
+import argparse
+import sys
+from pathlib import Path
+from typing import List, Optional
+
+from cli.batch import EXIT_OK, find_job
+from core.job_store import DEFAULT_JOB_STORE_PATH, ItemStatus, JobInfo, JobStore
+
+
+def _format_counts(job: JobInfo) -> str:
+    return ', '.join(f"{status.value} {job.counts[status.value]}" for status in ItemStatus
+                     if job.counts.get(status.value))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m cli.jobs', description="查看批量处理任务记录")
+    parser.add_argument('--job-db', default=str(DEFAULT_JOB_STORE_PATH), help="任务数据库")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="列出任务")
+    show = commands.add_parser('show', help="列出任务中的图片")
+    show.add_argument('job', help="任务ID，last 表示最近的任务")
+    show.add_argument('--status', choices=[status.value for status in ItemStatus], help="只列出该状态的图片")
+    export = commands.add_parser('export-failed', help="导出失败的图片")
+    export.add_argument('job', help="任务ID，last 表示最近的任务")
+    export.add_argument('output', help="输出文件：.csv / .json 包含失败原因，其他扩展名每行一个路径")
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if not Path(args.job_db).exists():
+        parser.error(f"任务数据库不存在: {args.job_db}")
+    store = JobStore(args.job_db)
+    try:
+        if args.command == 'list':
+            for job in store.jobs():
+                source = job.params.get('source', '')
+                print(f"{job.id}\t{job.state.value}\t{job.created_at}\t{source}\t共 {job.total} 张: {_format_counts(job)}")
+            return EXIT_OK
+        try:
+            job = find_job(store, args.job, resumable=False)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.command == 'show':
+            status = ItemStatus(args.status) if args.status else None
+            for item in store.items(job.id, status):
+                elapsed = f"{item.elapsed:.2f}s" if item.elapsed is not None else '-'
+                print(f"{item.status.value}\t{item.attempts}\t{elapsed}\t{item.source}\t{item.error or item.output or ''}")
+            return EXIT_OK
+        count = store.export_failed(job.id, Path(args.output))
+        print(f"已导出 {count} 张失败的图片到 {args.output}", file=sys.stderr)
+        return EXIT_OK
+    finally:
+        store.close()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,77 @@
+"""
+监视文件夹，自动处理新图片（如联机拍摄时相机软件保存到的文件夹）
+处理链和输出设置的参数与 python -m cli 相同；处理记录默认保存在输出目录的 .watch_journal.db 中，
+重启后不会重复处理，停止期间新增的图片在启动时补处理。Ctrl+C 或 SIGTERM 结束
+
+用法：
+    python -m cli.watch /data/tether -c watermark_left_logo -o /data/out
+    python -m cli.watch /data/tether -r --settle 5 --polling
+    python -m cli.watch /data/tether --once
+"""
+
+import argparse
+import signal
+import sys
+from contextlib import redirect_stdout
+from pathlib import Path
+from typing import List, Optional
+
+from cli.batch import EXIT_CANCELLED, EXIT_OK, add_chain_arguments, add_output_arguments, build_chain, prepare
+from core.batch_processor import BatchResult
+from core.cancellation import CancelToken
+from core.watch_folder import (DEFAULT_BATCH_SIZE, DEFAULT_POLL_INTERVAL, DEFAULT_SETTLE_SECONDS,
+                               FolderWatcher, WatchJournal)
+
+# 处理记录的默认文件名（在输出目录中）
+JOURNAL_NAME = '.watch_journal.db'
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m cli.watch', description="监视文件夹，自动处理新图片")
+    parser.add_argument('directories', nargs='+', help="监视的文件夹")
+    add_chain_arguments(parser)
+    parser.add_argument('--settle', type=float, default=DEFAULT_SETTLE_SECONDS,
+                        help="文件大小和修改时间保持不变多少秒后开始处理")
+    parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL, help="定时扫描的间隔（秒）")
+    parser.add_argument('--polling', action='store_true', help="不使用 inotify，定时扫描文件夹")
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help="每批最多处理的图片数量")
+    parser.add_argument('--journal', help=f"处理记录文件，默认为输出目录中的 {JOURNAL_NAME}")
+    parser.add_argument('--once', action='store_true', help="只处理文件夹中已有的未处理图片，然后结束")
+    add_output_arguments(parser)
+    return parser
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    directories = [Path(d) for d in args.directories]
+    for directory in directories:
+        if not directory.is_dir():
+            parser.error(f"文件夹不存在: {directory}")
+
+    steps, _, options = prepare(parser, args)
+    journal = WatchJournal(Path(args.journal) if args.journal else Path(options.output_dir) / JOURNAL_NAME)
+
+    def on_batch(result: BatchResult):
+        print(f"本批处理 {result.processed_count} 张，失败 {result.error_count} 张", file=sys.stderr)
+
+    watcher = FolderWatcher(directories, build_chain(steps), options, journal, recursive=args.recursive,
+                            settle_seconds=args.settle, poll_interval=args.poll_interval,
+                            batch_size=args.batch_size, use_inotify=not args.polling, on_batch=on_batch)
+    token = CancelToken()
+    handlers = {signum: signal.signal(signum, lambda *_: token.cancel()) for signum in (signal.SIGINT, signal.SIGTERM)}
+    print(f"正在监视: {', '.join(map(str, directories))} -> {options.output_dir}", file=sys.stderr)
+    try:
+        with redirect_stdout(sys.stderr):
+            watcher.run(token, once=args.once)
+    finally:
+        for signum, handler in handlers.items():
+            signal.signal(signum, handler)
+        counts = journal.counts()
+        journal.close()
+    print(f"已处理 {counts.get('done', 0)} 张，失败 {counts.get('failed', 0)} 张", file=sys.stderr)
+    return EXIT_CANCELLED if token.cancelled else EXIT_OK
+
+
+if __name__ == '__main__':
+    sys.exit(main())
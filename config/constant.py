@@ -37,6 +37,8 @@ LOCATION_RIGHT_TOP = 'right_top'
 LOCATION_RIGHT_BOTTOM = 'right_bottom'
 TRANSPARENT = (0, 0, 0, 0)
 DEBUG = False
+# 支持的图片文件扩展名（小写）
+IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.tiff', '.bmp', '.gif', '.webp'}
 GRAY = '#CBCBC9'
 
 DEFAULT_VALUE = '--'
\ No newline at end of file
@@ -1,4 +1,5 @@
 import os
+import threading
 
 import yaml
 from PIL import Image
@@ -46,11 +47,13 @@ class Config(object):
         with open(self._path, 'r', encoding='utf-8') as f:
             self._data = yaml.safe_load(f)
         self._logos = {}
+        self._logos_lock = threading.Lock()
         self._left_top = ElementConfig(self._data['layout']['elements'][LOCATION_LEFT_TOP])
         self._left_bottom = ElementConfig(self._data['layout']['elements'][LOCATION_LEFT_BOTTOM])
         self._right_top = ElementConfig(self._data['layout']['elements'][LOCATION_RIGHT_TOP])
         self._right_bottom = ElementConfig(self._data['layout']['elements'][LOCATION_RIGHT_BOTTOM])
         self._makes = self._data['logo']['makes']
+        # 默认背景色，处理过程中只读；水印Processor选择的背景色保存在每张图片的处理上下文中
         self.bg_color = self._data['layout']['background_color'] \
             if 'background_color' in self._data['layout'] \
             else '#ffffff'
@@ -79,20 +82,21 @@ class Config(object):
         :return: logo
         """
         # 已经读到内存中的 logo
-        if make in self._logos:
-            return self._logos[make]
-        # 未读取到内存中的 logo
-        for m in self._makes.values():
-            if m['id'] == '':
-                pass
-            if m['id'].lower() in make.lower():
-                logo = Image.open(m['path'])
-                self._logos[make] = logo
-                return logo
-        logo_path = self._data['logo']['default']['path']
-        logo = Image.open(logo_path)
-        self._logos[make] = logo
-        return logo
+        with self._logos_lock:
+            if make in self._logos:
+                return self._logos[make]
+            # 未读取到内存中的 logo，立即解码，避免多个线程同时惰性加载同一个图片对象
+            logo_path = self._data['logo']['default']['path']
+            for m in self._makes.values():
+                if m['id'] == '':
+                    pass
+                if m['id'].lower() in make.lower():
+                    logo_path = m['path']
+                    break
+            logo = Image.open(logo_path)
+            logo.load()
+            self._logos[make] = logo
+            return logo
 
     def get_data(self) -> dict:
         return self._data
@@ -280,7 +284,7 @@ class Config(object):
             return self._data['global']['table_columns']['visible_columns']
         # 默认返回所有列（包括新增的文件大小列）
         return [
-            "文件名", "后缀名", "文件大小", "相机品牌", "相机型号", "镜头型号",
+            "缩略图", "文件名", "后缀名", "文件大小", "相机品牌", "相机型号", "镜头型号",
             "焦距", "光圈", "ISO", "曝光时间", "分辨率", "拍摄时间", "GPS信息"
         ]
 
@@ -300,6 +304,11 @@ class Config(object):
                 'suffix': '',
                 'format': 'JPG',
                 'quality': 95,
+                'encoder_profile': 'balanced',
+                'size_mode': 'quality',
+                'max_kb': 1024,
+                'allow_scale': False,
+                'strip_gps': False,
                 'force_size': False,
                 'output_width': 1920,
                 'output_height': 1080,
@@ -313,6 +322,11 @@ class Config(object):
             'suffix': '',
             'format': 'JPG',
             'quality': 95,
+            'encoder_profile': 'balanced',
+            'size_mode': 'quality',
+            'max_kb': 1024,
+            'allow_scale': False,
+            'strip_gps': False,
             'force_size': False,
             'output_width': 1920,
             'output_height': 1080,
@@ -326,8 +340,8 @@ class Config(object):
         
         return settings
     
-    def set_output_settings(self, settings):
-        """设置输出设置"""
+    def set_output_settings(self, settings, save=True):
+        """设置输出设置，save 为False时只修改内存中的设置（如命令行临时覆盖）"""
         # 确保所有必要的键都存在
         required_keys = ['prefix', 'suffix', 'format', 'quality', 'force_size', 
                         'output_width', 'output_height', 'output_path']
@@ -353,10 +367,11 @@ class Config(object):
                     settings[key] = self.get_output_dir()
         
         self._data['output_settings'] = settings
-        self.save()
+        if save:
+            self.save()
         
-    def update_output_settings(self, **kwargs):
+    def update_output_settings(self, save=True, **kwargs):
         """更新输出设置（部分更新）"""
         current_settings = self.get_output_settings()
         current_settings.update(kwargs)
-        self.set_output_settings(current_settings)
+        self.set_output_settings(current_settings, save)
@@ -0,0 +1,285 @@
+"""
+批量处理
+按Processor链依次处理图片，编码和写文件交给后台写入器，与下一张图片的处理重叠进行；
+Processor链不改变像素时直接复制源文件，不解码也不重新编码；
+超大图片在Processor都支持时按横条分块处理（见 core/tiled.py）；
+源文件在后台预读，每个文件只从磁盘读取一次；
+on_processed 可以在写入之前拿到每张图片的处理结果（如直接交给视频渲染）
+"""
+
+import logging
+import time
+from contextlib import closing
+from dataclasses import asdict, dataclass, field, fields
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+from PIL import Image
+
+from config.constant import DEBUG
+from core.encoder_profiles import DEFAULT_ENCODER_PROFILE, format_for_path, get_encoder_profile
+from core.image_container import ImageContainer
+from core.image_processor import ProcessorComponent
+from core.ingest import PREFETCH_DEPTH, SourceFile, prefetch_sources
+from core.metadata import SourceMetadata
+from core.output_writer import AtomicWriter, OutputPlanner
+from core.size_targeting import SizeTargetResult
+from core.tiled import TILED_PIXEL_THRESHOLD, BandSource, ImageBands
+
+# 处理结果回调：(序号, 处理结果)，结果为RGB图片、分块结果，处理失败时为None
+ProcessedCallback = Callable[[int, Union[Image.Image, BandSource, None]], None]
+
+
+@dataclass
+class BatchOptions:
+    """批量输出设置"""
+    output_dir: Path
+    prefix: str = 'Img_'
+    suffix: str = ''  # 为空时使用批次开始时间作为后缀
+    format: str = 'jpg'
+    quality: int = 95
+    encoder_profile: str = DEFAULT_ENCODER_PROFILE.value
+    max_bytes: Optional[int] = None  # 文件大小上限，指定时 quality 作为搜索的最高质量
+    allow_scale: bool = False        # 限制文件大小时是否允许缩小尺寸
+    use_equivalent_focal_length: bool = False
+    strip_gps: bool = False          # 移除GPS位置信息
+    passthrough: bool = True         # Processor链不改变像素时直接复制源文件
+    hardlink: bool = False           # 直接复制时优先使用硬链接
+    tiled_threshold: Optional[int] = TILED_PIXEL_THRESHOLD  # 超过该像素数时分块处理，None 表示不分块
+    prefetch: int = PREFETCH_DEPTH   # 后台预读的文件数量，0 表示不预读
+    write_workers: int = 2
+    write_outputs: bool = True       # False 时只处理不写文件（配合 on_processed 使用）
+
+    @classmethod
+    def from_output_settings(cls, settings: dict, output_dir: Optional[Path] = None,
+                             use_equivalent_focal_length: bool = False) -> 'BatchOptions':
+        """
+        按输出设置（Config.get_output_settings 的格式）创建
+        :param output_dir: 输出目录，为None时使用设置中的 output_path
+        """
+        max_kb = settings.get('max_kb', 1024) if settings.get('size_mode') == 'max_bytes' else None
+        return cls(
+            output_dir=Path(output_dir if output_dir else settings.get('output_path', '')),
+            prefix=settings.get('prefix', 'Img_').strip(),
+            suffix=settings.get('suffix', '').strip(),
+            format=settings.get('format', 'JPG').lower(),
+            quality=settings.get('quality', 95),
+            encoder_profile=get_encoder_profile(settings.get('encoder_profile')).value,
+            max_bytes=max_kb * 1024 if max_kb else None,
+            allow_scale=settings.get('allow_scale', False),
+            strip_gps=settings.get('strip_gps', False),
+            use_equivalent_focal_length=use_equivalent_focal_length,
+        )
+
+    def resolve_suffix(self) -> str:
+        if self.suffix:
+            return self.suffix
+        return datetime.now().strftime("_%Y%m%d_%H%M%S")
+
+    def to_dict(self) -> dict:
+        """可以序列化为JSON的字典（如保存到任务记录）"""
+        data = asdict(self)
+        data['output_dir'] = str(self.output_dir)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'BatchOptions':
+        """to_dict 的逆操作，忽略不认识的字段"""
+        known = {f.name for f in fields(cls)}
+        options = cls(**{key: value for key, value in data.items() if key in known})
+        options.output_dir = Path(options.output_dir)
+        return options
+
+
+@dataclass
+class BatchResult:
+    """批量处理结果"""
+    plan: Dict[Path, Path] = field(default_factory=dict)
+    outputs: List[Path] = field(default_factory=list)
+    copied: List[Path] = field(default_factory=list)  # 直接复制源文件的输出
+    failed: List[Path] = field(default_factory=list)
+    size_targets: Dict[Path, SizeTargetResult] = field(default_factory=dict)
+    errors: Dict[Path, Exception] = field(default_factory=dict)  # 源文件 -> 失败原因
+    timings: Dict[Path, Tuple[float, float]] = field(default_factory=dict)  # 源文件 -> (开始, 写入完成) 的 time.time()
+    cancelled: bool = False
+
+    @property
+    def processed_count(self) -> int:
+        return len(self.outputs)
+
+    @property
+    def error_count(self) -> int:
+        return len(self.failed)
+
+    def merge(self, other: 'BatchResult'):
+        """合并另一批（如同一任务的下一段或重试）的结果，重试成功的图片不再算作失败"""
+        retried = set(other.plan)
+        self.plan.update(other.plan)
+        self.failed = [path for path in self.failed if path not in retried] + other.failed
+        for source_path in retried:
+            self.errors.pop(source_path, None)
+        self.outputs.extend(other.outputs)
+        self.copied.extend(other.copied)
+        self.size_targets.update(other.size_targets)
+        self.errors.update(other.errors)
+        self.timings.update(other.timings)
+        self.cancelled = self.cancelled or other.cancelled
+
+
+def plan_outputs(file_list: List[Path], options: BatchOptions) -> Dict[Path, Path]:
+    """计算每张图片的输出路径（试运行），不创建任何文件"""
+    planner = OutputPlanner(options.output_dir, options.prefix, options.resolve_suffix(), options.format)
+    return planner.plan(file_list)
+
+
+def _passthrough_metadata(source_path: Path, target_path: Path, options: BatchOptions,
+                          source: Optional[SourceFile] = None) -> Optional[SourceMetadata]:
+    """
+    判断能否直接复制源文件：输出格式与源文件相同，且不需要按方向转正；
+    需要移除GPS信息时只有JPEG可以只改写元数据
+    :return: 可以复制时返回源文件元数据，否则返回None
+    """
+    target_format = format_for_path(target_path)
+    try:
+        # 只读取文件头，不解码像素
+        with (source.open_image() if source is not None else Image.open(source_path)) as img:
+            if img.format != target_format:
+                return None
+            metadata = SourceMetadata.from_image(img)
+    except Exception:
+        return None
+    if metadata.orientation != 1:
+        return None
+    if options.strip_gps and target_format != 'JPEG' and metadata.has_gps():
+        return None
+    return metadata
+
+
+def run_batch(file_list: List[Path], processor_chain: ProcessorComponent, options: BatchOptions,
+              progress_callback: Optional[Callable[[int, int, Path], bool]] = None,
+              dry_run: bool = False, on_processed: Optional[ProcessedCallback] = None,
+              plan: Optional[Dict[Path, Path]] = None) -> BatchResult:
+    """
+    批量处理图片
+    :param file_list: 待处理的图片
+    :param processor_chain: Processor链
+    :param options: 输出设置
+    :param progress_callback: 每张图片开始处理前调用 (序号, 总数, 源文件)，返回False时取消
+    :param dry_run: 只计算输出文件名，不处理也不写入
+    :param on_processed: 每张图片处理完成、交给写入器之前调用 (从0开始的序号, 处理结果)，
+                         在调用线程中同步执行，返回后处理结果可能被写入器使用，不能保留引用
+    :param plan: 预先计算的输出路径（plan_outputs 的一部分），多个进程分批处理同一批图片时使用，
+                 为None时按 file_list 计算
+    :return: 处理结果
+    """
+    output_dir = Path(options.output_dir)
+    if not dry_run and options.write_outputs:
+        output_dir.mkdir(parents=True, exist_ok=True)
+    result = BatchResult(plan=dict(plan) if plan is not None else plan_outputs(file_list, options))
+    if dry_run:
+        return result
+
+    total = len(file_list)
+    pending = []
+    started: Dict[Path, float] = {}
+    # 写入在后台线程中完成，完成时间由回调记录
+    finished: Dict[Path, float] = {}
+
+    def on_written(path: Path):
+        def callback(_):
+            finished[path] = time.time()
+        return callback
+
+    passthrough = (options.passthrough and options.write_outputs and not options.max_bytes
+                   and not processor_chain.changes_pixels())
+    tiled = options.tiled_threshold is not None and processor_chain.supports_bands()
+    # 全部创建硬链接时不需要读取文件内容
+    if options.prefetch > 0 and not (passthrough and options.hardlink):
+        reads = prefetch_sources(result.plan.keys(), options.prefetch)
+    else:
+        reads = ((source_path, None) for source_path in result.plan)
+    with AtomicWriter(max_workers=options.write_workers) as writer, closing(reads):
+        for i, ((source_path, target_path), (_, read)) in enumerate(zip(result.plan.items(), reads), 1):
+            if progress_callback is not None and progress_callback(i, total, source_path) is False:
+                result.cancelled = True
+                break
+            started[source_path] = time.time()
+            try:
+                source = read.result() if read is not None else None
+                metadata = _passthrough_metadata(source_path, target_path, options, source) if passthrough else None
+                if metadata is not None:
+                    if on_processed is not None:
+                        # 直接复制的图片没有处理结果，原图即为结果
+                        with closing(ImageContainer(source_path, source=source)) as container:
+                            on_processed(i - 1, container.img)
+                    future = writer.submit_copy(source_path, target_path, hardlink=options.hardlink,
+                                                metadata=metadata, strip_gps=options.strip_gps,
+                                                data=source.data if source else None)
+                    future.add_done_callback(on_written(source_path))
+                    pending.append((source_path, future))
+                    continue
+                container = ImageContainer(source_path, source=source)
+                container.is_use_equivalent_focal_length(options.use_equivalent_focal_length)
+                bands = None
+                try:
+                    if tiled and container.img.width * container.img.height >= options.tiled_threshold:
+                        bands = processor_chain.process_bands(container, ImageBands(container.img))
+                    else:
+                        processor_chain.process(container)
+                    if on_processed is not None:
+                        on_processed(i - 1, bands if bands is not None else container.get_output_image())
+                except BaseException:
+                    container.close()
+                    raise
+                if not options.write_outputs:
+                    container.close()
+                    finished[source_path] = time.time()
+                    continue
+                save_options = dict(quality=options.quality, profile=options.encoder_profile,
+                                    max_bytes=options.max_bytes, allow_scale=options.allow_scale,
+                                    strip_gps=options.strip_gps)
+                if bands is not None:
+                    print(f"分块处理: {source_path.name} ({bands.width}x{bands.height})")
+                    future = writer.submit_bands(container, bands, target_path, **save_options)
+                else:
+                    future = writer.submit(container, target_path, **save_options)
+                future.add_done_callback(on_written(source_path))
+                pending.append((source_path, future))
+            except Exception as e:
+                logging.exception(f'Error: {str(e)}')
+                finished[source_path] = time.time()
+                result.failed.append(source_path)
+                result.errors[source_path] = e
+                if on_processed is not None:
+                    on_processed(i - 1, None)
+                if DEBUG:
+                    raise e
+                print(f'\nError: 文件：{source_path} 处理失败，请检查日志')
+
+        # 已经提交的写入在取消后也会完成，避免留下半成品
+        for source_path, future in pending:
+            try:
+                write_result = future.result()
+                target_path = write_result.target_path
+                result.outputs.append(target_path)
+                size_target = write_result.size_target
+                if write_result.copied:
+                    result.copied.append(target_path)
+                    print(f"已复制: {target_path.name} (未修改，直接复制源文件)")
+                elif size_target is None:
+                    print(f"已保存: {target_path.name} (质量: {options.quality}%)")
+                else:
+                    result.size_targets[target_path] = size_target
+                    print(f"已保存: {target_path.name} ({size_target.size / 1024:.1f} KB, "
+                          f"质量: {size_target.quality}, 缩放: {size_target.scale:.2f}, "
+                          f"试编码 {size_target.iterations} 次)")
+                    if not size_target.fitted:
+                        print(f"警告: {target_path.name} 无法压缩到 {options.max_bytes / 1024:.0f} KB 以内")
+            except Exception as e:
+                logging.exception(f'Error: {str(e)}')
+                result.failed.append(source_path)
+                result.errors[source_path] = e
+                print(f'\nError: 文件：{source_path} 写入失败，请检查日志')
+    result.timings = {path: (start, finished.get(path, start)) for path, start in started.items()}
+    return result
@@ -0,0 +1,60 @@
+"""
+取消标记
+后台任务与发起方之间传递取消请求，不依赖Qt，可以在处理、视频等模块中直接使用
+"""
+
+import logging
+import threading
+from typing import Callable, List
+
+logger = logging.getLogger(__name__)
+
+
+class TaskCancelled(Exception):
+    """任务已被取消"""
+
+
+class CancelToken:
+    """
+    取消标记
+    可以在任意线程中调用 cancel；工作线程通过 cancelled 轮询，
+    或用 on_cancel 注册取消时的回调（如结束子进程）
+    """
+
+    def __init__(self):
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        """请求取消，已注册的回调只执行一次"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"取消回调出错: {e}")
+
+    def on_cancel(self, callback: Callable[[], None]) -> None:
+        """注册取消时的回调，已经取消时立即执行"""
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def raise_if_cancelled(self) -> None:
+        if self._event.is_set():
+            raise TaskCancelled()
+
+    def wait(self, timeout: float = None) -> bool:
+        """等待取消请求，返回是否已取消"""
+        return self._event.wait(timeout)
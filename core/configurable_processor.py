@@ -220,7 +220,10 @@ class ConfigurableCompositeProcessor(ProcessorComponent):
         """处理图片容器，按顺序应用所有Processor"""
         for processor in self.processors:
             processor.process(container)
-    
+
+    def changes_pixels(self) -> bool:
+        return any(processor.changes_pixels() for processor in self.processors)
+
     def add_processor(self, processor_config: ProcessorConfig) -> None:
         """添加Processor到组合"""
         processor = ConfigurableProcessor(self.config, processor_config)
@@ -12,7 +12,10 @@ from utils.image_utils import padding_image
 
 
 class BaseEffect:
-    """基础效果类"""
+    """
+    基础效果类
+    效果实例在多张图片之间共享，apply 中不能修改实例属性，按图片计算的值使用局部变量
+    """
     
     def __init__(self, config: Config = None):
         self.config = config
@@ -33,13 +36,14 @@ class RoundedCornerEffect(BaseEffect):
         self.radius = radius
     
     def apply(self, image: Image.Image, container: Optional[ImageContainer] = None) -> Image.Image:
-        if self.radius is None:
+        radius = self.radius
+        if radius is None:
             # 默认圆角半径设为图片较短边的1/10
-            self.radius = min(image.width, image.height) // 10
+            radius = min(image.width, image.height) // 10
         
         mask = Image.new('L', image.size, 0)
         draw = ImageDraw.Draw(mask)
-        draw.rounded_rectangle((0, 0, image.width, image.height), radius=self.radius, fill=255)
+        draw.rounded_rectangle((0, 0, image.width, image.height), radius=radius, fill=255)
         rounded_image = ImageOps.fit(image, mask.size, centering=(0.5, 0.5))
         rounded_image.putalpha(mask)
         return rounded_image
@@ -57,20 +61,21 @@ class ShadowEffect(BaseEffect):
     def apply(self, image: Image.Image, container: Optional[ImageContainer] = None) -> Image.Image:
         max_pixel = max(image.width, image.height)
         
-        if self.blur_radius is None:
-            self.blur_radius = int(max_pixel / 512)
+        blur_radius = self.blur_radius
+        if blur_radius is None:
+            blur_radius = int(max_pixel / 512)
         
         # 创建阴影效果
         shadow = Image.new('RGB', image.size, color=self.shadow_color)
         shadow = ImageOps.expand(shadow, 
-                                 border=(self.blur_radius * 2, self.blur_radius * 2, 
-                                         self.blur_radius * 2, self.blur_radius * 2), 
+                                 border=(blur_radius * 2, blur_radius * 2, 
+                                         blur_radius * 2, blur_radius * 2), 
                                  fill=(255, 255, 255))
         # 模糊阴影
-        shadow = shadow.filter(ImageFilter.GaussianBlur(radius=self.blur_radius))
+        shadow = shadow.filter(ImageFilter.GaussianBlur(radius=blur_radius))
         
         # 将原始图像放置在阴影图像上方
-        shadow.paste(image, (self.blur_radius, self.blur_radius))
+        shadow.paste(image, (blur_radius, blur_radius))
         return shadow
 
 
@@ -85,17 +90,18 @@ class MarginEffect(BaseEffect):
         self.color = color
     
     def apply(self, image: Image.Image, container: Optional[ImageContainer] = None) -> Image.Image:
-        if self.margin_size is None and self.config is not None and container is not None:
+        margin_size = self.margin_size
+        if margin_size is None and self.config is not None and container is not None:
             # 从配置获取边距大小
-            self.margin_size = int(
+            margin_size = int(
                 self.config.get_white_margin_width() * 
                 min(container.get_width(), container.get_height()) / 100
             )
-        elif self.margin_size is None:
+        elif margin_size is None:
             # 默认边距
-            self.margin_size = int(min(image.width, image.height) * 0.03)
+            margin_size = int(min(image.width, image.height) * 0.03)
         
-        return padding_image(image, self.margin_size, self.sides, color=self.color)
+        return padding_image(image, margin_size, self.sides, color=self.color)
 
 
 class BackgroundBlurEffect(BaseEffect):
@@ -140,17 +146,18 @@ class BorderEffect(BaseEffect):
         self.sides = sides
     
     def apply(self, image: Image.Image, container: Optional[ImageContainer] = None) -> Image.Image:
-        if self.border_size is None and self.config is not None and container is not None:
+        border_size = self.border_size
+        if border_size is None and self.config is not None and container is not None:
             # 从配置获取边框大小
-            self.border_size = int(
+            border_size = int(
                 self.config.get_white_margin_width() * 
                 min(container.get_width(), container.get_height()) / 100
             )
-        elif self.border_size is None:
+        elif border_size is None:
             # 默认边框大小
-            self.border_size = int(min(image.width, image.height) * 0.03)
+            border_size = int(min(image.width, image.height) * 0.03)
         
-        return padding_image(image, self.border_size, self.sides, color=self.color)
+        return padding_image(image, border_size, self.sides, color=self.color)
 
 
 class CompositeEffect(BaseEffect):
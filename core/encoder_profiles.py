@@ -0,0 +1,94 @@
+"""
+编码配置
+为每种输出格式提供 快速 / 均衡 / 最小体积 三档编码参数，在编码速度和文件大小之间取舍；
+另有 高质量 一档，JPEG不做色度抽样，保留文字、细线水印等边缘的颜色
+"""
+
+from enum import Enum
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image
+
+
+class EncoderProfile(Enum):
+    """编码配置"""
+    FAST = "fast"          # 编码最快，文件较大
+    BALANCED = "balanced"  # 无损的体积优化（如JPEG霍夫曼表优化），速度略慢
+    SMALLEST = "smallest"  # 体积最小，编码最慢
+    QUALITY = "quality"    # 画质优先：JPEG 4:4:4 色度，文件比均衡大
+
+
+DEFAULT_ENCODER_PROFILE = EncoderProfile.BALANCED
+
+ENCODER_PROFILE_NAMES = {
+    EncoderProfile.FAST: "快速",
+    EncoderProfile.BALANCED: "均衡",
+    EncoderProfile.SMALLEST: "最小体积",
+    EncoderProfile.QUALITY: "高质量",
+}
+
+# 各格式在不同配置下传给 Image.save 的参数（不含quality）
+# JPEG subsampling: 0=4:4:4, 1=4:2:2, 2=4:2:0
+# 速度/体积三档都用 4:2:0（也是Pillow的默认值）：4:4:4 的色度数据是 4:2:0 的两倍，编码更慢、文件更大，
+# 与这三档的取舍方向相反；需要保留颜色细节时使用 QUALITY。
+# WebP有损编码固定为 4:2:0，PNG/TIFF无损，这些格式在 QUALITY 下与均衡相同
+_PROFILE_OPTIONS = {
+    EncoderProfile.FAST: {
+        'JPEG': {'optimize': False, 'progressive': False, 'subsampling': 2},
+        'WEBP': {'method': 0},
+        'PNG': {'compress_level': 1},
+        'TIFF': {'compression': 'raw'},
+    },
+    EncoderProfile.BALANCED: {
+        'JPEG': {'optimize': True, 'progressive': False, 'subsampling': 2},
+        'WEBP': {'method': 4},
+        'PNG': {'compress_level': 6},
+        'TIFF': {'compression': 'tiff_lzw'},
+    },
+    EncoderProfile.SMALLEST: {
+        'JPEG': {'optimize': True, 'progressive': True, 'subsampling': 2},
+        'WEBP': {'method': 6},
+        'PNG': {'compress_level': 9, 'optimize': True},
+        'TIFF': {'compression': 'tiff_adobe_deflate'},
+    },
+    EncoderProfile.QUALITY: {
+        'JPEG': {'optimize': True, 'progressive': False, 'subsampling': 0},
+        'WEBP': {'method': 4},
+        'PNG': {'compress_level': 6},
+        'TIFF': {'compression': 'tiff_lzw'},
+    },
+}
+
+# 支持 quality 参数的有损格式
+LOSSY_FORMATS = {'JPEG', 'WEBP'}
+
+
+def get_encoder_profile(value) -> EncoderProfile:
+    """把配置中的字符串转换为 EncoderProfile，无法识别时返回默认配置"""
+    if isinstance(value, EncoderProfile):
+        return value
+    try:
+        return EncoderProfile(value)
+    except ValueError:
+        return DEFAULT_ENCODER_PROFILE
+
+
+def format_for_path(path: Path) -> Optional[str]:
+    """根据扩展名返回PIL格式名，例如 .jpg -> JPEG"""
+    return Image.registered_extensions().get(Path(path).suffix.lower())
+
+
+def encoder_options(image_format: Optional[str], quality: int = 95, profile=None) -> dict:
+    """
+    生成 Image.save 的编码参数
+    :param image_format: PIL格式名
+    :param quality: 有损格式的质量
+    :param profile: 编码配置，None 使用默认配置
+    :return: 参数字典
+    """
+    profile = get_encoder_profile(profile) if profile is not None else DEFAULT_ENCODER_PROFILE
+    options = dict(_PROFILE_OPTIONS[profile].get(image_format, {}))
+    if image_format in LOSSY_FORMATS:
+        options['quality'] = quality
+    return options
@@ -1,53 +1,23 @@
 import os
-import re
+import copy
 import json
 import logging
 from datetime import datetime
 from pathlib import Path
 
 from PIL import Image
-from PIL.Image import Transpose
-from dateutil import parser
 
 from config.image_config import ElementConfig
 from config.constant import *
-from config.enums import ExifId
-from utils.exif_utils import calculate_pixel_count, extract_attribute ,extract_gps_info,extract_gps_lat_and_long,get_exif
+from core.encoder_profiles import encoder_options, format_for_path
+from core.image_metadata import ImageMetadata, load_exif
+from core.ingest import SourceFile
+from core.metadata import SourceMetadata, apply_orientation, metadata_save_kwargs
+from core.processing_context import ProcessingContext
+from core.size_targeting import encode_to_size
+from utils.exif_utils import calculate_pixel_count, get_exif
 
 logger = logging.getLogger(__name__)
-PATTERN = re.compile(r"(\d+)\.")  # 匹配小数
-
-
-def get_datetime(exif) -> datetime:
-    dt = datetime.now()
-    try:
-        dt = parser.parse(extract_attribute(exif, ExifId.DATETIME.value,
-                                            default_value=str(datetime.now())))
-    except ValueError as e:
-        logger.info(f'Error: 时间格式错误：{extract_attribute(exif, ExifId.DATETIME.value)}')
-    return dt
-
-
-# 获取焦距与等效焦距
-def get_focal_length(exif):
-    focal_length = DEFAULT_VALUE
-    focal_length_in_35mm_film = DEFAULT_VALUE
-
-    try:
-        focal_lengths = PATTERN.findall(extract_attribute(exif, ExifId.FOCAL_LENGTH.value))
-        try:
-            focal_length = focal_lengths[0] if focal_length else DEFAULT_VALUE
-        except IndexError as e:
-            logger.info(
-                f'ValueError: 不存在焦距：{focal_lengths} : {e}')
-        try:
-            focal_length_in_35mm_film: str = focal_lengths[1] if focal_length else DEFAULT_VALUE
-        except IndexError as e:
-            logger.info(f'ValueError: 不存在 35mm 焦距：{focal_lengths} : {e}')
-    except Exception as e:
-        logger.info(f'KeyError: 焦距转换错误：{extract_attribute(exif, ExifId.FOCAL_LENGTH.value)} : {e}')
-
-    return focal_length, focal_length_in_35mm_film
 
 
 # 定义图片的类
@@ -62,7 +32,7 @@ class ImageContainer(object):
         name (str): 图像文件名。
         target_path (Path | None): 目标路径，初始为 None。
         img (Image.Image): Pillow 图像对象。
-        exif (dict): 图像的 EXIF 信息字典。
+        exif (dict): 图像的完整 EXIF 信息字典，按需读取。
         original_width (int): 图像原始宽度。
         original_height (int): 图像原始高度。
         _param_dict (dict): 参数字典。
@@ -78,45 +48,52 @@ class ImageContainer(object):
         iso (str): ISO 感光度。
     """
 
-    def __init__(self, path: Path):
+    def __init__(self, path: Path, max_size: int | None = None, source: SourceFile | None = None):
+        """
+        :param path: 图像文件路径
+        :param max_size: 长边上限，指定时只解码降采样后的代理图（用于预览），原始尺寸信息不变
+        :param source: 已读入内存的文件内容，指定时解码和读取EXIF都使用这份数据，不再读取文件
+        """
         self.path: Path = path
         self.name: str = path.name
         self.target_path: Path | None = None
-        self.img: Image.Image = Image.open(path)
-        self.exif: dict = get_exif(path)  # 图片信息字典
+        self.img: Image.Image = source.open_image() if source is not None else Image.open(path)
+        # 源文件的EXIF/ICC/XMP原始数据，保存时随编码一次写入
+        self.metadata: SourceMetadata = SourceMetadata.from_image(self.img)
+        exif = get_exif(path, data=source.data if source is not None else None)
         self.original_width = self.img.width
         self.original_height = self.img.height
+        if max_size is not None:
+            # JPEG 可以直接按缩小尺寸解码，其他格式解码后再缩小
+            self.img.draft('RGB', (max_size, max_size))
+            self.img.thumbnail((max_size, max_size), Image.LANCZOS)
         self._param_dict = dict()
-        self.model: str = extract_attribute(self.exif, ExifId.CAMERA_MODEL.value)
-        self.make: str = extract_attribute(self.exif, ExifId.CAMERA_MAKE.value)
-        self.lens_model: str = extract_attribute(self.exif, *ExifId.LENS_MODEL.value)
-        self.lens_make: str = extract_attribute(self.exif, ExifId.LENS_MAKE.value)
-        self.date: datetime = get_datetime(self.exif)
-        self.focal_length, self.focal_length_in_35mm_film = get_focal_length(self.exif)
-        self.f_number: str = extract_attribute(self.exif, ExifId.F_NUMBER.value, default_value=DEFAULT_VALUE)
-        self.exposure_time: str = extract_attribute(self.exif, ExifId.EXPOSURE_TIME.value, default_value=DEFAULT_VALUE,suffix='s')
-        self.iso: str = extract_attribute(self.exif, ExifId.ISO.value, default_value=DEFAULT_VALUE)
+        # 只保留需要的字段，完整EXIF通过 exif 属性按需读取
+        record = ImageMetadata.from_exif(path, exif, self.original_width, self.original_height)
+        self.model: str = record.model
+        self.make: str = record.make
+        self.lens_model: str = record.lens_model
+        self.lens_make: str = record.lens_make
+        self.date: datetime = record.date
+        self.focal_length, self.focal_length_in_35mm_film = record.focal_length, record.focal_length_in_35mm_film
+        self.f_number: str = record.f_number
+        self.exposure_time: str = record.exposure_time
+        self.iso: str = record.iso
 
         # 是否使用等效焦距
         self.use_equivalent_focal_length: bool = True
-        self.orientation = self.exif[ExifId.ORIENTATION.value] if ExifId.ORIENTATION.value in self.exif else 1
-        # print(self.orientation)
-        if self.orientation == "Rotate 0":
-            pass
-        elif self.orientation == "Rotate 90 CW":
-            self.img = self.img.transpose(Transpose.ROTATE_270)
-        elif self.orientation == "Rotate 180":
-            self.img = self.img.transpose(Transpose.ROTATE_180)
-        elif self.orientation == "Rotate 270 CW":
-            self.img = self.img.transpose(Transpose.ROTATE_90)
-        else:
-            pass
+        self.orientation = record.orientation
+        # 按EXIF方向把像素转正，输出时不再转回，EXIF中的方向重置为正常
+        if self.metadata.orientation != 1:
+            self.img = apply_orientation(self.img, self.metadata.orientation)
 
         # 水印设置
         self.custom = '无'
         self.logo = None
         # 水印图片
         self.watermark_img = None
+        # 本张图片的处理上下文，Processor之间传递派生值
+        self.context = ProcessingContext()
         self._param_dict[MODEL_VALUE] = self.model
         self._param_dict[PARAM_VALUE] = self.get_param_str()
         self._param_dict[MAKE_VALUE] = self.make
@@ -128,13 +105,7 @@ class ImageContainer(object):
         self._param_dict[TOTAL_PIXEL_VALUE] = calculate_pixel_count(self.original_width, self.original_height)
 
         # GPS 信息
-        if 'GPSPosition' in self.exif:
-            self._param_dict[GEO_INFO_VALUE] = str.join(' ', extract_gps_info(self.exif.get('GPSPosition')))
-        elif 'GPSLatitude' in self.exif and 'GPSLongitude' in self.exif:
-            self._param_dict[GEO_INFO_VALUE] = str.join(' ', extract_gps_lat_and_long((self.exif.get('GPSLatitude'),
-                                                                                       self.exif.get('GPSLongitude'))))
-        else:
-            self._param_dict[GEO_INFO_VALUE] = '无'
+        self._param_dict[GEO_INFO_VALUE] = record.geo_info
 
         self._param_dict[CAMERA_MAKE_CAMERA_MODEL_VALUE] = ' '.join(
             [self._param_dict[MAKE_VALUE], self._param_dict[MODEL_VALUE]])
@@ -147,6 +118,23 @@ class ImageContainer(object):
         self._param_dict[DATETIME_FILENAME_VALUE] = ' '.join(
             [self._param_dict[DATETIME_VALUE], self._param_dict[FILENAME_VALUE]])
 
+    @property
+    def exif(self) -> dict:
+        """完整EXIF信息字典，按需读取（最近读取的结果有缓存）"""
+        return load_exif(self.path)
+
+    def clone(self) -> 'ImageContainer':
+        """
+        复制容器，副本拥有独立的图像对象，在副本上运行Processor不会影响原容器
+        :return: 容器副本
+        """
+        other = copy.copy(self)
+        other.img = self.img.copy()
+        other.watermark_img = None
+        other._param_dict = dict(self._param_dict)
+        other.context = self.context.copy()
+        return other
+
     def print_info(self):
         """打印ImageContainer的信息"""
         print(f"图像路径: {self.path}")
@@ -302,50 +290,31 @@ class ImageContainer(object):
         if self.watermark_img is not None:
             self.watermark_img.close()
 
-    def save(self, target_path, quality=100):
+    def get_output_image(self) -> Image.Image:
+        """
+        获取待保存的图片：处理结果转为RGB，没有处理结果时返回原图
+        不修改容器本身，可以重复调用
+        """
         if self.watermark_img is None:
             print("{} has no watermark_img".format(self.name))
-            # 获取原始图片的DPI信息
-            dpi = self.img.info.get('dpi')
-            save_kwargs = {
-                'quality': quality,
-                'encoding': 'utf-8'
-            }
-            
-            # 如果有DPI信息，添加到保存参数中
-            if dpi:
-                save_kwargs['dpi'] = dpi
-            
-            # 如果有EXIF信息，也保留
-            if 'exif' in self.img.info:
-                save_kwargs['exif'] = self.img.info['exif']
-            
-            self.img.save(target_path, **save_kwargs)
-            return
+            return self.img
 
-        if self.orientation == "Rotate 0":
-            pass
-        elif self.orientation == "Rotate 90 CW":
-            self.watermark_img = self.watermark_img.transpose(Transpose.ROTATE_90)
-        elif self.orientation == "Rotate 180":
-            self.watermark_img = self.watermark_img.transpose(Transpose.ROTATE_180)
-        elif self.orientation == "Rotate 270 CW":
-            self.watermark_img = self.watermark_img.transpose(Transpose.ROTATE_270)
-        else:
-            pass
-
-        if self.watermark_img.mode != 'RGB':
-            self.watermark_img = self.watermark_img.convert('RGB')
+        image = self.watermark_img
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        return image
 
-        # 准备保存参数
-        save_kwargs = {
-            'quality': quality,
-            'encoding': 'utf-8'
-        }
+    def get_save_kwargs(self, image_format, quality=100, profile=None, size=None, strip_gps=False) -> dict:
+        """
+        生成保存参数：编码配置、DPI以及源文件的EXIF/ICC/XMP
+        :param size: 输出图片尺寸，写入EXIF；None 时使用处理结果的尺寸
+        :param strip_gps: 是否移除GPS位置信息
+        """
+        save_kwargs = encoder_options(image_format, quality, profile)
         
         # 获取DPI信息：首先检查是否有保存的DPI，然后检查原始图片
         dpi = None
-        if hasattr(self, '_saved_dpi'):
+        if self.watermark_img is not None and hasattr(self, '_saved_dpi'):
             dpi = self._saved_dpi
         elif 'dpi' in self.img.info:
             dpi = self.img.info.get('dpi')
@@ -353,11 +322,53 @@ class ImageContainer(object):
         if dpi:
             save_kwargs['dpi'] = dpi
         
-        # 如果有EXIF信息，也保留
-        if 'exif' in self.img.info:
-            save_kwargs['exif'] = self.img.info['exif']
-        
-        self.watermark_img.save(target_path, **save_kwargs)
+        if size is None:
+            image = self.watermark_img if self.watermark_img is not None else self.img
+            size = image.size
+        save_kwargs.update(metadata_save_kwargs(self.metadata, image_format, size, strip_gps))
+        return save_kwargs
+
+    def save(self, target_path, quality=100, profile=None, max_bytes=None, allow_scale=False, strip_gps=False):
+        """
+        保存图片
+        :param target_path: 目标路径，按扩展名选择格式
+        :param quality: 有损格式的质量；限制文件大小时为搜索的最高质量
+        :param profile: 编码配置（EncoderProfile 或其取值），None 使用默认配置
+        :param max_bytes: 文件大小上限，指定时在内存中搜索满足限制的质量
+        :param allow_scale: 限制文件大小时是否允许缩小尺寸
+        :param strip_gps: 是否移除GPS位置信息
+        :return: 限制文件大小时返回 SizeTargetResult，否则返回None
+        """
+        return self.write_to(target_path, format_for_path(target_path), quality, profile,
+                             max_bytes, allow_scale, strip_gps)
+
+    def write_to(self, fp, image_format: str, quality=100, profile=None, max_bytes=None, allow_scale=False,
+                 strip_gps=False):
+        """
+        按指定格式编码并写入文件或文件对象（如 BytesIO），参数和返回值见 save
+        :param fp: 文件路径或可写的二进制文件对象
+        :param image_format: PIL格式名，如 JPEG
+        """
+        image = self.get_output_image()
+        save_kwargs = self.get_save_kwargs(image_format, quality, profile, size=image.size, strip_gps=strip_gps)
+        try:
+            if max_bytes:
+                # 缩小尺寸后EXIF中记录的像素尺寸也要随之更新
+                result = encode_to_size(image, image_format, max_bytes, save_kwargs,
+                                        max_quality=quality, allow_scale=allow_scale,
+                                        kwargs_for_size=lambda size: metadata_save_kwargs(
+                                            self.metadata, image_format, size, strip_gps))
+                if isinstance(fp, (str, os.PathLike)):
+                    with open(fp, 'wb') as f:
+                        f.write(result.data)
+                else:
+                    fp.write(result.data)
+                return result
+            image.save(fp, format=image_format, **save_kwargs)
+            return None
+        finally:
+            if image is not self.img and image is not self.watermark_img:
+                image.close()
 
     def get_height(self):
         return self.get_watermark_img().height
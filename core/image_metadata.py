@@ -0,0 +1,167 @@
+"""
+图片元数据记录
+图片列表中每张图片只保存表格和水印用到的字段（__slots__，相同的品牌、型号、镜头等字符串只保存一份），
+不保存 exiftool 的完整输出和图片对象；需要完整EXIF时按需重新读取，最近读取的结果缓存在内存中
+"""
+
+import logging
+import os
+import re
+import sys
+from datetime import datetime
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image
+from dateutil import parser
+
+from config.constant import DEFAULT_VALUE
+from config.enums import ExifId
+from utils.exif_utils import (calculate_pixel_count, extract_attribute, extract_gps_info,
+                              extract_gps_lat_and_long, get_exif)
+
+logger = logging.getLogger(__name__)
+PATTERN = re.compile(r"(\d+)\.")  # 匹配小数
+
+# 完整EXIF缓存的图片数量
+EXIF_CACHE_SIZE = 64
+
+
+def get_datetime(exif) -> datetime:
+    dt = datetime.now()
+    try:
+        dt = parser.parse(extract_attribute(exif, ExifId.DATETIME.value,
+                                            default_value=str(datetime.now())))
+    except ValueError as e:
+        logger.info(f'Error: 时间格式错误：{extract_attribute(exif, ExifId.DATETIME.value)}')
+    return dt
+
+
+# 获取焦距与等效焦距
+def get_focal_length(exif):
+    focal_length = DEFAULT_VALUE
+    focal_length_in_35mm_film = DEFAULT_VALUE
+
+    try:
+        focal_lengths = PATTERN.findall(extract_attribute(exif, ExifId.FOCAL_LENGTH.value))
+        try:
+            focal_length = focal_lengths[0] if focal_length else DEFAULT_VALUE
+        except IndexError as e:
+            logger.info(
+                f'ValueError: 不存在焦距：{focal_lengths} : {e}')
+        try:
+            focal_length_in_35mm_film: str = focal_lengths[1] if focal_length else DEFAULT_VALUE
+        except IndexError as e:
+            logger.info(f'ValueError: 不存在 35mm 焦距：{focal_lengths} : {e}')
+    except Exception as e:
+        logger.info(f'KeyError: 焦距转换错误：{extract_attribute(exif, ExifId.FOCAL_LENGTH.value)} : {e}')
+
+    return focal_length, focal_length_in_35mm_film
+
+
+@lru_cache(maxsize=EXIF_CACHE_SIZE)
+def _cached_exif(path: str, mtime_ns: int) -> dict:
+    return get_exif(path)
+
+
+def load_exif(path: Path) -> dict:
+    """读取完整EXIF，文件未修改时使用缓存"""
+    try:
+        mtime_ns = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    return dict(_cached_exif(str(path), mtime_ns))
+
+
+def _intern(text) -> str:
+    return sys.intern(text) if isinstance(text, str) else text
+
+
+def parse_geo_info(exif: dict) -> str:
+    """EXIF中的GPS位置，没有时返回'无'"""
+    if 'GPSPosition' in exif:
+        return ' '.join(extract_gps_info(exif.get('GPSPosition')))
+    if 'GPSLatitude' in exif and 'GPSLongitude' in exif:
+        return ' '.join(extract_gps_lat_and_long((exif.get('GPSLatitude'), exif.get('GPSLongitude'))))
+    return '无'
+
+
+class ImageMetadata:
+    """
+    一张图片的元数据
+    字段名与 ImageContainer 相同，可以代替 ImageContainer 用于表格显示、排序和筛选
+    """
+    __slots__ = ('path', 'make', 'model', 'lens_model', 'lens_make', 'date', 'focal_length',
+                 'focal_length_in_35mm_film', 'f_number', 'exposure_time', 'iso',
+                 'original_width', 'original_height', 'orientation', 'geo_info')
+
+    def __init__(self, path: Path, make: str = '', model: str = '', lens_model: str = '', lens_make: str = '',
+                 date: Optional[datetime] = None, focal_length: str = DEFAULT_VALUE,
+                 focal_length_in_35mm_film: str = DEFAULT_VALUE, f_number: str = DEFAULT_VALUE,
+                 exposure_time: str = DEFAULT_VALUE, iso: str = DEFAULT_VALUE,
+                 original_width: int = 0, original_height: int = 0, orientation=1, geo_info: str = '无'):
+        self.path = path
+        self.make = _intern(make)
+        self.model = _intern(model)
+        self.lens_model = _intern(lens_model)
+        self.lens_make = _intern(lens_make)
+        self.date = date if date is not None else datetime.now()
+        self.focal_length = _intern(focal_length)
+        self.focal_length_in_35mm_film = _intern(focal_length_in_35mm_film)
+        self.f_number = _intern(f_number)
+        self.exposure_time = _intern(exposure_time)
+        self.iso = _intern(iso)
+        self.original_width = original_width
+        self.original_height = original_height
+        self.orientation = _intern(orientation)
+        self.geo_info = _intern(geo_info)
+
+    @classmethod
+    def from_exif(cls, path: Path, exif: dict, width: int, height: int) -> 'ImageMetadata':
+        """从 exiftool 的输出中提取需要的字段，exif 字典不被保留"""
+        focal_length, focal_length_in_35mm_film = get_focal_length(exif)
+        return cls(
+            path=path,
+            make=extract_attribute(exif, ExifId.CAMERA_MAKE.value),
+            model=extract_attribute(exif, ExifId.CAMERA_MODEL.value),
+            lens_model=extract_attribute(exif, *ExifId.LENS_MODEL.value),
+            lens_make=extract_attribute(exif, ExifId.LENS_MAKE.value),
+            date=get_datetime(exif),
+            focal_length=focal_length,
+            focal_length_in_35mm_film=focal_length_in_35mm_film,
+            f_number=extract_attribute(exif, ExifId.F_NUMBER.value, default_value=DEFAULT_VALUE),
+            exposure_time=extract_attribute(exif, ExifId.EXPOSURE_TIME.value, default_value=DEFAULT_VALUE, suffix='s'),
+            iso=extract_attribute(exif, ExifId.ISO.value, default_value=DEFAULT_VALUE),
+            original_width=width,
+            original_height=height,
+            orientation=exif.get(ExifId.ORIENTATION.value, 1),
+            geo_info=parse_geo_info(exif),
+        )
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def total_pixel(self) -> str:
+        return calculate_pixel_count(self.original_width, self.original_height)
+
+    @property
+    def datetime_str(self) -> str:
+        return datetime.strftime(self.date, '%Y-%m-%d %H:%M')
+
+    @property
+    def exif(self) -> dict:
+        """完整EXIF，按需读取"""
+        return load_exif(self.path)
+
+
+def read_image_metadata(path: Path) -> ImageMetadata:
+    """
+    读取图片的元数据记录，只解析文件头获取尺寸，不解码像素
+    :raise OSError: 图片无法打开
+    """
+    with Image.open(path) as img:
+        width, height = img.size
+    return ImageMetadata.from_exif(path, get_exif(path), width, height)
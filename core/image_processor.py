@@ -7,12 +7,12 @@ from PIL import ImageDraw
 
 from config.image_config import Config
 from core.image_container import ImageContainer
+from core.tiled import BandSource, AppendedBands, BlurredBackgroundBands, ImageBands, padded_bands
 from config.constant import GRAY
 from config.constant import TRANSPARENT
 from utils.image_utils import (append_image_by_side,concatenate_image,merge_images,padding_image,
                               resize_image_with_height,resize_image_with_width,square_image,text_to_image)
 
-from datetime import datetime
 printable = set(string.printable)
 
 NORMAL_HEIGHT = 1000
@@ -29,13 +29,32 @@ LINE_TRANSPARENT = Image.new('RGBA', (20, 1000), color=TRANSPARENT)
 class ProcessorComponent:
     """
     图片处理器组件
+    同一个实例会被多张图片、多个线程共享，process 中不能修改实例属性或 Config，
+    按图片计算的派生值应保存在局部变量或 container.context 中
     """
     LAYOUT_ID = None
     LAYOUT_NAME = None
+    # 是否会改变像素，全部为 False 的Processor链可以直接复制源文件
+    CHANGES_PIXELS = True
+    # 是否实现了分块处理 process_bands，用于超大图片
+    SUPPORTS_BANDS = False
 
     def __init__(self, config: Config):
         self.config = config
 
+    def changes_pixels(self) -> bool:
+        return self.CHANGES_PIXELS
+
+    def supports_bands(self) -> bool:
+        return self.SUPPORTS_BANDS
+
+    def process_bands(self, container: ImageContainer, bands: BandSource) -> BandSource:
+        """
+        分块处理：返回按横条描述处理结果的 BandSource，不生成完整图片
+        bands 为上一个Processor的结果，尺寸以 bands.size 为准
+        """
+        raise NotImplementedError
+
     def process(self, container: ImageContainer) -> None:
         """
         处理图片容器中的 watermark_img，将处理后的图片放回容器中
@@ -58,14 +77,30 @@ class ProcessorChain(ProcessorComponent):
         for component in self.components:
             component.process(container)
 
+    def changes_pixels(self) -> bool:
+        return any(component.changes_pixels() for component in self.components)
+
+    def supports_bands(self) -> bool:
+        return all(component.supports_bands() for component in self.components)
+
+    def process_bands(self, container: ImageContainer, bands: BandSource) -> BandSource:
+        for component in self.components:
+            bands = component.process_bands(container, bands)
+        return bands
+
 
 class EmptyProcessor(ProcessorComponent):
     LAYOUT_ID = 'empty'
     LAYOUT_NAME = '空处理器'
+    CHANGES_PIXELS = False
+    SUPPORTS_BANDS = True
 
     def process(self, container: ImageContainer) -> None:
         pass
 
+    def process_bands(self, container: ImageContainer, bands: BandSource) -> BandSource:
+        return bands
+
 class FitSizeProcessor(ProcessorComponent):
     LAYOUT_ID = 'fit size'
     LAYOUT_NAME = '调整尺寸'
@@ -102,13 +137,21 @@ class ShadowProcessor(ProcessorComponent):
 class MarginProcessor(ProcessorComponent):
     LAYOUT_ID = 'margin'
     LAYOUT_NAME = '边距'
+    SUPPORTS_BANDS = True
 
     def process(self, container: ImageContainer) -> None:
         config = self.config
         padding_size = int(config.get_white_margin_width() * min(container.get_width(), container.get_height()) / 100)
-        padding_img = padding_image(container.get_watermark_img(), padding_size, 'tlr', color=config.bg_color)
+        bg_color = container.context.bg_color or config.bg_color
+        padding_img = padding_image(container.get_watermark_img(), padding_size, 'tlr', color=bg_color)
         container.update_watermark_img(padding_img)
 
+    def process_bands(self, container: ImageContainer, bands: BandSource) -> BandSource:
+        config = self.config
+        padding_size = int(config.get_white_margin_width() * min(bands.size) / 100)
+        bg_color = container.context.bg_color or config.bg_color
+        return padded_bands(bands, padding_size, 'tlr', color=bg_color)
+
 
 class SimpleProcessor(ProcessorComponent):
     LAYOUT_ID = 'simple'
@@ -166,6 +209,7 @@ class SquareProcessor(ProcessorComponent):
 
 class WatermarkProcessor(ProcessorComponent):
     LAYOUT_ID = 'watermark'
+    SUPPORTS_BANDS = True
 
     def __init__(self, config: Config):
         super().__init__(config)
@@ -186,14 +230,16 @@ class WatermarkProcessor(ProcessorComponent):
     def is_logo_left(self):
         return self.logo_position == 'left'
 
-    def process(self, container: ImageContainer) -> None:
+    def create_watermark(self, container: ImageContainer, width: int) -> Image.Image:
         """
-        生成一个默认布局的水印图片
+        生成放在图片下方的水印条
         :param container: 图片对象
-        :return: 添加水印后的图片对象
+        :param width: 水印条宽度
+        :return: RGBA 水印条
         """
         config = self.config
-        config.bg_color = self.bg_color
+        # 后续的边距/边框Processor沿用水印的背景色
+        container.context.bg_color = self.bg_color
 
         # 下方水印的占比
         ratio = (.04 if container.get_ratio() >= 1 else .09) + 0.02 * config.get_font_padding_level()
@@ -262,7 +308,15 @@ class WatermarkProcessor(ProcessorComponent):
         right.close()
 
         # 缩放水印的大小
-        watermark = resize_image_with_width(watermark, container.get_width())
+        return resize_image_with_width(watermark, width)
+
+    def process(self, container: ImageContainer) -> None:
+        """
+        生成一个默认布局的水印图片
+        :param container: 图片对象
+        :return: 添加水印后的图片对象
+        """
+        watermark = self.create_watermark(container, container.get_width())
         # 将水印图片放置在原始图片的下方
         bg = ImageOps.expand(container.get_watermark_img().convert('RGBA'),
                              border=(0, 0, 0, watermark.height),
@@ -274,6 +328,13 @@ class WatermarkProcessor(ProcessorComponent):
         result = ImageOps.exif_transpose(result).convert('RGB')
         container.update_watermark_img(result)
 
+    def process_bands(self, container: ImageContainer, bands: BandSource) -> BandSource:
+        watermark = self.create_watermark(container, bands.width)
+        with Image.new('RGBA', watermark.size, color=self.bg_color) as bg:
+            strip = Image.alpha_composite(bg, watermark)
+        watermark.close()
+        return AppendedBands(bands, strip)
+
 
 class WatermarkRightLogoProcessor(WatermarkProcessor):
     LAYOUT_ID = 'watermark_right_logo'
@@ -358,6 +419,7 @@ GAUSSIAN_KERNEL_RADIUS = 35
 class BackgroundBlurProcessor(ProcessorComponent):
     LAYOUT_ID = 'background_blur'
     LAYOUT_NAME = '背景模糊'
+    SUPPORTS_BANDS = True
 
     def process(self, container: ImageContainer) -> None:
         background = container.get_watermark_img()
@@ -371,10 +433,17 @@ class BackgroundBlurProcessor(ProcessorComponent):
                           int(container.get_height() * PADDING_PERCENT_IN_BACKGROUND / 2)))
         container.update_watermark_img(background)
 
+    def process_bands(self, container: ImageContainer, bands: BandSource) -> BandSource:
+        width, height = bands.size
+        size = (int(width * (1 + PADDING_PERCENT_IN_BACKGROUND)), int(height * (1 + PADDING_PERCENT_IN_BACKGROUND)))
+        offset = (int(width * PADDING_PERCENT_IN_BACKGROUND / 2), int(height * PADDING_PERCENT_IN_BACKGROUND / 2))
+        return BlurredBackgroundBands(bands, size, bands, offset, GAUSSIAN_KERNEL_RADIUS)
+
 
 class BackgroundBlurWithWhiteBorderProcessor(ProcessorComponent):
     LAYOUT_ID = 'background_blur_with_white_border'
     LAYOUT_NAME = '背景模糊+白框'
+    SUPPORTS_BANDS = True
 
     def process(self, container: ImageContainer) -> None:
         padding_size = int(
@@ -391,17 +460,35 @@ class BackgroundBlurWithWhiteBorderProcessor(ProcessorComponent):
                                        int(padding_img.height * PADDING_PERCENT_IN_BACKGROUND / 2)))
         container.update_watermark_img(background)
 
+    def process_bands(self, container: ImageContainer, bands: BandSource) -> BandSource:
+        padding_size = int(self.config.get_white_margin_width() * min(bands.size) / 256)
+        padded = padded_bands(bands, padding_size, 'tblr', color='white')
+        size = (int(padded.width * (1 + PADDING_PERCENT_IN_BACKGROUND)),
+                int(padded.height * (1 + PADDING_PERCENT_IN_BACKGROUND)))
+        offset = (int(padded.width * PADDING_PERCENT_IN_BACKGROUND / 2),
+                  int(padded.height * PADDING_PERCENT_IN_BACKGROUND / 2))
+        # 与整张处理一致，背景取自原图
+        return BlurredBackgroundBands(ImageBands(container.get_img()), size, padded, offset, GAUSSIAN_KERNEL_RADIUS)
+
 
 class PureWhiteMarginProcessor(ProcessorComponent):
     LAYOUT_ID = 'pure_white_margin'
     LAYOUT_NAME = '白色边框'
+    SUPPORTS_BANDS = True
 
     def process(self, container: ImageContainer) -> None:
         config = self.config
         padding_size = int(config.get_white_margin_width() * min(container.get_width(), container.get_height()) / 100)
-        padding_img = padding_image(container.get_watermark_img(), padding_size, 'tlrb', color=config.bg_color)
+        bg_color = container.context.bg_color or config.bg_color
+        padding_img = padding_image(container.get_watermark_img(), padding_size, 'tlrb', color=bg_color)
         container.update_watermark_img(padding_img)
 
+    def process_bands(self, container: ImageContainer, bands: BandSource) -> BandSource:
+        config = self.config
+        padding_size = int(config.get_white_margin_width() * min(bands.size) / 100)
+        bg_color = container.context.bg_color or config.bg_color
+        return padded_bands(bands, padding_size, 'tlrb', color=bg_color)
+
 class CustomWatermarkProcessor(WatermarkProcessor):
     LAYOUT_ID = 'custom_watermark'
     LAYOUT_NAME = '水印 (自定义配置)'
@@ -428,22 +515,16 @@ class RoundedCornerProcessor(ProcessorComponent):
     """
     LAYOUT_ID = 'rounded_corner'
     LAYOUT_NAME = '圆角效果'
-    def __init__(self, config: Config):
-        super().__init__(config)
-        self.RoundedCornerRadius = None
+
     def process(self, container: ImageContainer) -> None:
         image = container.get_img()
-        if self.RoundedCornerRadius is None:
-            # 默认圆角半径设为图片较短边的1/10
-            self.RoundedCornerRadius = min(image.width, image.height) // 10
+        # 圆角半径设为图片较短边的1/10
+        radius = min(image.width, image.height) // 10
         mask = Image.new('L', image.size, 0)
         draw = ImageDraw.Draw(mask)
-        draw.rounded_rectangle((0, 0, image.width, image.height), radius=self.RoundedCornerRadius, fill=255)
+        draw.rounded_rectangle((0, 0, image.width, image.height), radius=radius, fill=255)
         rounded_image = ImageOps.fit(image, mask.size, centering=(0.5, 0.5))
         rounded_image.putalpha(mask)
-        timestamp = datetime.now().strftime('%Y%m%d%H%M%S%f')
-        image_path = f'./{timestamp}.png'
-        rounded_image.save(image_path)
         container.update_img(rounded_image)
 
 class RoundedCornerBlurProcessor(ProcessorComponent):
@@ -455,23 +536,20 @@ class RoundedCornerBlurProcessor(ProcessorComponent):
     LAYOUT_NAME = '圆角加背景虚化效果'
     def __init__(self, config: Config):
         super().__init__(config)
-        self.RoundedCornerRadius = None
         self.RoundedCorner_blur_radius = 35
     def process(self, container: ImageContainer) -> None:
         image = container.get_watermark_img()
         original_width, original_height = image.size  # 保存原图尺寸
 
-        if self.RoundedCornerRadius is None:
-            # 默认圆角半径设为图片较短边的1/10
-            self.RoundedCornerRadius = min(image.width, image.height) // 30
+        # 圆角半径设为图片较短边的1/30
+        radius = min(image.width, image.height) // 30
 
         # 创建遮罩并应用圆角效果
         mask = Image.new('L', image.size, 0)
         draw = ImageDraw.Draw(mask)
-        draw.rounded_rectangle((0, 0, image.width, image.height), radius=self.RoundedCornerRadius, fill=128)
+        draw.rounded_rectangle((0, 0, image.width, image.height), radius=radius, fill=128)
         rounded_image = ImageOps.fit(image, mask.size, centering=(0.5, 0.5))
         rounded_image.putalpha(mask)
-        mask.save("dd.png")
         background = container.get_watermark_img()
         background = background.filter(ImageFilter.GaussianBlur(radius=GAUSSIAN_KERNEL_RADIUS))
         fg = Image.new('RGB', (original_width, original_height), color=(255, 255, 255))
@@ -494,18 +572,16 @@ class RoundedCornerBlurShadowProcessor(ProcessorComponent):
         super().__init__(config)
         self.background_radio = 0.2
         self.shadow_radio = 0.03
-        self.RoundedCornerRadius = None
         self.RoundedCorner_blur_radius = 35
     def process(self, container: ImageContainer) -> None:
         image = container.get_watermark_img()
         original_width, original_height = image.size  # 保存原图尺寸
-        if self.RoundedCornerRadius is None:
-            # 默认圆角半径设为图片较短边的1/10
-            self.RoundedCornerRadius = min(image.width, image.height) // 30
+        # 圆角半径设为图片较短边的1/30
+        radius = min(image.width, image.height) // 30
         # 创建遮罩并应用圆角效果
         mask = Image.new('L', image.size, 0)
         draw = ImageDraw.Draw(mask)
-        draw.rounded_rectangle((0, 0, image.width, image.height), radius=self.RoundedCornerRadius, fill=256)
+        draw.rounded_rectangle((0, 0, image.width, image.height), radius=radius, fill=256)
         rounded_image = ImageOps.fit(image, mask.size, centering=(0.5, 0.5))
         rounded_image.putalpha(mask)
 
@@ -522,7 +598,6 @@ class RoundedCornerBlurShadowProcessor(ProcessorComponent):
         shadow_height = int(image.size[1] * (1 + self.shadow_radio))
         shadow = Image.new('RGBA', (shadow_width, shadow_height), color=(0, 0, 0, 0))
         shadow_draw = ImageDraw.Draw(shadow)
-        radius = self.RoundedCornerRadius
         fill_color = (0, 0, 0, 200)
         outline_color = 'red'
         outline_width = 0
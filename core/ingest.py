@@ -0,0 +1,57 @@
+"""
+源文件读取
+每个文件只从磁盘读取一次，同一份数据既交给 PIL 解码，也通过标准输入交给 exiftool 读取元数据；
+批量处理时在后台预读后面的若干个文件，读盘与处理重叠进行（网络共享目录上效果明显）
+"""
+
+import io
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, Iterator, Tuple
+
+from PIL import Image
+
+# 默认预读的文件数量
+PREFETCH_DEPTH = 2
+
+
+@dataclass
+class SourceFile:
+    """已读入内存的源文件"""
+    path: Path
+    data: bytes
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+    def open_image(self) -> Image.Image:
+        """从内存中打开图片，与 Image.open 一样延迟解码"""
+        return Image.open(io.BytesIO(self.data))
+
+
+def read_source(path: Path) -> SourceFile:
+    """一次性读取整个文件"""
+    path = Path(path)
+    with open(path, 'rb') as f:
+        return SourceFile(path, f.read())
+
+
+def prefetch_sources(paths: Iterable[Path], depth: int = PREFETCH_DEPTH) -> Iterator[Tuple[Path, Future]]:
+    """
+    按顺序返回 (路径, 读取任务)，读取任务的结果为 SourceFile，读取失败时 result() 抛出异常
+    后台最多提前读取 depth 个文件，内存中的文件数量有上限；提前结束迭代时取消未开始的读取
+    """
+    executor = ThreadPoolExecutor(max_workers=max(1, depth), thread_name_prefix='prefetch')
+    try:
+        queue = deque()
+        for path in paths:
+            queue.append((Path(path), executor.submit(read_source, path)))
+            if len(queue) > depth:
+                yield queue.popleft()
+        while queue:
+            yield queue.popleft()
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -1,12 +1,12 @@
 from dataclasses import dataclass
+from typing import Optional
 
 from config.image_config import Config
 
-from .image_processor import EmptyProcessor
+from .image_processor import ProcessorComponent
 from .image_processor import ShadowProcessor
 from .image_processor import MarginProcessor
 from .image_processor import SimpleProcessor
-from .image_processor import WatermarkProcessor
 from .image_processor import WatermarkLeftLogoProcessor
 from .image_processor import WatermarkRightLogoProcessor
 from .image_processor import DarkWatermarkLeftLogoProcessor
@@ -16,38 +16,68 @@ from .image_processor import PaddingToOriginalRatioProcessor
 from .image_processor import BackgroundBlurProcessor
 from .image_processor import BackgroundBlurWithWhiteBorderProcessor
 from .image_processor import PureWhiteMarginProcessor
-from .image_processor import CustomWatermarkProcessor
 from .image_processor import RoundedCornerProcessor
 from .image_processor import RoundedCornerBlurProcessor
 from .image_processor import RoundedCornerBlurShadowProcessor
-from .image_processor import FitSizeProcessor
-
-# 读取配置
-config = Config('config.yaml')
-
-EMPTY_PROCESSOR = EmptyProcessor(config)
-SHADOW_PROCESSOR = ShadowProcessor(config)
-MARGIN_PROCESSOR = MarginProcessor(config)
-SIMPLE_PROCESSOR = SimpleProcessor(config)
-WATERMARK_PROCESSOR = WatermarkProcessor(config)
-WATERMARK_LEFT_LOGO_PROCESSOR = WatermarkLeftLogoProcessor(config)
-WATERMARK_RIGHT_LOGO_PROCESSOR = WatermarkRightLogoProcessor(config)
-DARK_WATERMARK_LEFT_LOGO_PROCESSOR = DarkWatermarkLeftLogoProcessor(config)
-DARK_WATERMARK_RIGHT_LOGO_PROCESSOR = DarkWatermarkRightLogoProcessor(config)
-SQUARE_PROCESSOR = SquareProcessor(config)
-PADDING_TO_ORIGINAL_RATIO_PROCESSOR = PaddingToOriginalRatioProcessor(config)
-BACKGROUND_BLUR_PROCESSOR = BackgroundBlurProcessor(config)
-BACKGROUND_BLUR_WITH_WHITE_BORDER_PROCESSOR = BackgroundBlurWithWhiteBorderProcessor(config)
-PURE_WHITE_MARGIN_PROCESSOR = PureWhiteMarginProcessor(config)
-ROUNDED_CORNER_PROCESSOR = RoundedCornerProcessor(config)
-ROUNDED_CORNER_BLUR_PROCESSOR = RoundedCornerBlurProcessor(config)
-ROUNDED_CORNER_BLUR_SHADOW_PROCESSOR = RoundedCornerBlurShadowProcessor(config)
-FIT_SIZE_PROCESSOR = FitSizeProcessor(config)
+from .processor_registry import ProcessorRegistry
 
-SEPARATE_LINE = '+' + '-' * 15 + '+' + '-' * 15 + '+'
+# 配置和Processor都在第一次使用时创建：
+# config 在第一次访问时读取，XXX_PROCESSOR 通过注册表按需创建并缓存（见模块末尾的 __getattr__）
+_config: Optional[Config] = None
+_registry: Optional[ProcessorRegistry] = None
+_job_store = None
 
 
-from .image_processor import ProcessorComponent
+def get_config() -> Config:
+    """读取配置，只读取一次"""
+    global _config
+    if _config is None:
+        _config = Config('config.yaml')
+    return _config
+
+
+def get_registry() -> ProcessorRegistry:
+    """全局Processor注册表"""
+    global _registry
+    if _registry is None:
+        _registry = ProcessorRegistry(get_config())
+    return _registry
+
+
+def get_job_store():
+    """图形界面使用的批量处理任务记录（core.job_store.JobStore），第一次使用时才导入"""
+    global _job_store
+    if _job_store is None:
+        from .job_store import JobStore
+        _job_store = JobStore()
+    return _job_store
+
+
+# 模块属性名 -> Processor ID
+_PROCESSOR_NAMES = {
+    'EMPTY_PROCESSOR': 'empty',
+    'SHADOW_PROCESSOR': 'shadow',
+    'MARGIN_PROCESSOR': 'margin',
+    'SIMPLE_PROCESSOR': 'simple',
+    'WATERMARK_PROCESSOR': 'watermark',
+    'WATERMARK_LEFT_LOGO_PROCESSOR': 'watermark_left_logo',
+    'WATERMARK_RIGHT_LOGO_PROCESSOR': 'watermark_right_logo',
+    'DARK_WATERMARK_LEFT_LOGO_PROCESSOR': 'dark_watermark_left_logo',
+    'DARK_WATERMARK_RIGHT_LOGO_PROCESSOR': 'dark_watermark_right_logo',
+    'SQUARE_PROCESSOR': 'square',
+    'PADDING_TO_ORIGINAL_RATIO_PROCESSOR': 'padding_to_original_ratio',
+    'BACKGROUND_BLUR_PROCESSOR': 'background_blur',
+    'BACKGROUND_BLUR_WITH_WHITE_BORDER_PROCESSOR': 'background_blur_with_white_border',
+    'PURE_WHITE_MARGIN_PROCESSOR': 'pure_white_margin',
+    'CUSTOM_WATERMARK_PROCESSOR': 'custom_watermark',
+    'ROUNDED_CORNER_PROCESSOR': 'rounded_corner',
+    'ROUNDED_CORNER_BLUR_PROCESSOR': 'rounded_corner_blur',
+    'ROUNDED_CORNER_BLUR_SHADOW_PROCESSOR': 'rounded_corner_blur_shadow',
+    'FIT_SIZE_PROCESSOR': 'fit size',
+}
+
+SEPARATE_LINE = '+' + '-' * 15 + '+' + '-' * 15 + '+'
+
 
 @dataclass
 class ElementItem(object):
@@ -57,33 +87,49 @@ class ElementItem(object):
 class LayoutItem(object):
     name: str
     value: str
-    processor: ProcessorComponent
+
+    @property
+    def processor(self) -> ProcessorComponent:
+        return get_registry().get(self.value)
+
     @staticmethod
-    def from_processor(processor: ProcessorComponent):
-        return LayoutItem(processor.LAYOUT_NAME, processor.LAYOUT_ID, processor)
+    def from_class(processor_class: type):
+        return LayoutItem(processor_class.LAYOUT_NAME, processor_class.LAYOUT_ID)
 
 LAYOUT_ITEMS = [
-    LayoutItem.from_processor(SIMPLE_PROCESSOR),
-    LayoutItem.from_processor(SHADOW_PROCESSOR),
-    LayoutItem.from_processor(MARGIN_PROCESSOR),
+    LayoutItem.from_class(SimpleProcessor),
+    LayoutItem.from_class(ShadowProcessor),
+    LayoutItem.from_class(MarginProcessor),
 
-    LayoutItem.from_processor(SQUARE_PROCESSOR),
-    LayoutItem.from_processor(PADDING_TO_ORIGINAL_RATIO_PROCESSOR),
+    LayoutItem.from_class(SquareProcessor),
+    LayoutItem.from_class(PaddingToOriginalRatioProcessor),
 
-    LayoutItem.from_processor(BACKGROUND_BLUR_PROCESSOR),
-    LayoutItem.from_processor(BACKGROUND_BLUR_WITH_WHITE_BORDER_PROCESSOR),
-    LayoutItem.from_processor(PURE_WHITE_MARGIN_PROCESSOR),
+    LayoutItem.from_class(BackgroundBlurProcessor),
+    LayoutItem.from_class(BackgroundBlurWithWhiteBorderProcessor),
+    LayoutItem.from_class(PureWhiteMarginProcessor),
 
 
-    LayoutItem.from_processor(ROUNDED_CORNER_PROCESSOR),
-    LayoutItem.from_processor(ROUNDED_CORNER_BLUR_PROCESSOR),
-    LayoutItem.from_processor(ROUNDED_CORNER_BLUR_SHADOW_PROCESSOR),
+    LayoutItem.from_class(RoundedCornerProcessor),
+    LayoutItem.from_class(RoundedCornerBlurProcessor),
+    LayoutItem.from_class(RoundedCornerBlurShadowProcessor),
 
     # 水印处理器
-    LayoutItem.from_processor(WATERMARK_LEFT_LOGO_PROCESSOR),
-    LayoutItem.from_processor(WATERMARK_RIGHT_LOGO_PROCESSOR),
-    LayoutItem.from_processor(DARK_WATERMARK_LEFT_LOGO_PROCESSOR),
-    LayoutItem.from_processor(DARK_WATERMARK_RIGHT_LOGO_PROCESSOR),
+    LayoutItem.from_class(WatermarkLeftLogoProcessor),
+    LayoutItem.from_class(WatermarkRightLogoProcessor),
+    LayoutItem.from_class(DarkWatermarkLeftLogoProcessor),
+    LayoutItem.from_class(DarkWatermarkRightLogoProcessor),
 
 ]
 layout_items_dict = {item.value: item for item in LAYOUT_ITEMS}
+
+
+def __getattr__(name):
+    """config 和 XXX_PROCESSOR 在第一次访问时创建，之后缓存为模块属性"""
+    if name == 'config':
+        value = get_config()
+    elif name in _PROCESSOR_NAMES:
+        value = get_registry().get(_PROCESSOR_NAMES[name])
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    globals()[name] = value
+    return value
@@ -0,0 +1,474 @@
+"""
+批量处理任务记录
+每个任务中每张图片的状态（pending / running / done / failed）、尝试次数、耗时、输出文件和失败原因保存在SQLite中：
+程序崩溃或取消后从记录继续处理，已完成的图片不再处理；临时性错误（如网络存储的IO错误）按退避时间自动重试；
+失败的图片可以导出为列表重新处理
+
+    store = JobStore(path)
+    job_id = store.create_job(plan_outputs(file_list, options), params)
+    run_job(store, job_id, batch_process(processor_chain, options))
+"""
+
+import csv
+import errno
+import json
+import logging
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from core.batch_processor import BatchOptions, BatchResult, run_batch
+from core.cancellation import CancelToken
+from core.image_processor import ProcessorComponent
+from core.output_writer import remove_partials
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_JOB_STORE_PATH = Path("config/jobs.db")
+# 只在内存中记录（不需要继续处理时使用，仍然支持重试）
+MEMORY_STORE = ':memory:'
+SCHEMA_VERSION = 1
+# 每次取出处理的图片数量，也是崩溃后最多需要重新处理的数量
+DEFAULT_CHUNK_SIZE = 32
+# 保留的已结束任务数量，更早的记录在创建新任务时删除
+DEFAULT_KEEP_JOBS = 20
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    state TEXT NOT NULL,
+    params TEXT NOT NULL,
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS items (
+    job_id INTEGER NOT NULL,
+    seq INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    target TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    transient INTEGER NOT NULL DEFAULT 0,
+    retry_at REAL,
+    error TEXT,
+    output TEXT,
+    started_at REAL,
+    finished_at REAL,
+    PRIMARY KEY (job_id, source)
+);
+CREATE INDEX IF NOT EXISTS items_by_status ON items (job_id, status, seq);
+"""
+
+
+class JobState(Enum):
+    ACTIVE = "active"        # 未完成，可以继续
+    FINISHED = "finished"    # 所有图片都已处理完成或失败
+    ABANDONED = "abandoned"  # 用户放弃继续
+
+
+class ItemStatus(Enum):
+    PENDING = "pending"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+
+
+def is_transient(error: BaseException) -> bool:
+    """
+    是否是重试可能成功的错误：操作系统返回的IO错误（磁盘、网络存储、文件被占用等）、超时和内存不足；
+    文件不存在、图片格式错误、Processor出错等重试也不会成功
+    """
+    if isinstance(error, (MemoryError, TimeoutError)):
+        return True
+    # PIL的解码和编码错误也是 OSError，但没有 errno
+    return (isinstance(error, OSError) and error.errno is not None
+            and error.errno not in (errno.ENOENT, errno.ENOTDIR, errno.EISDIR))
+
+
+@dataclass
+class RetryPolicy:
+    """临时性错误的重试策略"""
+    max_attempts: int = 3    # 包括第一次处理
+    delay: float = 2.0       # 第一次重试前等待的秒数，之后每次加倍
+    max_delay: float = 60.0
+
+    def backoff(self, attempts: int) -> float:
+        """第 attempts 次处理失败后等待的秒数"""
+        return min(self.max_delay, self.delay * 2 ** max(0, attempts - 1))
+
+
+@dataclass
+class ItemOutcome:
+    """一张图片的处理结果，可以在进程间传递"""
+    source: Path
+    status: ItemStatus  # PENDING 表示没有处理（取消）
+    output: Optional[Path] = None
+    error: Optional[str] = None
+    transient: bool = False
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+
+@dataclass
+class JobInfo:
+    id: int
+    state: JobState
+    params: dict
+    created_at: str
+    updated_at: str
+    counts: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total(self) -> int:
+        return sum(self.counts.values())
+
+
+@dataclass
+class JobItem:
+    source: Path
+    target: Path
+    status: ItemStatus
+    attempts: int
+    error: Optional[str]
+    output: Optional[Path]
+    started_at: Optional[float]
+    finished_at: Optional[float]
+
+    @property
+    def elapsed(self) -> Optional[float]:
+        if self.started_at is None or self.finished_at is None:
+            return None
+        return self.finished_at - self.started_at
+
+
+def outcomes_from_result(result: BatchResult) -> List[ItemOutcome]:
+    """把 run_batch 的结果转换为每张图片的处理结果"""
+    failed = set(result.failed)
+    outputs = set(result.outputs)
+    outcomes = []
+    for source_path, target_path in result.plan.items():
+        started_at, finished_at = result.timings.get(source_path, (None, None))
+        if source_path in failed:
+            error = result.errors.get(source_path)
+            outcomes.append(ItemOutcome(source_path, ItemStatus.FAILED,
+                                        error=(str(error) or type(error).__name__) if error else "处理失败",
+                                        transient=error is not None and is_transient(error),
+                                        started_at=started_at, finished_at=finished_at))
+        elif target_path in outputs:
+            outcomes.append(ItemOutcome(source_path, ItemStatus.DONE, output=target_path,
+                                        started_at=started_at, finished_at=finished_at))
+        else:
+            outcomes.append(ItemOutcome(source_path, ItemStatus.PENDING))
+    return outcomes
+
+
+def _now() -> str:
+    return datetime.now().isoformat(timespec='seconds')
+
+
+class JobStore:
+    """
+    任务记录
+    数据库在第一次使用时打开，可以在多个线程中使用；路径为 MEMORY_STORE 时只保存在内存中
+    """
+
+    def __init__(self, path=DEFAULT_JOB_STORE_PATH):
+        self.path = path if path == MEMORY_STORE else Path(path)
+        self._lock = threading.RLock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            if self.path != MEMORY_STORE:
+                self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            try:
+                version = connection.execute("PRAGMA user_version").fetchone()[0]
+                if version > SCHEMA_VERSION:
+                    raise RuntimeError(f"任务数据库 {self.path} 的版本 ({version}) 高于当前程序支持的版本 ({SCHEMA_VERSION})")
+                # 每段处理完成后提交一次；WAL 模式下程序崩溃不会丢失已提交的记录
+                connection.execute("PRAGMA journal_mode = WAL")
+                connection.execute("PRAGMA synchronous = NORMAL")
+                if version < SCHEMA_VERSION:
+                    with connection:
+                        connection.executescript(_SCHEMA)
+                        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            except Exception:
+                connection.close()
+                raise
+            self._connection = connection
+        return self._connection
+
+    # ---- 任务 ----
+
+    def create_job(self, plan: Dict[Path, Path], params: Optional[dict] = None,
+                   keep_jobs: int = DEFAULT_KEEP_JOBS) -> int:
+        """
+        创建任务
+        :param plan: 源文件 -> 输出文件，继续处理和重试时使用相同的输出路径
+        :param params: 继续处理时需要的参数（处理链、输出设置等），必须可以序列化为JSON
+        :param keep_jobs: 保留的已结束任务数量
+        :return: 任务ID
+        """
+        now = _now()
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                job_id = connection.execute(
+                    "INSERT INTO jobs (state, params, created_at, updated_at) VALUES (?, ?, ?, ?)",
+                    (JobState.ACTIVE.value, json.dumps(params or {}, ensure_ascii=False), now, now)).lastrowid
+                connection.executemany(
+                    "INSERT OR IGNORE INTO items (job_id, seq, source, target, status) VALUES (?, ?, ?, ?, ?)",
+                    ((job_id, seq, str(source), str(target), ItemStatus.PENDING.value)
+                     for seq, (source, target) in enumerate(plan.items())))
+                self._prune(connection, keep_jobs)
+        return job_id
+
+    @staticmethod
+    def _prune(connection: sqlite3.Connection, keep_jobs: int):
+        stale = [row[0] for row in connection.execute(
+            "SELECT id FROM jobs WHERE state != ? ORDER BY id DESC LIMIT -1 OFFSET ?",
+            (JobState.ACTIVE.value, keep_jobs))]
+        for job_id in stale:
+            connection.execute("DELETE FROM items WHERE job_id = ?", (job_id,))
+            connection.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def _job_from_row(self, row) -> JobInfo:
+        job_id, state, params, created_at, updated_at = row
+        return JobInfo(job_id, JobState(state), json.loads(params), created_at, updated_at, self.counts(job_id))
+
+    def get_job(self, job_id: int) -> Optional[JobInfo]:
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT id, state, params, created_at, updated_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            return self._job_from_row(row) if row is not None else None
+
+    def jobs(self, active_only: bool = False) -> List[JobInfo]:
+        """所有任务，新任务在前"""
+        query = "SELECT id, state, params, created_at, updated_at FROM jobs"
+        args = ()
+        if active_only:
+            query += " WHERE state = ?"
+            args = (JobState.ACTIVE.value,)
+        with self._lock:
+            rows = self._connect().execute(query + " ORDER BY id DESC", args).fetchall()
+            return [self._job_from_row(row) for row in rows]
+
+    def _set_state(self, job_id: int, state: JobState):
+        with self._lock, self._connect() as connection:
+            connection.execute("UPDATE jobs SET state = ?, updated_at = ? WHERE id = ?", (state.value, _now(), job_id))
+
+    def abandon(self, job_id: int):
+        """放弃继续处理"""
+        self._set_state(job_id, JobState.ABANDONED)
+
+    def counts(self, job_id: int) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._connect().execute(
+                "SELECT status, COUNT(*) FROM items WHERE job_id = ? GROUP BY status", (job_id,)))
+
+    # ---- 处理 ----
+
+    def recover(self, job_id: int) -> List[Path]:
+        """
+        继续处理前调用：上次运行中断（崩溃）时处于 running 的图片重新排队，不计入尝试次数
+        （一段中的图片同时处于 running，无法确定是哪一张导致了崩溃）
+        :return: 重新排队的图片的输出文件
+        """
+        with self._lock, self._connect() as connection:
+            targets = [Path(row[0]) for row in connection.execute(
+                "SELECT target FROM items WHERE job_id = ? AND status = ?", (job_id, ItemStatus.RUNNING.value))]
+            self._requeue_running(connection, job_id)
+            return targets
+
+    @staticmethod
+    def _requeue_running(connection: sqlite3.Connection, job_id: int):
+        connection.execute(
+            "UPDATE items SET status = ?, attempts = MAX(attempts - 1, 0), started_at = NULL "
+            "WHERE job_id = ? AND status = ?",
+            (ItemStatus.PENDING.value, job_id, ItemStatus.RUNNING.value))
+
+    def claim(self, job_id: int, limit: Optional[int], policy: RetryPolicy) -> Dict[Path, Path]:
+        """
+        取出待处理的图片（按加入顺序），以及已到重试时间的临时性失败，标记为 running
+        :param limit: 最多取出的数量，None 表示全部
+        :return: 源文件 -> 输出文件
+        """
+        now = time.time()
+        with self._lock, self._connect() as connection:
+            rows = connection.execute(
+                "SELECT source, target FROM items WHERE job_id = ? AND (status = ? OR "
+                "(status = ? AND transient = 1 AND attempts < ? AND retry_at <= ?)) ORDER BY seq LIMIT ?",
+                (job_id, ItemStatus.PENDING.value, ItemStatus.FAILED.value, policy.max_attempts, now,
+                 -1 if limit is None else limit)).fetchall()
+            connection.executemany(
+                "UPDATE items SET status = ?, attempts = attempts + 1, started_at = ?, finished_at = NULL "
+                "WHERE job_id = ? AND source = ?",
+                ((ItemStatus.RUNNING.value, now, job_id, source) for source, _ in rows))
+        return {Path(source): Path(target) for source, target in rows}
+
+    def next_retry_delay(self, job_id: int, policy: RetryPolicy) -> Optional[float]:
+        """距离下一次重试的秒数，没有需要重试的图片时返回None"""
+        with self._lock:
+            retry_at = self._connect().execute(
+                "SELECT MIN(retry_at) FROM items WHERE job_id = ? AND status = ? AND transient = 1 AND attempts < ?",
+                (job_id, ItemStatus.FAILED.value, policy.max_attempts)).fetchone()[0]
+        return None if retry_at is None else max(0.0, retry_at - time.time())
+
+    def record(self, job_id: int, outcomes: Iterable[ItemOutcome], policy: RetryPolicy):
+        """记录处理结果（一次提交）；临时性失败按尝试次数计算下次重试的时间"""
+        now = time.time()
+        with self._lock, self._connect() as connection:
+            for outcome in outcomes:
+                source = str(outcome.source)
+                if outcome.status == ItemStatus.PENDING:
+                    # 没有处理（取消），不计入尝试次数
+                    connection.execute(
+                        "UPDATE items SET status = ?, attempts = MAX(attempts - 1, 0), started_at = NULL "
+                        "WHERE job_id = ? AND source = ? AND status = ?",
+                        (ItemStatus.PENDING.value, job_id, source, ItemStatus.RUNNING.value))
+                    continue
+                finished_at = outcome.finished_at or now
+                retry_at = None
+                if outcome.status == ItemStatus.FAILED and outcome.transient:
+                    attempts = connection.execute("SELECT attempts FROM items WHERE job_id = ? AND source = ?",
+                                                  (job_id, source)).fetchone()
+                    retry_at = finished_at + policy.backoff(attempts[0] if attempts else 1)
+                connection.execute(
+                    "UPDATE items SET status = ?, output = ?, error = ?, transient = ?, retry_at = ?, "
+                    "started_at = COALESCE(?, started_at), finished_at = ? WHERE job_id = ? AND source = ?",
+                    (outcome.status.value, str(outcome.output) if outcome.output else None, outcome.error,
+                     int(outcome.transient), retry_at, outcome.started_at, finished_at, job_id, source))
+
+    def release(self, job_id: int, cancelled: bool):
+        """
+        一段处理结束后，没有记录结果的 running 图片：取消时重新排队（不计入尝试次数），否则标记为失败
+        """
+        with self._lock, self._connect() as connection:
+            if cancelled:
+                self._requeue_running(connection, job_id)
+            else:
+                connection.execute(
+                    "UPDATE items SET status = ?, error = ?, transient = 0, finished_at = ? "
+                    "WHERE job_id = ? AND status = ?",
+                    (ItemStatus.FAILED.value, "没有处理结果", time.time(), job_id, ItemStatus.RUNNING.value))
+
+    def finish(self, job_id: int):
+        self._set_state(job_id, JobState.FINISHED)
+
+    # ---- 查询和导出 ----
+
+    def items(self, job_id: int, status: Optional[ItemStatus] = None) -> List[JobItem]:
+        """任务中的图片（按加入顺序），可以按状态筛选"""
+        query = ("SELECT source, target, status, attempts, error, output, started_at, finished_at "
+                 "FROM items WHERE job_id = ?")
+        args = (job_id,)
+        if status is not None:
+            query += " AND status = ?"
+            args += (status.value,)
+        with self._lock:
+            rows = self._connect().execute(query + " ORDER BY seq", args).fetchall()
+        return [JobItem(Path(source), Path(target), ItemStatus(item_status), attempts, error,
+                        Path(output) if output else None, started_at, finished_at)
+                for source, target, item_status, attempts, error, output, started_at, finished_at in rows]
+
+    def export_failed(self, job_id: int, path: Path) -> int:
+        """
+        导出失败的图片：.csv / .json 包含失败原因和尝试次数，其他扩展名每行一个源文件路径
+        （可以用 python -m cli @列表文件 重新处理）
+        :return: 导出的数量
+        """
+        path = Path(path)
+        failed = self.items(job_id, ItemStatus.FAILED)
+        records = [{'source': str(item.source), 'target': str(item.target), 'attempts': item.attempts,
+                    'error': item.error} for item in failed]
+        if path.suffix.lower() == '.csv':
+            with open(path, 'w', encoding='utf-8-sig', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=['source', 'target', 'attempts', 'error'])
+                writer.writeheader()
+                writer.writerows(records)
+        elif path.suffix.lower() == '.json':
+            path.write_text(json.dumps(records, ensure_ascii=False, indent=2) + '\n', encoding='utf-8')
+        else:
+            path.write_text(''.join(f"{record['source']}\n" for record in records), encoding='utf-8')
+        return len(records)
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+ProgressCallback = Callable[[int, int, Path], bool]
+RecordCallback = Callable[[List[ItemOutcome]], None]
+# 处理一段图片：(源文件 -> 输出文件, 进度回调, 记录结果的回调)
+ProcessFunction = Callable[[Dict[Path, Path], ProgressCallback, RecordCallback], None]
+
+
+def batch_process(processor_chain: ProcessorComponent, options: BatchOptions,
+                  merged: Optional[BatchResult] = None) -> ProcessFunction:
+    """
+    run_job 的处理函数：在当前线程中用 run_batch 处理每一段
+    :param merged: 不为None时合并每一段的处理结果（用于显示文件大小、质量等统计）
+    """
+    def process(plan: Dict[Path, Path], progress_callback: ProgressCallback, record: RecordCallback):
+        result = run_batch(list(plan), processor_chain, options, progress_callback=progress_callback, plan=plan)
+        record(outcomes_from_result(result))
+        if merged is not None:
+            merged.merge(result)
+    return process
+
+
+def run_job(store: JobStore, job_id: int, process: ProcessFunction, policy: Optional[RetryPolicy] = None,
+            token: Optional[CancelToken] = None, chunk_size: Optional[int] = DEFAULT_CHUNK_SIZE,
+            progress_callback: Optional[ProgressCallback] = None) -> Dict[str, int]:
+    """
+    处理任务中未完成的图片，直到全部完成（或失败且不能重试）或取消；可以在崩溃或取消后再次调用继续处理
+    :param process: 处理函数，每处理完一部分图片调用一次记录回调，见 batch_process
+    :param token: 取消标记，取消后已开始的一段处理完（由 process 决定），未处理的图片保持待处理
+    :param chunk_size: 每段处理的图片数量，None 表示一次取出全部（process 需要自己分批记录结果）
+    :param progress_callback: (已处理数, 总数, 源文件)，返回False时取消
+    :return: 任务中各状态的图片数量
+    """
+    policy = policy or RetryPolicy()
+    token = token or CancelToken()
+    recovered = store.recover(job_id)
+    if recovered:
+        removed = sum(remove_partials(target_path) for target_path in recovered)
+        print(f"继续上次中断的处理，重新处理 {len(recovered)} 张图片，删除 {removed} 个未写完的临时文件")
+
+    while not token.cancelled:
+        plan = store.claim(job_id, chunk_size, policy)
+        if not plan:
+            delay = store.next_retry_delay(job_id, policy)
+            if delay is None:
+                break
+            print(f"等待 {delay:.1f} 秒后重试失败的图片")
+            token.wait(delay)
+            continue
+
+        counts = store.counts(job_id)
+        total = sum(counts.values())
+        handled = counts.get(ItemStatus.DONE.value, 0) + counts.get(ItemStatus.FAILED.value, 0)
+
+        def report(i: int, _: int, path: Path) -> bool:
+            if progress_callback is not None and progress_callback(min(handled + i, total), total, path) is False:
+                token.cancel()
+            return not token.cancelled
+
+        try:
+            process(plan, report, lambda outcomes: store.record(job_id, outcomes, policy))
+        except BaseException:
+            store.release(job_id, cancelled=True)
+            raise
+        store.release(job_id, cancelled=token.cancelled)
+
+    if not token.cancelled:
+        store.finish(job_id)
+    return store.counts(job_id)
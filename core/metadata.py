@@ -0,0 +1,225 @@
+"""
+元数据传递
+读取源图片的 EXIF / ICC / XMP，保存时随编码参数一次写入输出文件：
+像素已按方向转正，因此 Orientation 重置为 1，并更新 EXIF 中记录的像素尺寸。
+不需要调用 exiftool，也不需要再次读写输出文件
+"""
+
+import os
+import re
+import shutil
+from contextlib import nullcontext
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+from PIL import ExifTags, Image, PngImagePlugin
+
+ORIENTATION_TAG = 0x0112
+XMP_TAG = 0x02BC
+MAKER_NOTE_TAG = 0x927C
+PIXEL_X_DIMENSION_TAG = 0xA002
+PIXEL_Y_DIMENSION_TAG = 0xA003
+# 子IFD指针，TIFF 输出时由编码器重新排布，无法原样写入
+_SUB_IFD_POINTERS = {ExifTags.IFD.Exif, ExifTags.IFD.GPSInfo, ExifTags.IFD.Interop}
+# JPEG 的 APP1 段最大长度
+MAX_JPEG_EXIF_BYTES = 65533
+
+# 支持写入 ICC 配置文件的格式
+ICC_FORMATS = {'JPEG', 'PNG', 'WEBP', 'TIFF'}
+# 支持写入 EXIF 的格式
+EXIF_FORMATS = {'JPEG', 'PNG', 'WEBP', 'TIFF'}
+
+# EXIF Orientation 对应的变换
+_ORIENTATION_TRANSPOSE = {
+    2: [Image.Transpose.FLIP_LEFT_RIGHT],
+    3: [Image.Transpose.ROTATE_180],
+    4: [Image.Transpose.FLIP_TOP_BOTTOM],
+    5: [Image.Transpose.TRANSPOSE],
+    6: [Image.Transpose.ROTATE_270],
+    7: [Image.Transpose.TRANSVERSE],
+    8: [Image.Transpose.ROTATE_90],
+}
+
+_XMP_ORIENTATION = re.compile(rb'(tiff:Orientation\s*=\s*["\']|<tiff:Orientation>)\s*\d')
+# XMP 中的 GPS 属性（exif:GPSLatitude="..."）和元素（<exif:GPSLatitude>...</exif:GPSLatitude>）
+_XMP_GPS = re.compile(rb'\s+exif:GPS\w+\s*=\s*("[^"]*"|\'[^\']*\')|<exif:(GPS\w+)\b[^>]*?(/>|>.*?</exif:\2>)', re.S)
+
+# JPEG APP1 段的标识
+JPEG_EXIF_HEADER = b'Exif\x00\x00'
+JPEG_XMP_HEADER = b'http://ns.adobe.com/xap/1.0/\x00'
+
+
+def apply_orientation(image: Image.Image, orientation) -> Image.Image:
+    """按 EXIF Orientation 把像素转正"""
+    for method in _ORIENTATION_TRANSPOSE.get(orientation, []):
+        image = image.transpose(method)
+    return image
+
+
+@dataclass
+class SourceMetadata:
+    """
+    源图片的元数据
+    输出为 TIFF 时只能保留 IFD0 中的标签（相机、时间、版权等），拍摄参数等子IFD不写入
+    """
+    exif: Optional[bytes] = None
+    icc_profile: Optional[bytes] = None
+    xmp: Optional[bytes] = None
+    orientation: int = 1
+
+    @classmethod
+    def from_image(cls, img: Image.Image) -> 'SourceMetadata':
+        info = img.info
+        exif = info.get('exif')
+        if isinstance(exif, str):
+            exif = exif.encode('latin-1')
+        xmp = info.get('xmp') or info.get('XML:com.adobe.xmp')
+        if isinstance(xmp, str):
+            xmp = xmp.encode('utf-8')
+        try:
+            orientation = img.getexif().get(ORIENTATION_TAG, 1)
+        except Exception:
+            orientation = 1
+        return cls(exif=exif or None, icc_profile=info.get('icc_profile') or None,
+                   xmp=xmp or None, orientation=orientation)
+
+    def has_gps(self) -> bool:
+        """是否包含GPS位置信息"""
+        if self.xmp and _XMP_GPS.search(self.xmp):
+            return True
+        if not self.exif:
+            return False
+        try:
+            exif = Image.Exif()
+            exif.load(self.exif)
+            return bool(exif.get_ifd(ExifTags.IFD.GPSInfo))
+        except Exception:
+            return False
+
+
+def _build_exif(exif_bytes: bytes, size: Optional[Tuple[int, int]], strip_gps: bool = False) -> Image.Exif:
+    exif = Image.Exif()
+    exif.load(exif_bytes)
+    if strip_gps:
+        exif.get_ifd(ExifTags.IFD.GPSInfo)
+        exif.pop(ExifTags.IFD.GPSInfo, None)
+    if size is not None:
+        exif[ORIENTATION_TAG] = 1
+        exif_ifd = exif.get_ifd(ExifTags.IFD.Exif)
+        if exif_ifd:
+            exif_ifd[PIXEL_X_DIMENSION_TAG] = size[0]
+            exif_ifd[PIXEL_Y_DIMENSION_TAG] = size[1]
+    return exif
+
+
+def _tiff_exif(exif: Image.Exif) -> Image.Exif:
+    """只保留 IFD0 中的标签"""
+    tiff_exif = Image.Exif()
+    for tag, value in exif.items():
+        if tag not in _SUB_IFD_POINTERS:
+            tiff_exif[tag] = value
+    return tiff_exif
+
+
+def _reset_xmp_orientation(xmp: bytes) -> bytes:
+    return _XMP_ORIENTATION.sub(lambda m: m.group(1) + b'1', xmp)
+
+
+def _strip_xmp_gps(xmp: bytes) -> bytes:
+    return _XMP_GPS.sub(b'', xmp)
+
+
+def metadata_save_kwargs(metadata: Optional[SourceMetadata], image_format: Optional[str],
+                         size: Tuple[int, int], strip_gps: bool = False) -> dict:
+    """
+    生成写入元数据的 Image.save 参数
+    :param metadata: 源图片元数据
+    :param image_format: 输出格式
+    :param size: 输出图片尺寸
+    :param strip_gps: 是否移除GPS位置信息
+    :return: 参数字典
+    """
+    kwargs = {}
+    if metadata is None or image_format is None:
+        return kwargs
+
+    if metadata.icc_profile and image_format in ICC_FORMATS:
+        kwargs['icc_profile'] = metadata.icc_profile
+
+    xmp = _reset_xmp_orientation(metadata.xmp) if metadata.xmp else None
+    if xmp and strip_gps:
+        xmp = _strip_xmp_gps(xmp)
+
+    exif = None
+    if metadata.exif and image_format in EXIF_FORMATS:
+        try:
+            exif = _build_exif(metadata.exif, size, strip_gps)
+        except Exception as e:
+            print(f"解析EXIF失败，输出文件将不包含EXIF: {e}")
+
+    if exif is not None:
+        exif_bytes = exif.tobytes()
+        if image_format == 'JPEG' and len(exif_bytes) > MAX_JPEG_EXIF_BYTES:
+            # 厂商私有数据（MakerNote）可能让EXIF超出JPEG单个段的长度限制
+            exif.get_ifd(ExifTags.IFD.Exif).pop(MAKER_NOTE_TAG, None)
+            exif_bytes = exif.tobytes()
+            if len(exif_bytes) > MAX_JPEG_EXIF_BYTES:
+                print("EXIF过长，输出文件将不包含EXIF")
+                exif_bytes = None
+        if image_format == 'TIFF':
+            # TIFF 的 XMP 作为普通标签与 EXIF 一起写入
+            exif = _tiff_exif(exif)
+            if xmp:
+                exif[XMP_TAG] = xmp
+                xmp = None
+            kwargs['exif'] = exif
+        elif exif_bytes:
+            kwargs['exif'] = exif_bytes
+
+    if xmp:
+        if image_format in ('JPEG', 'WEBP'):
+            kwargs['xmp'] = xmp
+        elif image_format == 'PNG':
+            pnginfo = PngImagePlugin.PngInfo()
+            pnginfo.add_itxt('XML:com.adobe.xmp', xmp.decode('utf-8', errors='ignore'))
+            kwargs['pnginfo'] = pnginfo
+        elif image_format == 'TIFF':
+            exif = Image.Exif()
+            exif[XMP_TAG] = xmp
+            kwargs['exif'] = exif
+    return kwargs
+
+
+def rewrite_jpeg_metadata(source, target_path, metadata: SourceMetadata, strip_gps: bool = False) -> None:
+    """
+    逐段复制JPEG，只改写 APP1 中的 EXIF / XMP，压缩数据原样复制，不重新编码
+    像素未转正，方向信息保持不变
+    :param source: 源文件路径，或已打开的二进制文件对象
+    """
+    exif = xmp = None
+    if metadata.exif:
+        exif = _build_exif(metadata.exif, None, strip_gps).tobytes()
+    if metadata.xmp and strip_gps:
+        xmp = JPEG_XMP_HEADER + _strip_xmp_gps(metadata.xmp)
+
+    source_file = open(source, 'rb') if isinstance(source, (str, os.PathLike)) else nullcontext(source)
+    with source_file as src, open(target_path, 'wb') as dst:
+        if src.read(2) != b'\xff\xd8':
+            raise ValueError(f"不是JPEG文件: {source}")
+        dst.write(b'\xff\xd8')
+        while True:
+            marker = src.read(2)
+            if len(marker) < 2 or marker[0] != 0xFF:
+                raise ValueError(f"JPEG文件结构错误: {source}")
+            # 扫描数据开始（SOS）之后的内容直接复制
+            if marker[1] in (0xDA, 0xD9):
+                dst.write(marker)
+                shutil.copyfileobj(src, dst)
+                return
+            length = int.from_bytes(src.read(2), 'big')
+            payload = src.read(length - 2)
+            if marker[1] == 0xE1 and exif is not None and payload.startswith(JPEG_EXIF_HEADER):
+                payload = exif
+            elif marker[1] == 0xE1 and xmp is not None and payload.startswith(JPEG_XMP_HEADER):
+                payload = xmp
+            dst.write(marker + (len(payload) + 2).to_bytes(2, 'big') + payload)
@@ -0,0 +1,250 @@
+"""
+列式元数据存储
+图片列表中用于排序、筛选的字段按列保存在类型化的 array 中（拍摄时间为 int64 时间戳，
+相机品牌、型号、镜头保存为字符串池中的编号），排序和筛选直接在整列上进行，
+不需要逐个访问 ImageContainer 对象
+"""
+
+import operator
+import re
+from array import array
+from datetime import datetime
+from itertools import compress
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from dateutil import parser as date_parser
+
+# 数值缺失时的取值，升序排序时排在最前
+MISSING = -1
+
+# 列名及对应的 array 类型码
+NUMERIC_COLUMNS = {
+    'timestamp': 'q',      # 拍摄时间（Unix 时间戳，秒）
+    'file_size': 'q',      # 文件大小（字节）
+    'iso': 'l',
+    'f_number': 'd',
+    'focal_length': 'd',   # 毫米
+    'exposure_time': 'd',  # 秒
+    'width': 'l',
+    'height': 'l',
+}
+STRING_COLUMNS = ('make', 'model', 'lens')
+
+# 筛选表达式中可以使用的列名，包括表头名称
+COLUMN_ALIASES = {
+    'time': 'timestamp', 'date': 'timestamp', '拍摄时间': 'timestamp',
+    'size': 'file_size', '文件大小': 'file_size',
+    'iso': 'iso', 'ISO': 'iso',
+    'f': 'f_number', 'aperture': 'f_number', '光圈': 'f_number',
+    'focal': 'focal_length', '焦距': 'focal_length',
+    'exposure': 'exposure_time', 'shutter': 'exposure_time', '曝光时间': 'exposure_time',
+    'width': 'width', 'height': 'height',
+    'make': 'make', '相机品牌': 'make',
+    'model': 'model', '相机型号': 'model',
+    'lens': 'lens', '镜头型号': 'lens',
+}
+
+_OPERATORS = {
+    '>=': operator.ge, '<=': operator.le, '!=': operator.ne,
+    '>': operator.gt, '<': operator.lt, '=': operator.eq, '==': operator.eq,
+}
+# 比较运算符反转后可以直接用左操作数的方法作用于整列：column > value 等价于 value < column
+_REFLECTED = {
+    operator.gt: '__lt__', operator.ge: '__le__', operator.lt: '__gt__',
+    operator.le: '__ge__', operator.eq: '__eq__', operator.ne: '__ne__',
+}
+_CONDITION = re.compile(r'^\s*(.+?)\s*(>=|<=|!=|==|>|<|=)\s*(.*?)\s*$')
+_CONJUNCTION = re.compile(r'\s+and\s+|\s*&&\s*|\s*;\s*|\s*并且\s*', re.I)
+_NUMBER = re.compile(r'\d+(?:\.\d+)?')
+
+Condition = Tuple[str, str, Union[int, float, str]]
+
+
+def _parse_number(text) -> float:
+    match = _NUMBER.search(str(text)) if text else None
+    return float(match.group()) if match else MISSING
+
+
+def _parse_exposure(text) -> float:
+    """曝光时间，如 1/250s、0.5s、2"""
+    text = str(text or '').strip().rstrip('s').strip()
+    try:
+        if '/' in text:
+            numerator, denominator = text.split('/', 1)
+            return float(numerator) / float(denominator)
+        return float(text)
+    except (ValueError, ZeroDivisionError):
+        return MISSING
+
+
+class StringPool:
+    """字符串与编号的双向映射，相同的字符串只保存一份"""
+
+    def __init__(self):
+        self.strings: List[str] = []
+        self._codes: Dict[str, int] = {}
+
+    def __len__(self):
+        return len(self.strings)
+
+    def code(self, text: str) -> int:
+        """字符串的编号，不存在时新增"""
+        text = text or ''
+        code = self._codes.get(text)
+        if code is None:
+            code = self._codes[text] = len(self.strings)
+            self.strings.append(text)
+        return code
+
+    def find(self, text: str) -> int:
+        """已有字符串的编号，不存在时返回 MISSING"""
+        return self._codes.get(text or '', MISSING)
+
+    def ranks(self) -> array:
+        """按字符串排序后每个编号的名次，用于按字符串列排序"""
+        ranks = array('l', [0]) * len(self.strings)
+        for rank, code in enumerate(sorted(range(len(self.strings)), key=self.strings.__getitem__)):
+            ranks[code] = rank
+        return ranks
+
+
+class MetadataStore:
+    """
+    按列保存的图片元数据，第 i 行对应图片列表中的第 i 张图片
+    """
+
+    def __init__(self):
+        self.columns: Dict[str, array] = {name: array(code) for name, code in NUMERIC_COLUMNS.items()}
+        for name in STRING_COLUMNS:
+            self.columns[name] = array('l')
+        self.pools: Dict[str, StringPool] = {name: StringPool() for name in STRING_COLUMNS}
+
+    def __len__(self):
+        return len(self.columns['timestamp'])
+
+    @classmethod
+    def from_images(cls, images: Iterable, file_sizes: Optional[Iterable[Optional[int]]] = None) -> 'MetadataStore':
+        store = cls()
+        file_sizes = iter(file_sizes) if file_sizes is not None else None
+        for img in images:
+            store.append(img, next(file_sizes) if file_sizes is not None else None)
+        return store
+
+    def append(self, img, file_size: Optional[int] = None) -> None:
+        """添加一张图片（ImageContainer）的元数据"""
+        date = getattr(img, 'date', None)
+        self.append_values(
+            timestamp=int(date.timestamp()) if isinstance(date, datetime) else MISSING,
+            file_size=file_size,
+            iso=_parse_number(img.iso),
+            f_number=_parse_number(img.f_number),
+            focal_length=_parse_number(img.focal_length),
+            exposure_time=_parse_exposure(img.exposure_time),
+            width=img.original_width,
+            height=img.original_height,
+            make=img.make,
+            model=img.model,
+            lens=img.lens_model,
+        )
+
+    def append_values(self, **values) -> None:
+        """按列名添加一行，缺少的数值列记为 MISSING"""
+        for name, code in NUMERIC_COLUMNS.items():
+            value = values.get(name)
+            if value is None:
+                value = MISSING
+            self.columns[name].append(int(value) if code != 'd' else float(value))
+        for name in STRING_COLUMNS:
+            self.columns[name].append(self.pools[name].code(values.get(name) or ''))
+
+    def set_value(self, row: int, name: str, value) -> None:
+        """修改一行中的一个值"""
+        if name in self.pools:
+            self.columns[name][row] = self.pools[name].code(value or '')
+        else:
+            value = MISSING if value is None else value
+            self.columns[name][row] = int(value) if NUMERIC_COLUMNS[name] != 'd' else float(value)
+
+    def value(self, row: int, name: str):
+        """读取一个值，字符串列返回字符串"""
+        value = self.columns[name][row]
+        return self.pools[name].strings[value] if name in self.pools else value
+
+    def take(self, order: Sequence[int]) -> None:
+        """按 order 重新排列所有行（order[i] 为新第 i 行原来的行号）"""
+        for name, column in self.columns.items():
+            self.columns[name] = array(column.typecode, map(column.__getitem__, order))
+
+    def sort_order(self, name: str, descending: bool = False) -> List[int]:
+        """
+        按一列排序后的行号顺序，值相同的行保持原顺序
+        字符串列按字符串排序，数值缺失的行排在升序的最前面
+        """
+        column = self.columns[name]
+        if name in self.pools:
+            column = array('l', map(self.pools[name].ranks().__getitem__, column))
+        return sorted(range(len(column)), key=column.__getitem__, reverse=descending)
+
+    def mask(self, conditions: Iterable[Condition]) -> bytearray:
+        """
+        同时满足所有条件的行，返回与行数等长的 0/1 标记
+        :param conditions: (列名, 运算符, 值)，字符串列只支持 = 和 !=
+        """
+        result = bytearray(b'\x01') * len(self)
+        for name, op_text, value in conditions:
+            name = COLUMN_ALIASES.get(name, COLUMN_ALIASES.get(name.lower(), name))
+            compare = _OPERATORS[op_text]
+            column = self.columns[name]
+            if name in self.pools:
+                if compare not in (operator.eq, operator.ne):
+                    raise ValueError(f"{name} 只能使用 = 或 != 筛选")
+                operand = self.pools[name].find(str(value))
+            elif NUMERIC_COLUMNS[name] == 'd':
+                operand = float(value)
+            else:
+                operand = int(value)
+            # 整列比较由 map 在C层面逐项完成
+            matched = bytes(map(getattr(operand, _REFLECTED[compare]), column))
+            result = bytearray(map(operator.and_, result, matched))
+            if name not in self.pools:
+                # 数值缺失的行不参与比较
+                missing = float(MISSING) if isinstance(operand, float) else MISSING
+                result = bytearray(map(operator.and_, result, bytes(map(missing.__ne__, column))))
+        return result
+
+    def filter(self, conditions: Iterable[Condition]) -> List[int]:
+        """同时满足所有条件的行号"""
+        return list(compress(range(len(self)), self.mask(conditions)))
+
+
+def parse_filter(text: str) -> List[Condition]:
+    """
+    解析筛选表达式，多个条件用 and / ; 连接，例如：
+        ISO > 3200 and lens = XF23mmF1.4 R
+        拍摄时间 >= 2024-05-01; 光圈 <= 2.8
+    :raise ValueError: 表达式无法解析
+    """
+    conditions = []
+    for part in _CONJUNCTION.split(text.strip()):
+        if not part:
+            continue
+        match = _CONDITION.match(part)
+        if not match:
+            raise ValueError(f"无法解析筛选条件: {part}")
+        name, op_text, value = match.groups()
+        column = COLUMN_ALIASES.get(name, COLUMN_ALIASES.get(name.lower()))
+        if column is None:
+            raise ValueError(f"未知的列: {name}")
+        if column == 'timestamp':
+            value = int(date_parser.parse(value).timestamp())
+        elif column == 'exposure_time':
+            value = _parse_exposure(value)
+            if value == MISSING:
+                raise ValueError(f"无法解析曝光时间: {part}")
+        elif column not in STRING_COLUMNS:
+            try:
+                value = float(value)
+            except ValueError:
+                raise ValueError(f"{name} 需要数值: {part}")
+        conditions.append((column, op_text, value))
+    return conditions
@@ -0,0 +1,245 @@
+"""
+输出文件写入
+OutputPlanner 只扫描一次输出目录，预先为整批图片分配不重复的文件名（可用于试运行）；
+AtomicWriter 在线程池中编码并写入临时文件，完成后原子替换为目标文件；
+不需要改变像素的图片直接复制（或硬链接）源文件，超大图片的分块处理结果逐条写入
+"""
+
+import io
+import os
+import shutil
+import threading
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from glob import escape as glob_escape
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Optional, TypeVar
+
+from core.encoder_profiles import EncoderProfile, encoder_options, format_for_path, get_encoder_profile
+from core.image_container import ImageContainer
+from core.metadata import SourceMetadata, metadata_save_kwargs, rewrite_jpeg_metadata
+from core.size_targeting import SizeTargetResult
+from core.tiled import BandSource, render_bands, write_strip_tiff
+
+T = TypeVar('T')
+
+
+class OutputPlanner:
+    """
+    输出文件名规划
+    文件名格式：前缀 + 原文件名 + 后缀 + 扩展名，重名时追加 _1、_2 ...
+    """
+
+    def __init__(self, output_dir: Path, prefix: str = '', suffix: str = '', extension: str = 'jpg'):
+        self.output_dir = Path(output_dir)
+        self.prefix = prefix
+        self.suffix = suffix
+        self.extension = extension.lstrip('.').lower()
+        # 按不区分大小写比较，避免在 Windows/macOS 上覆盖已有文件
+        self._taken = set()
+        if self.output_dir.is_dir():
+            with os.scandir(self.output_dir) as it:
+                for entry in it:
+                    self._taken.add(entry.name.casefold())
+
+    def _reserve(self, stem: str) -> Path:
+        name = f"{stem}.{self.extension}"
+        counter = 1
+        while name.casefold() in self._taken:
+            name = f"{stem}_{counter}.{self.extension}"
+            counter += 1
+        self._taken.add(name.casefold())
+        return self.output_dir / name
+
+    def plan(self, source_paths: Iterable[Path]) -> Dict[Path, Path]:
+        """
+        为每个源文件分配目标路径，不访问文件系统
+        :param source_paths: 源文件列表
+        :return: 源文件 -> 目标文件 的有序字典
+        """
+        result = {}
+        for source_path in source_paths:
+            source_path = Path(source_path)
+            result[source_path] = self._reserve(f"{self.prefix}{source_path.stem}{self.suffix}")
+        return result
+
+
+def partial_path(target_path: Path) -> Path:
+    """
+    目标文件对应的临时文件路径，与目标在同一目录（保证可以原子替换），
+    保留扩展名以便按扩展名选择编码格式
+    """
+    target_path = Path(target_path)
+    return target_path.with_name(f".{target_path.stem}.{uuid.uuid4().hex}.partial{target_path.suffix}")
+
+
+def remove_partials(target_path: Path) -> int:
+    """删除目标文件残留的临时文件（写入时进程被强制结束），返回删除的数量"""
+    target_path = Path(target_path)
+    removed = 0
+    for tmp_path in target_path.parent.glob(f".{glob_escape(target_path.stem)}.*.partial{target_path.suffix}"):
+        try:
+            tmp_path.unlink()
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+@dataclass
+class WriteResult:
+    """单个文件的写入结果"""
+    target_path: Path
+    size_target: Optional[SizeTargetResult] = None  # 限制文件大小时的搜索结果
+    copied: bool = False                             # 是否直接复制源文件（未重新编码）
+
+
+def _write_atomically(target_path: Path, write: Callable[[Path], T]) -> T:
+    """调用 write 写入临时文件，成功后原子替换为目标文件，失败时删除临时文件"""
+    tmp_path = partial_path(target_path)
+    try:
+        result = write(tmp_path)
+        os.replace(tmp_path, target_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return result
+
+
+def atomic_save(container: ImageContainer, target_path: Path, **save_options) -> WriteResult:
+    """编码保存处理结果"""
+    size_target = _write_atomically(target_path, lambda tmp_path: container.save(tmp_path, **save_options))
+    return WriteResult(Path(target_path), size_target)
+
+
+def atomic_copy(source_path: Path, target_path: Path, hardlink: bool = False,
+                metadata: Optional[SourceMetadata] = None, strip_gps: bool = False,
+                data: Optional[bytes] = None) -> WriteResult:
+    """
+    复制源文件到目标文件，同样经过临时文件原子替换
+    :param hardlink: 优先创建硬链接（跨磁盘等无法链接时退回复制）
+    :param metadata: 源文件元数据，需要移除GPS信息时使用
+    :param strip_gps: 是否移除GPS位置信息，只改写JPEG的元数据段，不重新编码
+    :param data: 已读入内存的源文件内容，指定时直接写出，不再读取源文件
+    """
+    def write(tmp_path):
+        if strip_gps and metadata is not None and metadata.has_gps():
+            rewrite_jpeg_metadata(io.BytesIO(data) if data is not None else source_path, tmp_path,
+                                  metadata, strip_gps=True)
+            return
+        if hardlink:
+            try:
+                os.link(source_path, tmp_path)
+                return
+            except OSError:
+                pass
+        if data is not None:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+        else:
+            shutil.copyfile(source_path, tmp_path)
+
+    _write_atomically(target_path, write)
+    return WriteResult(Path(target_path), copied=True)
+
+
+def atomic_save_bands(container: ImageContainer, bands: BandSource, target_path: Path,
+                      **save_options) -> WriteResult:
+    """
+    写入分块处理的结果：TIFF 逐条压缩写入；
+    其他格式或限制文件大小时拼成一张RGB图片，再按常规方式编码保存
+    """
+    if format_for_path(target_path) == 'TIFF' and not save_options.get('max_bytes'):
+        profile = save_options.get('profile')
+        compression = encoder_options('TIFF', profile=profile).get('compression')
+        compress_level = 9 if get_encoder_profile(profile) == EncoderProfile.SMALLEST else 6
+        # 与整张保存TIFF时写入相同的ICC、EXIF（IFD0）和XMP
+        metadata = metadata_save_kwargs(container.metadata, 'TIFF', bands.size, save_options.get('strip_gps', False))
+        _write_atomically(target_path, lambda tmp_path: write_strip_tiff(
+            bands, tmp_path, compression, icc_profile=metadata.get('icc_profile'),
+            dpi=container.img.info.get('dpi'), compress_level=compress_level, tags=metadata.get('exif')))
+        return WriteResult(Path(target_path))
+    container.update_watermark_img(render_bands(bands))
+    return atomic_save(container, target_path, **save_options)
+
+
+class AtomicWriter:
+    """
+    后台写入器
+    submit 接管容器的所有权，写入完成后关闭容器；
+    同时排队的容器数量不超过 max_pending，避免处理速度快于写入速度时占满内存
+    """
+
+    def __init__(self, max_workers: int = 2, max_pending: Optional[int] = None):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='output-writer')
+        self._max_pending = max_pending or max_workers * 2
+        self._slots = threading.BoundedSemaphore(self._max_pending)
+
+    def submit(self, container: ImageContainer, target_path: Path, **save_options) -> Future:
+        self._slots.acquire()
+        try:
+            future = self._executor.submit(self._write, container, target_path, save_options)
+        except BaseException:
+            self._slots.release()
+            container.close()
+            raise
+        return future
+
+    def submit_copy(self, source_path: Path, target_path: Path, **copy_options) -> Future:
+        """提交直接复制源文件的任务，参数见 atomic_copy"""
+        self._slots.acquire()
+        try:
+            return self._executor.submit(self._copy, source_path, target_path, copy_options)
+        except BaseException:
+            self._slots.release()
+            raise
+
+    def _copy(self, source_path, target_path, copy_options):
+        try:
+            return atomic_copy(source_path, target_path, **copy_options)
+        finally:
+            self._slots.release()
+
+    def submit_bands(self, container: ImageContainer, bands: BandSource, target_path: Path,
+                     **save_options) -> Future:
+        """
+        提交分块处理结果，参数见 atomic_save_bands
+        占用全部排队名额：等待之前的写入完成，写入期间不再接受新的任务，同一时间只保留一张超大图片
+        """
+        for _ in range(self._max_pending):
+            self._slots.acquire()
+        try:
+            return self._executor.submit(self._write_bands, container, bands, target_path, save_options)
+        except BaseException:
+            for _ in range(self._max_pending):
+                self._slots.release()
+            container.close()
+            raise
+
+    def _write_bands(self, container, bands, target_path, save_options):
+        try:
+            return atomic_save_bands(container, bands, target_path, **save_options)
+        finally:
+            container.close()
+            for _ in range(self._max_pending):
+                self._slots.release()
+
+    def _write(self, container, target_path, save_options):
+        try:
+            return atomic_save(container, target_path, **save_options)
+        finally:
+            container.close()
+            self._slots.release()
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
@@ -0,0 +1,93 @@
+"""
+预览渲染
+在降采样的代理图上运行Processor链，供对话框实时预览使用，不依赖Qt
+"""
+
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Callable, Optional
+
+from PIL import Image
+
+from core.image_container import ImageContainer
+from core.image_processor import ProcessorChain, ProcessorComponent
+
+# 代理图长边像素
+PREVIEW_LONG_EDGE = 1280
+
+
+class PreviewCancelled(Exception):
+    """预览渲染已被取消（有更新的渲染请求）"""
+
+
+class ProxyCache:
+    """
+    代理图缓存
+    按路径、修改时间和文件大小缓存降采样后的ImageContainer，线程安全
+    """
+
+    def __init__(self, long_edge: int = PREVIEW_LONG_EDGE, capacity: int = 4):
+        self.long_edge = long_edge
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._items: OrderedDict = OrderedDict()
+
+    def _key(self, path: Path):
+        stat = os.stat(path)
+        return str(path), stat.st_mtime_ns, stat.st_size
+
+    def get(self, path: Path) -> ImageContainer:
+        """
+        获取代理图容器的副本，调用方可以在副本上自由运行Processor
+        :param path: 图片路径
+        :return: 代理图容器副本
+        """
+        path = Path(path)
+        key = self._key(path)
+        with self._lock:
+            proxy = self._items.get(key)
+            if proxy is not None:
+                self._items.move_to_end(key)
+                return proxy.clone()
+
+        # 解码放在锁外，避免阻塞其他路径的读取
+        proxy = ImageContainer(path, max_size=self.long_edge)
+        proxy.img.load()
+        with self._lock:
+            self._items[key] = proxy
+            self._items.move_to_end(key)
+            while len(self._items) > self.capacity:
+                _, evicted = self._items.popitem(last=False)
+                evicted.close()
+            return proxy.clone()
+
+    def clear(self) -> None:
+        with self._lock:
+            for proxy in self._items.values():
+                proxy.close()
+            self._items.clear()
+
+
+# 全局共享的代理图缓存，不同对话框之间复用
+PROXY_CACHE = ProxyCache()
+
+
+def render_preview(processor: ProcessorComponent, container: ImageContainer,
+                   is_cancelled: Optional[Callable[[], bool]] = None) -> Image.Image:
+    """
+    在代理图容器上运行Processor（链），每个Processor之间检查是否被取消
+    :param processor: 单个Processor或ProcessorChain
+    :param container: 代理图容器（会被修改）
+    :param is_cancelled: 返回True时中止渲染
+    :return: 渲染结果
+    """
+    components = processor.components if isinstance(processor, ProcessorChain) else [processor]
+    for component in components:
+        if is_cancelled is not None and is_cancelled():
+            raise PreviewCancelled()
+        component.process(container)
+    if is_cancelled is not None and is_cancelled():
+        raise PreviewCancelled()
+    return container.get_watermark_img().convert('RGBA')
@@ -0,0 +1,18 @@
+"""
+单张图片的处理上下文
+Processor和Effect实例在多张图片、多个线程之间共享，按图片计算出的派生值只能保存在这里，
+不能写回Processor自身或全局Config
+"""
+
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass
+class ProcessingContext:
+    """处理一张图片期间在Processor之间传递的派生值"""
+    # 最近一个水印Processor使用的背景色，后续的边距/边框沿用该颜色；None表示使用配置中的默认背景色
+    bg_color: Optional[str] = None
+
+    def copy(self) -> 'ProcessingContext':
+        return ProcessingContext(bg_color=self.bg_color)
@@ -0,0 +1,116 @@
+"""
+Processor注册表
+按ID创建Processor：内置Processor和自定义Processor（见 ProcessorStore）都在第一次使用时才创建，
+之后重复使用同一个实例；不依赖Qt，命令行、后台任务和对话框共用
+"""
+
+import importlib
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config.image_config import Config
+from core.image_processor import ProcessorChain, ProcessorComponent
+from core.processor_store import CustomConfig, ProcessorStore
+from core.processor_types import CompositeProcessorConfig
+
+logger = logging.getLogger(__name__)
+
+# 内置Processor：ID -> (模块, 类或工厂函数, 额外参数)，创建时调用 factory(config, *args)
+BUILTIN_PROCESSORS: Dict[str, Tuple[str, str, tuple]] = {
+    'empty': ('core.image_processor', 'EmptyProcessor', ()),
+    'fit size': ('core.image_processor', 'FitSizeProcessor', ()),
+    'shadow': ('core.image_processor', 'ShadowProcessor', ()),
+    'margin': ('core.image_processor', 'MarginProcessor', ()),
+    'simple': ('core.image_processor', 'SimpleProcessor', ()),
+    'watermark': ('core.image_processor', 'WatermarkProcessor', ()),
+    'watermark_left_logo': ('core.image_processor', 'WatermarkLeftLogoProcessor', ()),
+    'watermark_right_logo': ('core.image_processor', 'WatermarkRightLogoProcessor', ()),
+    'dark_watermark_left_logo': ('core.image_processor', 'DarkWatermarkLeftLogoProcessor', ()),
+    'dark_watermark_right_logo': ('core.image_processor', 'DarkWatermarkRightLogoProcessor', ()),
+    'square': ('core.image_processor', 'SquareProcessor', ()),
+    'padding_to_original_ratio': ('core.image_processor', 'PaddingToOriginalRatioProcessor', ()),
+    'background_blur': ('core.image_processor', 'BackgroundBlurProcessor', ()),
+    'background_blur_with_white_border': ('core.image_processor', 'BackgroundBlurWithWhiteBorderProcessor', ()),
+    'pure_white_margin': ('core.image_processor', 'PureWhiteMarginProcessor', ()),
+    'custom_watermark': ('core.image_processor', 'CustomWatermarkProcessor', ()),
+    'rounded_corner': ('core.image_processor', 'RoundedCornerProcessor', ()),
+    'rounded_corner_blur': ('core.image_processor', 'RoundedCornerBlurProcessor', ()),
+    'rounded_corner_blur_shadow': ('core.image_processor', 'RoundedCornerBlurShadowProcessor', ()),
+    # 可配置水印处理器
+    'configurable_watermark': ('core.configurable_watermark_processor', 'ConfigurableWatermarkProcessor', ()),
+    'dark_theme_watermark': ('core.configurable_watermark_processor', 'create_dark_theme_processor', ('left',)),
+    'light_theme_watermark': ('core.configurable_watermark_processor', 'create_light_theme_processor', ('left',)),
+    'red_theme_watermark': ('core.configurable_watermark_processor', 'create_red_theme_processor', ('left',)),
+    'blue_theme_watermark': ('core.configurable_watermark_processor', 'create_blue_theme_processor', ('left',)),
+}
+
+def create_custom_processor(config: Config, processor_config: CustomConfig) -> ProcessorComponent:
+    """按自定义Processor配置创建Processor"""
+    from core.configurable_processor import ConfigurableCompositeProcessor, ConfigurableProcessor
+    if isinstance(processor_config, CompositeProcessorConfig):
+        return ConfigurableCompositeProcessor(config, processor_config.processor_configs,
+                                              processor_config.name, processor_config.id)
+    return ConfigurableProcessor(config, processor_config)
+
+
+class ProcessorRegistry:
+    """
+    按ID获取Processor，实例在第一次使用时创建并缓存，可以在多个线程中使用
+    自定义Processor配置修改后调用 reload_custom
+    """
+
+    def __init__(self, config: Config, store: Optional[ProcessorStore] = None):
+        self.config = config
+        self.store = store if store is not None else ProcessorStore()
+        self._lock = threading.RLock()
+        self._instances: Dict[str, ProcessorComponent] = {}
+
+    @staticmethod
+    def builtin_ids() -> List[str]:
+        return list(BUILTIN_PROCESSORS)
+
+    def custom_configs(self) -> List[CustomConfig]:
+        """所有自定义Processor配置，按名称排序"""
+        return self.store.list()
+
+    def reload_custom(self) -> List[CustomConfig]:
+        """自定义Processor配置修改后调用：已创建的自定义Processor实例作废"""
+        with self._lock:
+            for processor_id in list(self._instances):
+                if processor_id not in BUILTIN_PROCESSORS:
+                    del self._instances[processor_id]
+        return self.custom_configs()
+
+    def get(self, processor_id: str) -> Optional[ProcessorComponent]:
+        """ID对应的Processor，不存在时返回None"""
+        with self._lock:
+            processor = self._instances.get(processor_id)
+            if processor is None:
+                processor = self._create(processor_id)
+                if processor is not None:
+                    self._instances[processor_id] = processor
+            return processor
+
+    def _create(self, processor_id: str) -> Optional[ProcessorComponent]:
+        spec = BUILTIN_PROCESSORS.get(processor_id)
+        if spec is not None:
+            module_name, attr, args = spec
+            factory = getattr(importlib.import_module(module_name), attr)
+            return factory(self.config, *args)
+
+        processor_config = self.store.get(processor_id)
+        if processor_config is None:
+            return None
+        return create_custom_processor(self.config, processor_config)
+
+    def build_chain(self, processor_ids: Iterable[str]) -> ProcessorChain:
+        """按顺序把多个Processor组成 ProcessorChain，找不到的ID跳过"""
+        processor_chain = ProcessorChain()
+        for processor_id in processor_ids:
+            processor = self.get(processor_id)
+            if processor is not None:
+                processor_chain.add(processor)
+            else:
+                print(f"警告: 未找到Processor: {processor_id}")
+        return processor_chain
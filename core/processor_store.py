@@ -0,0 +1,194 @@
+"""
+自定义Processor配置存储
+所有自定义Processor配置保存在一个SQLite数据库中（按ID索引），保存和删除都在事务中完成；
+每条配置记录内容哈希，内容没有变化时不重复写入，读取时校验。
+第一次打开数据库时自动导入 config/processors 中原有的每个Processor一个的JSON文件，
+原文件保留不动，作为备份
+"""
+
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Union
+
+from core.processor_types import CompositeProcessorConfig, ProcessorConfig
+
+logger = logging.getLogger(__name__)
+
+# 旧版本保存自定义Processor配置的文件夹，数据库也放在这里
+CUSTOM_PROCESSOR_DIR = Path("config/processors")
+DEFAULT_STORE_PATH = CUSTOM_PROCESSOR_DIR / "processors.db"
+
+# 数据库结构版本，保存在 PRAGMA user_version 中
+SCHEMA_VERSION = 1
+
+CustomConfig = Union[ProcessorConfig, CompositeProcessorConfig]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS processors (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    data TEXT NOT NULL,
+    content_hash TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_processors_name ON processors(name);
+"""
+
+
+def config_from_dict(data: dict) -> CustomConfig:
+    """按内容判断是单个Processor还是组合Processor"""
+    # 检查是否为组合Processor
+    if "processor_ids" in data:
+        return CompositeProcessorConfig.from_dict(data)
+    return ProcessorConfig.from_dict(data)
+
+
+def _encode(processor_config: CustomConfig):
+    """序列化配置，返回 (JSON文本, 内容哈希)；键排序保证相同内容得到相同哈希"""
+    data = json.dumps(processor_config.to_dict(), ensure_ascii=False, sort_keys=True)
+    return data, hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+
+class ProcessorStore:
+    """
+    自定义Processor配置存储
+    数据库在第一次使用时打开，可以在多个线程中使用
+    """
+
+    def __init__(self, path: Path = DEFAULT_STORE_PATH, legacy_dir: Optional[Path] = CUSTOM_PROCESSOR_DIR):
+        """
+        :param path: 数据库文件
+        :param legacy_dir: 需要导入的旧JSON文件所在文件夹，为None时不导入
+        """
+        self.path = Path(path)
+        self.legacy_dir = Path(legacy_dir) if legacy_dir is not None else None
+        self._lock = threading.RLock()
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(str(self.path), check_same_thread=False)
+            try:
+                self._upgrade(connection)
+            except Exception:
+                connection.close()
+                raise
+            self._connection = connection
+        return self._connection
+
+    def _upgrade(self, connection: sqlite3.Connection):
+        """创建或升级数据库结构，新建时导入旧的JSON文件"""
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version > SCHEMA_VERSION:
+            raise RuntimeError(f"Processor配置数据库 {self.path} 的版本 ({version}) 高于当前程序支持的版本 ({SCHEMA_VERSION})")
+        if version == SCHEMA_VERSION:
+            return
+        with connection:
+            connection.executescript(_SCHEMA)
+            if version == 0:
+                self._import_legacy_files(connection)
+            connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _import_legacy_files(self, connection: sqlite3.Connection):
+        if self.legacy_dir is None or not self.legacy_dir.exists():
+            return
+        imported = []
+        for config_file in sorted(self.legacy_dir.glob("*.json")):
+            try:
+                with open(config_file, 'r', encoding='utf-8') as f:
+                    imported.append(config_from_dict(json.load(f)))
+            except Exception as e:
+                print(f"加载配置文件 {config_file} 失败: {e}")
+        self._write(connection, imported)
+        if imported:
+            print(f"已将 {len(imported)} 个自定义Processor配置导入 {self.path}")
+
+    @staticmethod
+    def _write(connection: sqlite3.Connection, configs: Iterable[CustomConfig]) -> int:
+        """写入配置，返回内容有变化的数量"""
+        now = datetime.now().isoformat(timespec='seconds')
+        changed = 0
+        for processor_config in configs:
+            data, content_hash = _encode(processor_config)
+            kind = 'composite' if isinstance(processor_config, CompositeProcessorConfig) else 'single'
+            cursor = connection.execute(
+                "INSERT INTO processors (id, name, kind, data, content_hash, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET name = excluded.name, kind = excluded.kind, data = excluded.data, "
+                "content_hash = excluded.content_hash, updated_at = excluded.updated_at "
+                "WHERE processors.content_hash != excluded.content_hash",
+                (processor_config.id, processor_config.name, kind, data, content_hash, now))
+            changed += cursor.rowcount
+        return changed
+
+    def _decode(self, processor_id: str, data: str, content_hash: str) -> Optional[CustomConfig]:
+        if hashlib.sha256(data.encode('utf-8')).hexdigest() != content_hash:
+            logger.warning(f"Processor配置 {processor_id} 的内容哈希不匹配，可能已被外部修改")
+        try:
+            return config_from_dict(json.loads(data))
+        except Exception as e:
+            print(f"读取Processor配置 {processor_id} 失败: {e}")
+            return None
+
+    def get(self, processor_id: str) -> Optional[CustomConfig]:
+        """按ID读取配置，不存在时返回None"""
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT data, content_hash FROM processors WHERE id = ?", (processor_id,)).fetchone()
+        return self._decode(processor_id, *row) if row else None
+
+    def __contains__(self, processor_id: str) -> bool:
+        with self._lock:
+            return self._connect().execute(
+                "SELECT 1 FROM processors WHERE id = ?", (processor_id,)).fetchone() is not None
+
+    def list(self) -> List[CustomConfig]:
+        """所有配置，按名称排序"""
+        with self._lock:
+            rows = self._connect().execute(
+                "SELECT id, data, content_hash FROM processors ORDER BY name, id").fetchall()
+        configs = (self._decode(*row) for row in rows)
+        return [processor_config for processor_config in configs if processor_config is not None]
+
+    def hashes(self) -> Dict[str, str]:
+        """ID -> 内容哈希"""
+        with self._lock:
+            return dict(self._connect().execute("SELECT id, content_hash FROM processors"))
+
+    def save(self, processor_config: CustomConfig) -> bool:
+        """保存配置，返回内容是否有变化"""
+        return self.save_many([processor_config]) > 0
+
+    def save_many(self, configs: Iterable[CustomConfig]) -> int:
+        """在一个事务中保存多个配置，任何一个失败时都不写入，返回内容有变化的数量"""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                return self._write(connection, configs)
+
+    def delete(self, processor_ids: Iterable[str]) -> int:
+        """在一个事务中删除配置，返回删除的数量"""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                return sum(connection.execute("DELETE FROM processors WHERE id = ?", (processor_id,)).rowcount
+                           for processor_id in processor_ids)
+
+    def clear(self) -> int:
+        """删除所有配置，返回删除的数量"""
+        with self._lock:
+            connection = self._connect()
+            with connection:
+                return connection.execute("DELETE FROM processors").rowcount
+
+    def close(self):
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
@@ -0,0 +1,162 @@
+"""
+限制文件大小的编码
+在内存中并行试编码，多路搜索不超过目标字节数的最高质量；
+最低质量仍然超出时（或无损格式）可按比例缩小尺寸后再搜索
+"""
+
+import io
+import math
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Optional, Tuple
+
+from PIL import Image
+
+from core.encoder_profiles import LOSSY_FORMATS
+
+# 搜索的最低质量
+MIN_QUALITY = 10
+# 最多缩小尺寸的次数
+MAX_SCALE_STEPS = 6
+# 缩小尺寸时在估算比例上再留出的余量
+SCALE_MARGIN = 0.95
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _probe_pool() -> ThreadPoolExecutor:
+    """试编码共用的线程池（PIL编码时会释放GIL）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='size-probe')
+        return _pool
+
+
+@dataclass
+class SizeTargetResult:
+    """限制文件大小编码的结果"""
+    data: bytes
+    quality: Optional[int]  # 无损格式为None
+    scale: float            # 相对处理结果的缩放比例，1.0 表示未缩小
+    iterations: int         # 试编码次数
+    fitted: bool            # 是否满足大小限制
+
+    @property
+    def size(self) -> int:
+        return len(self.data)
+
+
+def _encode(image: Image.Image, image_format: str, save_kwargs: dict, quality: Optional[int]) -> bytes:
+    kwargs = dict(save_kwargs)
+    if quality is not None:
+        kwargs['quality'] = quality
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, **kwargs)
+    return buffer.getvalue()
+
+
+def _encode_copy(image: Image.Image, image_format: str, save_kwargs: dict, quality: Optional[int]) -> bytes:
+    # Image.save 会在图片对象上记录编码参数，同一个对象不能在多个线程中同时保存
+    with image.copy() as copied:
+        return _encode(copied, image_format, save_kwargs, quality)
+
+
+def _search_quality(image, image_format, save_kwargs, max_bytes, max_quality, parallelism):
+    """
+    多路搜索：每轮在 [lo, fail) 区间内均匀取 parallelism 个质量同时编码，
+    按结果收缩区间，直到找到满足大小限制的最高质量
+    :return: (质量, 数据, 试编码次数, 最小的编码结果及其质量)，没有满足限制的质量时质量和数据为None
+    """
+    data = _encode(image, image_format, save_kwargs, max_quality)
+    iterations = 1
+    if len(data) <= max_bytes:
+        return max_quality, data, iterations, (data, max_quality)
+
+    best_quality, best_data = None, None
+    smallest = (data, max_quality)
+    lo, fail = MIN_QUALITY, max_quality
+    pool = _probe_pool()
+    while lo < fail:
+        count = min(parallelism, fail - lo)
+        candidates = sorted({lo + (fail - lo) * i // count for i in range(count)})
+        futures = {q: pool.submit(_encode_copy, image, image_format, save_kwargs, q) for q in candidates}
+        results = {q: f.result() for q, f in futures.items()}
+        iterations += len(results)
+
+        fitting = [q for q in candidates if len(results[q]) <= max_bytes]
+        for q in candidates:
+            if len(results[q]) < len(smallest[0]):
+                smallest = (results[q], q)
+        if not fitting:
+            fail = candidates[0]
+            break
+        best_quality = max(fitting)
+        best_data = results[best_quality]
+        lo = best_quality + 1
+        higher_failures = [q for q in candidates if q > best_quality]
+        if higher_failures:
+            fail = min(higher_failures)
+    return best_quality, best_data, iterations, smallest
+
+
+def encode_to_size(image: Image.Image, image_format: str, max_bytes: int, save_kwargs: dict,
+                   max_quality: int = 95, allow_scale: bool = False, parallelism: int = 4,
+                   kwargs_for_size: Optional[Callable[[Tuple[int, int]], dict]] = None) -> SizeTargetResult:
+    """
+    编码为不超过 max_bytes 的数据
+    :param image: 待编码图片（不会被修改）
+    :param image_format: PIL格式名
+    :param max_bytes: 目标大小上限
+    :param save_kwargs: 其他编码参数（EXIF、DPI、编码配置等）
+    :param max_quality: 搜索的最高质量
+    :param allow_scale: 最低质量仍然超出时是否允许缩小尺寸
+    :param parallelism: 每轮同时试编码的数量
+    :param kwargs_for_size: 缩小尺寸后按新尺寸生成需要覆盖的参数（如EXIF中的像素尺寸）
+    :return: 编码结果；无法满足时返回尝试过的最小结果，fitted 为 False
+    """
+    lossy = image_format in LOSSY_FORMATS
+    scale = 1.0
+    current = image
+    iterations = 0
+    smallest = None
+    try:
+        for _ in range(MAX_SCALE_STEPS + 1):
+            kwargs = save_kwargs
+            if current is not image and kwargs_for_size is not None:
+                kwargs = {**save_kwargs, **kwargs_for_size(current.size)}
+            if lossy:
+                quality, data, count, (smallest_data, smallest_quality) = _search_quality(
+                    current, image_format, kwargs, max_bytes, max_quality, parallelism)
+            else:
+                quality = smallest_quality = None
+                data = smallest_data = _encode(current, image_format, kwargs, None)
+                count = 1
+                if len(data) > max_bytes:
+                    data = None
+            iterations += count
+            if data is not None:
+                return SizeTargetResult(data, quality, scale, iterations, True)
+            if smallest is None or len(smallest_data) < len(smallest[0]):
+                smallest = (smallest_data, smallest_quality, scale)
+            if not allow_scale:
+                break
+
+            # 文件大小大致与像素数成正比，按比例估算新的尺寸
+            factor = math.sqrt(max_bytes / len(smallest_data)) * SCALE_MARGIN
+            new_scale = scale * min(factor, 0.9)
+            new_size = (max(1, round(image.width * new_scale)), max(1, round(image.height * new_scale)))
+            if min(new_size) < 16:
+                break
+            if current is not image:
+                current.close()
+            current = image.resize(new_size, Image.LANCZOS)
+            scale = new_scale
+    finally:
+        if current is not image:
+            current.close()
+
+    data, quality, smallest_scale = smallest
+    return SizeTargetResult(data, quality, smallest_scale, iterations, False)
@@ -0,0 +1,200 @@
+"""
+缩略图生成与磁盘缓存
+优先使用EXIF中内嵌的缩略图，其次使用JPEG的draft缩小解码；
+缓存按文件内容生成键，超过容量上限时按最近使用时间淘汰，不依赖Qt
+"""
+
+import hashlib
+import io
+import os
+import sys
+import threading
+from pathlib import Path
+from typing import Optional
+
+from PIL import Image, ExifTags
+
+from core.metadata import ORIENTATION_TAG, apply_orientation
+
+# 缩略图长边像素
+THUMBNAIL_SIZE = 128
+
+
+def user_cache_dir(app_name: str = "ImageProcessor") -> Path:
+    """当前用户的缓存目录（Windows: %LOCALAPPDATA%，macOS: ~/Library/Caches，其他: $XDG_CACHE_HOME 或 ~/.cache）"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or Path.home() / 'AppData' / 'Local'
+    elif sys.platform == 'darwin':
+        base = Path.home() / 'Library' / 'Caches'
+    else:
+        base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / app_name
+
+
+# 磁盘缓存默认位置（用户缓存目录，不写入程序目录）和容量上限
+THUMBNAIL_CACHE_DIR = user_cache_dir() / "thumbnails"
+THUMBNAIL_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# 计算内容键时读取的文件头尾字节数
+_KEY_SAMPLE_BYTES = 64 * 1024
+
+def content_key(path: Path, size: int = THUMBNAIL_SIZE) -> str:
+    """
+    根据文件内容生成缓存键：文件大小 + 文件头尾各64KB的哈希
+    文件被移动或重命名后仍能命中，内容变化后自动失效
+    """
+    digest = hashlib.sha1()
+    file_size = os.path.getsize(path)
+    digest.update(f"{file_size}:{size}".encode())
+    with open(path, 'rb') as f:
+        digest.update(f.read(_KEY_SAMPLE_BYTES))
+        if file_size > _KEY_SAMPLE_BYTES * 2:
+            f.seek(-_KEY_SAMPLE_BYTES, os.SEEK_END)
+            digest.update(f.read(_KEY_SAMPLE_BYTES))
+    return digest.hexdigest()
+
+
+def _embedded_thumbnail(img: Image.Image, size: int) -> Optional[Image.Image]:
+    """读取EXIF IFD1中内嵌的JPEG缩略图，尺寸不足时返回None"""
+    exif_bytes = img.info.get('exif')
+    if not exif_bytes:
+        return None
+    exif = img.getexif()
+    ifd1 = exif.get_ifd(ExifTags.IFD.IFD1)
+    offset = ifd1.get(0x0201)  # JPEGInterchangeFormat
+    length = ifd1.get(0x0202)  # JPEGInterchangeFormatLength
+    if not offset or not length:
+        return None
+    # 偏移量相对于TIFF头，JPEG的APP1数据以 "Exif\0\0" 开头
+    base = 6 if exif_bytes.startswith(b"Exif\x00\x00") else 0
+    data = exif_bytes[base + offset:base + offset + length]
+    thumb = Image.open(io.BytesIO(data))
+    thumb.load()
+    if max(thumb.size) < size:
+        return None
+    # 内嵌缩略图可能带黑边（16:9 相机的 160x120 缩略图），宽高比不一致时不使用
+    if abs(thumb.width / thumb.height - img.width / img.height) > 0.02:
+        return None
+    return apply_orientation(thumb, exif.get(ORIENTATION_TAG))
+
+
+def generate_thumbnail(path: Path, size: int = THUMBNAIL_SIZE) -> Image.Image:
+    """
+    生成缩略图
+    :param path: 图片路径
+    :param size: 缩略图长边像素
+    :return: RGB缩略图
+    """
+    with Image.open(path) as img:
+        try:
+            thumb = _embedded_thumbnail(img, size)
+        except Exception:
+            thumb = None
+        if thumb is None:
+            # JPEG 直接按缩小的尺寸解码，避免完整解码大图
+            img.draft('RGB', (size, size))
+            thumb = img.copy()
+            thumb.thumbnail((size, size), Image.LANCZOS)
+            thumb = apply_orientation(thumb, img.getexif().get(ORIENTATION_TAG))
+    if thumb.mode != 'RGB':
+        thumb = thumb.convert('RGB')
+    if max(thumb.size) > size:
+        thumb.thumbnail((size, size), Image.LANCZOS)
+    return thumb
+
+
+class ThumbnailCache:
+    """
+    缩略图磁盘缓存
+    缓存文件以内容键命名，读取时刷新修改时间，超过容量上限时删除最久未使用的文件
+    """
+
+    def __init__(self, cache_dir: Path = THUMBNAIL_CACHE_DIR,
+                 max_bytes: int = THUMBNAIL_CACHE_MAX_BYTES, size: int = THUMBNAIL_SIZE):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.size = size
+        self._lock = threading.Lock()
+        self._total_bytes = None
+
+    def _entry_path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.jpg"
+
+    def get(self, path: Path) -> Image.Image:
+        """获取缩略图，缓存未命中时生成并写入缓存"""
+        key = content_key(path, self.size)
+        entry = self._entry_path(key)
+        try:
+            with Image.open(entry) as cached:
+                cached.load()
+                thumb = cached.convert('RGB')
+            os.utime(entry)
+            return thumb
+        except (FileNotFoundError, OSError):
+            pass
+
+        thumb = generate_thumbnail(path, self.size)
+        try:
+            self._store(entry, thumb)
+        except OSError as e:
+            print(f"缩略图缓存写入失败: {e}")
+        return thumb
+
+    def _store(self, entry: Path, thumb: Image.Image) -> None:
+        entry.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再替换，避免其他线程读到写了一半的文件
+        tmp = entry.with_name(f".{entry.stem}.{threading.get_ident()}.tmp")
+        thumb.save(tmp, 'JPEG', quality=85)
+        os.replace(tmp, entry)
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = self._scan_total()
+            else:
+                self._total_bytes += entry.stat().st_size
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        if not self.cache_dir.exists():
+            return []
+        return [p for p in self.cache_dir.glob('*/*.jpg')]
+
+    def _scan_total(self) -> int:
+        total = 0
+        for p in self._entries():
+            try:
+                total += p.stat().st_size
+            except OSError:
+                pass
+        return total
+
+    def _evict(self) -> None:
+        """删除最久未使用的缓存，直到总大小降到上限的90%"""
+        stats = []
+        for p in self._entries():
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            stats.append((st.st_mtime, st.st_size, p))
+        stats.sort()
+        total = sum(s[1] for s in stats)
+        target = self.max_bytes * 0.9
+        for _, file_size, p in stats:
+            if total <= target:
+                break
+            try:
+                p.unlink()
+                total -= file_size
+            except OSError:
+                pass
+        self._total_bytes = total
+
+    def clear(self) -> None:
+        """清空磁盘缓存"""
+        with self._lock:
+            for p in self._entries():
+                try:
+                    p.unlink()
+                except OSError:
+                    pass
+            self._total_bytes = 0
@@ -0,0 +1,310 @@
+"""
+分块（横条）处理
+超大图片（如拼接的全景图）按横条逐段生成处理结果：边距/边框、背景模糊、底部追加水印条
+都只在当前横条上计算，模糊时按卷积核半径多读取上下重叠的行，不会分配整张的RGBA中间图片。
+输出为TIFF时逐条压缩写入文件，其他格式拼成一张RGB图片后交给常规的编码流程。
+PIL 无法按行解码，源图片仍然整张解码一次
+"""
+
+import math
+import os
+import struct
+import zlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, Optional, Tuple, TypeVar
+
+from PIL import Image, ImageFilter, TiffImagePlugin
+
+# 源图片超过该像素数时使用分块处理
+TILED_PIXEL_THRESHOLD = 100_000_000
+# 每个横条的大致内存上限
+BAND_BYTES = 32 * 1024 * 1024
+# 同时生成的横条数量（PIL 的滤镜、缩放和 zlib 压缩都会释放GIL）
+BAND_WORKERS = min(4, os.cpu_count() or 1)
+# TIFF 的偏移量为32位
+_MAX_TIFF_OFFSET = 2 ** 32 - 1
+# TIFF 各数据类型的字节数
+_TIFF_TYPE_SIZES = {1: 1, 2: 1, 3: 2, 4: 4, 5: 8, 6: 1, 7: 1, 8: 2, 9: 4, 10: 8, 11: 4, 12: 8, 13: 4, 16: 8, 17: 8, 18: 8}
+
+T = TypeVar('T')
+
+
+class BandSource:
+    """
+    按横条提供图片内容
+    band(top, bottom) 返回 [top, bottom) 行的RGB图片，调用方负责关闭
+    """
+
+    def __init__(self, size: Tuple[int, int]):
+        self.size = size
+
+    @property
+    def width(self) -> int:
+        return self.size[0]
+
+    @property
+    def height(self) -> int:
+        return self.size[1]
+
+    def band(self, top: int, bottom: int) -> Image.Image:
+        raise NotImplementedError
+
+    def band_height(self) -> int:
+        """每个横条的行数"""
+        return max(16, min(self.height, BAND_BYTES // max(1, self.width * 4)))
+
+
+class ImageBands(BandSource):
+    """已经解码的图片"""
+
+    def __init__(self, image: Image.Image):
+        super().__init__(image.size)
+        # 先解码，之后多个线程只读取
+        image.load()
+        self.image = image
+
+    def band(self, top, bottom):
+        band = self.image.crop((0, top, self.width, bottom))
+        if band.mode != 'RGB':
+            band = band.convert('RGB')
+        return band
+
+
+class PaddedBands(BandSource):
+    """四周填充纯色，对应 padding_image"""
+
+    def __init__(self, inner: BandSource, left: int, top: int, right: int, bottom: int, color):
+        super().__init__((inner.width + left + right, inner.height + top + bottom))
+        self.inner = inner
+        self.left = left
+        self.top = top
+        self.color = color
+
+    def band(self, top, bottom):
+        band = Image.new('RGB', (self.width, bottom - top), self.color)
+        inner_top = max(top - self.top, 0)
+        inner_bottom = min(bottom - self.top, self.inner.height)
+        if inner_top < inner_bottom:
+            with self.inner.band(inner_top, inner_bottom) as part:
+                band.paste(part, (self.left, inner_top + self.top - top))
+        return band
+
+
+def padded_bands(inner: BandSource, padding_size: int, padding_location='tb', color='white') -> PaddedBands:
+    """与 padding_image 参数相同的分块版本"""
+    return PaddedBands(inner,
+                       padding_size if 'l' in padding_location else 0,
+                       padding_size if 't' in padding_location else 0,
+                       padding_size if 'r' in padding_location else 0,
+                       padding_size if 'b' in padding_location else 0,
+                       color)
+
+
+class AppendedBands(BandSource):
+    """在下方追加一条图片（如水印条），宽度与原图相同"""
+
+    def __init__(self, inner: BandSource, strip: Image.Image):
+        super().__init__((inner.width, inner.height + strip.height))
+        self.inner = inner
+        self.strip = strip.convert('RGB') if strip.mode != 'RGB' else strip
+
+    def band(self, top, bottom):
+        if bottom <= self.inner.height:
+            return self.inner.band(top, bottom)
+        band = Image.new('RGB', (self.width, bottom - top))
+        if top < self.inner.height:
+            with self.inner.band(top, self.inner.height) as part:
+                band.paste(part, (0, 0))
+        strip_top = max(top - self.inner.height, 0)
+        band.paste(self.strip.crop((0, strip_top, self.strip.width, bottom - self.inner.height)),
+                   (0, strip_top + self.inner.height - top))
+        return band
+
+
+class BlurredBackgroundBands(BandSource):
+    """
+    模糊背景：背景图高斯模糊、混合白色后放大到 size，再把前景贴在 offset 处
+    每个横条从背景中多读取 3 倍模糊半径加上缩放采样范围的重叠行，结果与整张处理一致
+    """
+
+    def __init__(self, background: BandSource, size: Tuple[int, int], foreground: BandSource,
+                 offset: Tuple[int, int], radius: int, white_ratio: float = 0.1):
+        super().__init__(size)
+        self.background = background
+        self.foreground = foreground
+        self.offset = offset
+        self.radius = radius
+        self.white_ratio = white_ratio
+        scale = background.height / size[1]
+        self.margin = 3 * radius + math.ceil(2 * max(1.0, scale)) + 2
+
+    def band(self, top, bottom):
+        background = self.background
+        scale = background.height / self.height
+        src_top, src_bottom = top * scale, bottom * scale
+        crop_top = max(0, math.floor(src_top) - self.margin)
+        crop_bottom = min(background.height, math.ceil(src_bottom) + self.margin)
+        with background.band(crop_top, crop_bottom) as part:
+            blurred = part.filter(ImageFilter.GaussianBlur(radius=self.radius))
+        with Image.new('RGB', blurred.size, color=(255, 255, 255)) as white:
+            blended = Image.blend(blurred, white, self.white_ratio)
+        blurred.close()
+        band = blended.resize((self.width, bottom - top), Image.BICUBIC,
+                              box=(0, src_top - crop_top, background.width, src_bottom - crop_top))
+        blended.close()
+
+        x, y = self.offset
+        fg_top = max(top - y, 0)
+        fg_bottom = min(bottom - y, self.foreground.height)
+        if fg_top < fg_bottom:
+            with self.foreground.band(fg_top, fg_bottom) as part:
+                band.paste(part, (x, fg_top + y - top))
+        return band
+
+
+def map_bands(source: BandSource, func: Callable[[Image.Image], T],
+              workers: int = BAND_WORKERS) -> Iterator[Tuple[int, T]]:
+    """
+    在线程池中生成横条并调用 func，按从上到下的顺序返回 (起始行, 结果)
+    同时处理的横条不超过 workers 个，内存占用与图片大小无关
+    """
+    step = source.band_height()
+
+    def work(top):
+        band = source.band(top, min(top + step, source.height))
+        result = func(band)
+        if result is not band:
+            band.close()
+        return result
+
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix='band') as executor:
+        queue = deque()
+        for top in range(0, source.height, step):
+            if len(queue) >= workers:
+                done_top, future = queue.popleft()
+                yield done_top, future.result()
+            queue.append((top, executor.submit(work, top)))
+        while queue:
+            done_top, future = queue.popleft()
+            yield done_top, future.result()
+
+
+def render_bands(source: BandSource) -> Image.Image:
+    """把所有横条拼成一张RGB图片（只分配一张输出大小的图片）"""
+    image = Image.new('RGB', source.size)
+    for top, band in map_bands(source, lambda band: band):
+        image.paste(band, (0, top))
+        band.close()
+    return image
+
+
+def _tiff_entry(tag: int, type_name: str, values):
+    if type_name == 'UNDEFINED':
+        return tag, 7, len(values), bytes(values)
+    if type_name == 'RATIONAL':
+        return tag, 5, len(values), b''.join(struct.pack('<II', *value) for value in values)
+    type_id, fmt = {'SHORT': (3, 'H'), 'LONG': (4, 'I')}[type_name]
+    return tag, type_id, len(values), struct.pack(f'<{len(values)}{fmt}', *values)
+
+
+def _metadata_entries(tags) -> list:
+    """
+    把附加标签（Image.Exif 中的IFD0标签、XMP）编码为IFD条目，
+    由 PIL 按与保存TIFF时相同的方式推断类型并编码，再从编码结果中取出每个条目的数据
+    """
+    ifd = TiffImagePlugin.ImageFileDirectory_v2()
+    for tag in tags:
+        ifd[tag] = tags.get(tag)
+        try:
+            ifd.tagtype[tag] = tags.tagtype[tag]
+        except Exception:
+            pass
+    data = ifd.tobytes(0)
+    entries = []
+    for i in range(struct.unpack_from('<H', data)[0]):
+        tag, type_id, count, value = struct.unpack_from('<HHI4s', data, 2 + i * 12)
+        size = count * _TIFF_TYPE_SIZES[type_id]
+        if size > 4:
+            offset = struct.unpack('<I', value)[0]
+            entries.append((tag, type_id, count, data[offset:offset + size]))
+        else:
+            entries.append((tag, type_id, count, value[:size]))
+    return entries
+
+
+def write_strip_tiff(source: BandSource, path: Path, compression: Optional[str] = 'tiff_adobe_deflate',
+                     icc_profile: Optional[bytes] = None, dpi=None, compress_level: int = 6,
+                     tags=None) -> None:
+    """
+    逐条写入RGB TIFF：每个横条作为一个strip，写完即释放
+    :param compression: 'raw' 不压缩，其他取值使用 Deflate 压缩
+    :param icc_profile: 写入的ICC配置文件
+    :param dpi: (x, y) 分辨率
+    :param tags: 附加的IFD0标签（metadata_save_kwargs 为TIFF生成的 exif，包含EXIF和XMP），
+                 与图像结构相关的标签以本函数写入的为准
+    """
+    deflate = compression not in (None, 'raw')
+    rows_per_strip = source.band_height()
+    offsets, byte_counts = [], []
+
+    def encode(band):
+        data = band.tobytes()
+        return zlib.compress(data, compress_level) if deflate else data
+
+    with open(path, 'wb') as f:
+        # 文件头，IFD 位置最后回填
+        f.write(b'II*\x00\x00\x00\x00\x00')
+        for _, data in map_bands(source, encode):
+            offsets.append(f.tell())
+            byte_counts.append(len(data))
+            f.write(data)
+            if f.tell() > _MAX_TIFF_OFFSET:
+                raise ValueError("输出文件超过4GB，无法写入TIFF")
+
+        entries = [
+            _tiff_entry(256, 'LONG', [source.width]),
+            _tiff_entry(257, 'LONG', [source.height]),
+            _tiff_entry(258, 'SHORT', [8, 8, 8]),
+            _tiff_entry(259, 'SHORT', [8 if deflate else 1]),
+            _tiff_entry(262, 'SHORT', [2]),
+            _tiff_entry(273, 'LONG', offsets),
+            _tiff_entry(277, 'SHORT', [3]),
+            _tiff_entry(278, 'LONG', [rows_per_strip]),
+            _tiff_entry(279, 'LONG', byte_counts),
+            _tiff_entry(284, 'SHORT', [1]),
+        ]
+        if dpi:
+            entries += [
+                _tiff_entry(282, 'RATIONAL', [(round(dpi[0] * 100), 100)]),
+                _tiff_entry(283, 'RATIONAL', [(round(dpi[1] * 100), 100)]),
+                _tiff_entry(296, 'SHORT', [2]),
+            ]
+        if icc_profile:
+            entries.append(_tiff_entry(34675, 'UNDEFINED', icc_profile))
+        if tags:
+            written = {entry[0] for entry in entries}
+            entries += [entry for entry in _metadata_entries(tags) if entry[0] not in written]
+        entries.sort(key=lambda entry: entry[0])
+
+        if f.tell() % 2:
+            f.write(b'\x00')
+        ifd_offset = f.tell()
+        data_offset = ifd_offset + 2 + len(entries) * 12 + 4
+        ifd, extra = [struct.pack('<H', len(entries))], []
+        for tag, type_id, count, payload in entries:
+            if len(payload) <= 4:
+                value = payload.ljust(4, b'\x00')
+            else:
+                value = struct.pack('<I', data_offset)
+                payload += b'\x00' * (len(payload) % 2)
+                extra.append(payload)
+                data_offset += len(payload)
+            ifd.append(struct.pack('<HHI', tag, type_id, count) + value)
+        ifd.append(struct.pack('<I', 0))
+        f.write(b''.join(ifd + extra))
+        if f.tell() > _MAX_TIFF_OFFSET:
+            raise ValueError("输出文件超过4GB，无法写入TIFF")
+        f.seek(4)
+        f.write(struct.pack('<I', ifd_offset))
@@ -1,13 +1,34 @@
+import hashlib
+import json
+import math
+import shutil
 import subprocess
 import os
+import signal
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
-from typing import List, Optional, Dict, Union
+from typing import Callable, Iterator, List, Optional, Dict, Tuple, Union
 import logging
 from dataclasses import dataclass
 from enum import Enum
 
+from PIL import Image
+
+from core.batch_processor import BatchOptions, BatchResult, run_batch
+from core.image_processor import ProcessorComponent
+from core.tiled import BandSource
+from core.video_frames import (FRAME_QUEUE_BYTES, FRAME_WORKERS, FrameFeed, SlideshowRenderer,
+                               fit_bands_to_frame, fit_image_to_frame)
+
 logger = logging.getLogger(__name__)
 
+# 每个片段包含的图片数量范围
+SEGMENT_MIN_SLIDES = 5
+SEGMENT_MAX_SLIDES = 25
+
 
 class PlaybackMode(Enum):
     """图片播放模式"""
@@ -15,6 +36,12 @@ class PlaybackMode(Enum):
     FIT_TO_MUSIC = "fit_to_music"      # 根据音乐时长自动调整
 
 
+class RenderMode(Enum):
+    """视频渲染方式"""
+    FRAMES = "frames"  # 逐帧渲染后通过管道交给ffmpeg编码，支持过渡效果
+    CONCAT = "concat"  # ffmpeg直接拼接图片，不支持过渡效果
+
+
 @dataclass
 class VideoSettings:
     """视频设置"""
@@ -33,6 +60,97 @@ class VideoSettings:
     fade_in_duration: float = 1.0  # 淡入时长（秒）
     fade_out_duration: float = 1.0  # 淡出时长（秒）
     image_path: Optional[str] = None  # 图片文件夹路径，留空则使用默认output文件夹
+    render_mode: RenderMode = RenderMode.FRAMES  # 渲染方式
+    parallel_jobs: int = 0  # 并行编码的ffmpeg进程数，0表示自动
+
+
+@dataclass(frozen=True)
+class VideoPlan:
+    """
+    视频时间线
+    由 VideoCreator.plan 一次性探测所有输入（扫描图片、ffprobe 音频时长）后生成，之后只读；
+    渲染过程只使用其中的数据，不再重复探测
+    """
+    images: Tuple[Path, ...]             # 参与合成的图片（已去除不存在的）
+    slides: Tuple[Path, ...]             # 按播放顺序排列的图片（循环播放时已展开），第k张为 images[k % len(images)]
+    image_duration: float                # 每张图片时长（秒）
+    video_duration: float                # 视频时长（秒）
+    size: Tuple[int, int]                # 输出分辨率
+    audio_path: Optional[Path] = None    # 混入的音频，不包含音频时为None
+    audio_duration: Optional[float] = None
+    fade_out_start: float = 0.0          # 音频淡出开始时间（秒）
+
+
+@dataclass
+class VideoProgress:
+    """视频创建进度"""
+    stage: str                     # 当前阶段
+    out_time: float                # 已编码的视频时长（秒）
+    total_time: float              # 视频总时长（秒）
+    speed: Optional[float] = None  # 编码速度（实时播放速度的倍数）
+
+    @property
+    def fraction(self) -> float:
+        """完成比例（0.0-1.0）"""
+        if self.total_time <= 0:
+            return 0.0
+        return min(1.0, self.out_time / self.total_time)
+
+
+ProgressCallback = Callable[[VideoProgress], None]
+
+
+def _process_group_kwargs() -> dict:
+    """让ffmpeg在独立的进程组中运行，取消时可以结束整个进程树"""
+    if os.name == 'nt':
+        return {'creationflags': subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {'start_new_session': True}
+
+
+def _kill_process_tree(process: subprocess.Popen) -> None:
+    """结束进程及其所有子进程"""
+    if process.poll() is not None:
+        return
+    try:
+        if os.name == 'nt':
+            subprocess.run(['taskkill', '/F', '/T', '/PID', str(process.pid)], capture_output=True)
+        else:
+            os.killpg(process.pid, signal.SIGKILL)
+    except OSError:
+        try:
+            process.kill()
+        except OSError:
+            pass
+
+
+def _parse_speed(value: Optional[str]) -> Optional[float]:
+    """解析 -progress 输出中的 speed 字段，如 1.5x、N/A"""
+    try:
+        return float(value.strip().rstrip('x'))
+    except (AttributeError, ValueError):
+        return None
+
+
+def _read_progress(stream, on_progress) -> None:
+    """
+    读取 ffmpeg -progress 的 key=value 输出，每个 progress= 行结束一组数据
+    回调出错时只记录日志并继续读取，避免管道写满阻塞ffmpeg
+    """
+    values = {}
+    for line in stream:
+        key, _, value = line.decode('utf-8', errors='ignore').strip().partition('=')
+        values[key] = value
+        if key != 'progress' or on_progress is None:
+            continue
+        try:
+            out_time = int(values.get('out_time_us') or values.get('out_time_ms')) / 1_000_000
+        except (TypeError, ValueError):
+            continue
+        try:
+            on_progress(out_time, _parse_speed(values.get('speed')))
+        except Exception as e:
+            logger.error(f"处理视频进度时出错: {e}")
+            on_progress = None
 
 
 class VideoCreator:
@@ -40,139 +158,472 @@ class VideoCreator:
 
     def __init__(self, settings: VideoSettings):
         self.settings = settings
+        # 取消后不能再次使用，重新创建即可
+        self._cancel_event = threading.Event()
+        self._lock = threading.Lock()
+        self._processes = set()
+        self._progress_callback = None
 
-    def create_video_from_images(self, image_paths: List[Union[str, Path]]) -> bool:
+    def plan(self, image_paths: Optional[List[Union[str, Path]]] = None) -> Optional[VideoPlan]:
         """
-        从图片列表创建视频
+        探测输入并生成视频时间线
 
         Args:
-            image_paths: 图片路径列表
+            image_paths: 图片路径列表，为None时扫描图片文件夹
 
         Returns:
-            bool: 是否成功
+            VideoPlan: 时间线，没有可用图片时返回None
         """
-        if not image_paths:
+        if image_paths is None:
+            image_paths = self._get_image_paths_from_output()
+
+        images = []
+        for image_path in image_paths:
+            img_path = Path(image_path)
+            if not img_path.exists():
+                logger.warning(f"图片不存在: {img_path}")
+                continue
+            images.append(img_path)
+        if not images:
             logger.error("没有图片可处理")
-            return False
+            return None
+
+        # 音频只探测一次
+        audio_path = Path(self.settings.audio_path) if self.settings.audio_path else None
+        if audio_path is not None and not audio_path.exists():
+            logger.warning(f"音频文件不存在: {audio_path}")
+            audio_path = None
+        audio_duration = self._get_music_duration(audio_path) if audio_path else None
+
+        # 计算每张图片的持续时间
+        image_duration = self.settings.image_duration
+        if self.settings.playback_mode == PlaybackMode.FIT_TO_MUSIC:
+            if audio_duration:
+                image_duration = audio_duration / len(images)
+            else:
+                logger.warning("音乐适配模式需要有效的音乐文件，将使用固定时长模式")
+
+        include_audio = self.settings.include_audio and audio_path is not None
+        slides = images
+        video_duration = len(images) * image_duration
+        # 如果需要循环播放图片且音频比视频长
+        if self.settings.loop_images and include_audio and audio_duration and audio_duration > 0:
+            # 计算需要循环多少次，视频时长等于音频时长
+            total_images_needed = int(audio_duration / image_duration) + 1
+            logger.info(f"音频时长 {audio_duration:.1f}s，图片时长 {image_duration:.1f}s，需要循环 {total_images_needed} 次")
+            slides = [images[i % len(images)] for i in range(total_images_needed)]
+            video_duration = audio_duration
+
+        # 确定淡出开始时间：使用音频时长或视频时长中的较小值，且不小于0
+        fade_out_start = 0.0
+        if include_audio:
+            end = min(video_duration, audio_duration) if audio_duration and audio_duration > 0 else video_duration
+            fade_out_start = max(0.0, end - self.settings.fade_out_duration)
+
+        return VideoPlan(
+            images=tuple(images),
+            slides=tuple(slides),
+            image_duration=image_duration,
+            video_duration=video_duration,
+            size=self._get_frame_size(),
+            audio_path=audio_path if include_audio else None,
+            audio_duration=audio_duration,
+            fade_out_start=fade_out_start
+        )
+
+    def render(self, plan: VideoPlan, progress_callback: Optional[ProgressCallback] = None,
+               slide_loader: Optional[Callable[[int], Optional[Image.Image]]] = None) -> bool:
+        """
+        按时间线渲染视频
+        ffmpeg 先写入同目录下的临时文件，成功后再替换目标文件，失败或取消时不会留下不完整的视频
+
+        Args:
+            plan: plan() 生成的时间线
+            progress_callback: 进度回调，在后台线程中调用
+            slide_loader: 按幻灯片序号提供已缩放好的画面，指定时逐帧渲染且不分段
+
+        Returns:
+            bool: 是否成功（取消时返回False）
+        """
+        self._progress_callback = progress_callback
 
         # 确保输出目录存在
         output_path = Path(self.settings.output_path)
         output_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = output_path.with_name(f".{output_path.stem}.partial{output_path.suffix}")
 
-        # 准备图片列表文件（用于ffmpeg concat）
-        image_list_file = self._create_image_list_file(image_paths)
-        if not image_list_file:
+        try:
+            if self.settings.render_mode == RenderMode.FRAMES or slide_loader is not None:
+                success = self._create_video_from_frames(plan, tmp_path, slide_loader)
+            else:
+                success = self._create_video_from_list(plan, tmp_path)
+            if success and not self.cancelled:
+                os.replace(tmp_path, output_path)
+        except Exception as e:
+            logger.error(f"创建视频时出错: {e}")
+            success = False
+        finally:
+            tmp_path.unlink(missing_ok=True)
+
+        if self.cancelled:
+            logger.info("视频创建已取消")
             return False
+        if success:
+            logger.info(f"视频创建成功: {self.settings.output_path}")
+        return success
+
+    def cancel(self) -> None:
+        """取消渲染并结束所有ffmpeg进程（含其子进程），可以在任意线程中调用"""
+        self._cancel_event.set()
+        with self._lock:
+            processes = list(self._processes)
+        for process in processes:
+            _kill_process_tree(process)
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancel_event.is_set()
+
+    def create_video_from_images(self, image_paths: List[Union[str, Path]],
+                                 progress_callback: Optional[ProgressCallback] = None) -> bool:
+        """
+        从图片列表创建视频
 
-        try:
-            # 构建ffmpeg命令
-            cmd = self._build_ffmpeg_command(image_list_file)
+        Args:
+            image_paths: 图片路径列表
+            progress_callback: 进度回调，在后台线程中调用
+
+        Returns:
+            bool: 是否成功
+        """
+        plan = self.plan(image_paths)
+        return plan is not None and self.render(plan, progress_callback)
+
+    def create_video_from_batch(self, file_list: List[Union[str, Path]], processor_chain: ProcessorComponent,
+                                options: BatchOptions,
+                                progress_callback: Optional[ProgressCallback] = None
+                                ) -> Tuple[bool, Optional[BatchResult]]:
+        """
+        处理图片的同时创建视频
+        每张图片的处理结果在内存中缩小到视频分辨率后直接交给帧渲染，不需要先写出图片再重新解码；
+        options.write_outputs 为True时照常在后台写出处理后的图片，为False时只生成视频
+
+        Args:
+            file_list: 待处理的图片
+            processor_chain: Processor链
+            options: 批量输出设置
+            progress_callback: 视频编码进度回调，在后台线程中调用
 
+        Returns:
+            (视频是否创建成功, 批量处理结果)
+        """
+        plan = self.plan(file_list)
+        if plan is None:
+            return False, None
+
+        feed = FrameFeed(len(plan.images), loop=len(plan.slides) > len(plan.images))
+        batch_results = []
+
+        def on_processed(index, result):
+            frame = None
+            if isinstance(result, BandSource):
+                frame = fit_bands_to_frame(result, plan.size)
+            elif result is not None:
+                frame = fit_image_to_frame(result, plan.size)
+            feed.put(index, frame)
+
+        def produce():
+            try:
+                batch_results.append(run_batch(list(plan.images), processor_chain, options,
+                                               progress_callback=lambda i, total, path: not self.cancelled,
+                                               on_processed=on_processed))
+            except Exception as e:
+                logger.error(f"处理图片时出错: {e}")
+            finally:
+                feed.close()
+
+        producer = threading.Thread(target=produce, name='video-batch', daemon=True)
+        producer.start()
+        try:
+            success = self.render(plan, progress_callback, slide_loader=feed.slide)
+        finally:
+            # 渲染提前结束时处理方不再等待
+            feed.close()
+            producer.join()
+        return success, batch_results[0] if batch_results else None
+
+    def _report_progress(self, stage: str, out_time: float, total_time: float, speed: Optional[float]) -> None:
+        if self._progress_callback is not None:
+            self._progress_callback(VideoProgress(stage, min(out_time, total_time), total_time, speed))
+
+    def _create_video_from_list(self, plan: VideoPlan, output_path: Path) -> bool:
+        """由ffmpeg按图片列表拼接、缩放图片"""
+        # 图片列表文件放在私有临时目录中，同时渲染多个视频时互不影响
+        with tempfile.TemporaryDirectory(prefix='video_') as temp_dir:
+            image_list_file = self._create_image_list_file(plan, Path(temp_dir))
+            cmd = self._build_ffmpeg_command(plan, output_path, image_list_file)
             logger.info(f"开始创建视频: {self.settings.output_path}")
-            logger.debug(f"FFmpeg命令: {' '.join(cmd)}")
-
-            # 执行ffmpeg命令
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                encoding='utf-8',
-                errors='ignore'
-            )
-
-            if result.returncode != 0:
-                logger.error(f"FFmpeg执行失败: {result.stderr}")
+            return self._run_ffmpeg(cmd, on_progress=lambda out_time, speed: self._report_progress(
+                "正在编码", out_time, plan.video_duration, speed))
+
+    def _create_video_from_frames(self, plan: VideoPlan, output_path: Path,
+                                  slide_loader: Optional[Callable[[int], Optional[Image.Image]]] = None) -> bool:
+        """
+        逐帧渲染（含过渡效果），原始RGB帧通过标准输入交给ffmpeg编码
+        图片较多时按图片边界分成多个片段，由多个ffmpeg进程并行编码后直接拼接；
+        画面由处理流程按顺序提供时（slide_loader）只用一个进程顺序编码
+        """
+        if slide_loader is not None:
+            jobs, segments = 1, [(0, len(plan.slides))]
+        else:
+            jobs = self._get_parallel_jobs()
+            segments = self._plan_segments(len(plan.slides), jobs)
+        renderer = SlideshowRenderer(
+            plan.slides,
+            plan.size,
+            self.settings.fps,
+            plan.image_duration,
+            self.settings.transition_duration,
+            workers=max(1, FRAME_WORKERS // jobs),
+            queue_bytes=FRAME_QUEUE_BYTES // jobs,
+            slide_loader=slide_loader
+        )
+        logger.info(f"开始创建视频: {self.settings.output_path}（{renderer.frame_count} 帧，{len(segments)} 个片段）")
+
+        if len(segments) > 1:
+            return self._encode_segments(plan, renderer, segments, jobs, output_path)
+        return self._run_ffmpeg(self._build_ffmpeg_command(plan, output_path), renderer.frames(),
+                                on_progress=lambda out_time, speed: self._report_progress(
+                                    "正在编码", out_time, plan.video_duration, speed))
+
+    def _run_ffmpeg(self, cmd: List[str], frames: Optional[Iterator[bytes]] = None,
+                    on_progress: Optional[Callable[[float, Optional[float]], None]] = None) -> bool:
+        """
+        运行ffmpeg，frames 不为None时把帧数据写入其标准输入
+        通过 -progress pipe:1 读取进度，on_progress(已编码时长, 编码速度) 在读取线程中调用；
+        进程在独立的进程组中运行，取消时结束整个进程树
+        """
+        cmd = [cmd[0], '-progress', 'pipe:1', '-nostats', *cmd[1:]]
+        logger.debug(f"FFmpeg命令: {' '.join(cmd)}")
+        try:
+            if self.cancelled:
                 return False
+            process = subprocess.Popen(cmd, stdin=subprocess.PIPE if frames is not None else subprocess.DEVNULL,
+                                       stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                       **_process_group_kwargs())
+        except Exception as e:
+            logger.error(f"创建视频时出错: {e}")
+            if frames is not None:
+                frames.close()
+            return False
 
-            logger.info(f"视频创建成功: {self.settings.output_path}")
-            return True
+        with self._lock:
+            self._processes.add(process)
+        # 注册之前可能已经取消
+        if self.cancelled:
+            _kill_process_tree(process)
+
+        # 持续读取ffmpeg的输出，避免管道写满后ffmpeg阻塞；错误信息只保留最后几十行
+        stderr_tail = deque(maxlen=50)
+        readers = [
+            threading.Thread(target=lambda: stderr_tail.extend(process.stderr), daemon=True),
+            threading.Thread(target=_read_progress, args=(process.stdout, on_progress), daemon=True)
+        ]
+        for reader in readers:
+            reader.start()
 
+        try:
+            if frames is not None:
+                for frame in frames:
+                    if self.cancelled:
+                        _kill_process_tree(process)
+                        break
+                    process.stdin.write(frame)
+                process.stdin.close()
+        except BrokenPipeError:
+            # ffmpeg提前退出（或已被取消），错误信息见其输出
+            pass
         except Exception as e:
             logger.error(f"创建视频时出错: {e}")
+            _kill_process_tree(process)
             return False
         finally:
-            # 清理临时文件
-            if image_list_file and image_list_file.exists():
-                try:
-                    image_list_file.unlink()
-                except:
-                    pass
-
-    def _create_image_list_file(self, image_paths: List[Union[str, Path]]) -> Optional[Path]:
-        """创建图片列表文件（用于ffmpeg concat）"""
+            if frames is not None:
+                frames.close()
+            returncode = process.wait()
+            for reader in readers:
+                reader.join()
+            with self._lock:
+                self._processes.discard(process)
+
+        if self.cancelled:
+            return False
+        if returncode != 0:
+            stderr = b''.join(stderr_tail).decode('utf-8', errors='ignore')
+            logger.error(f"FFmpeg执行失败: {stderr}")
+            return False
+        return True
+
+    def _get_parallel_jobs(self) -> int:
+        """并行编码的ffmpeg进程数"""
+        if self.settings.parallel_jobs > 0:
+            return self.settings.parallel_jobs
+        return min(4, os.cpu_count() or 1)
+
+    @staticmethod
+    def _plan_segments(slide_count: int, jobs: int) -> List[Tuple[int, int]]:
+        """
+        按图片边界划分片段，返回每个片段的 (第一张, 最后一张+1)
+        片段数量不少于并行进程数；片段不会太长，中断后可以按片段续传
+        """
+        per_segment = min(max(math.ceil(slide_count / jobs), SEGMENT_MIN_SLIDES), SEGMENT_MAX_SLIDES)
+        return [(first, min(first + per_segment, slide_count))
+                for first in range(0, slide_count, per_segment)]
+
+    def _get_segment_dir(self) -> Path:
+        """片段缓存目录，与输出文件在同一目录"""
+        output_path = Path(self.settings.output_path)
+        return output_path.with_name(f".{output_path.stem}.segments")
+
+    def _get_segment_key(self, renderer: SlideshowRenderer, first: int, last: int) -> str:
+        """
+        片段的缓存键：编码参数、帧数以及用到的图片（含过渡到的下一张）的路径、大小和修改时间
+        任何一项变化都会重新编码该片段
+        """
+        parts = [self.settings.codec, self.settings.bitrate, self.settings.fps, self.settings.resolution,
+                 renderer.slide_frames, renderer.transition_frames]
+        for path in renderer.image_paths[first:last + 1]:
+            try:
+                stat = path.stat()
+                parts.extend([str(path.absolute()), stat.st_size, stat.st_mtime_ns])
+            except OSError:
+                parts.append(str(path.absolute()))
+        return hashlib.sha1(json.dumps(parts).encode('utf-8')).hexdigest()[:16]
+
+    def _build_segment_command(self, plan: VideoPlan, segment_path: Path, threads: int) -> List[str]:
+        """构建片段编码命令：与整段编码的视频参数相同，不含音频"""
+        width, height = plan.size
+        return [
+            'ffmpeg', '-y',
+            '-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}',
+            '-r', str(self.settings.fps), '-i', '-',
+            '-c:v', self.settings.codec,
+            '-b:v', self.settings.bitrate,
+            '-r', str(self.settings.fps),
+            '-pix_fmt', 'yuv420p',
+            '-threads', str(threads),
+            '-an',
+            str(segment_path)
+        ]
+
+    def _encode_segment(self, plan: VideoPlan, renderer: SlideshowRenderer, first: int, last: int,
+                        segment_path: Path, threads: int, on_progress) -> bool:
+        """编码一个片段，先写入临时文件，成功后再改名，缓存目录中只有完整的片段"""
+        tmp_path = segment_path.with_name(f"{segment_path.stem}.partial{segment_path.suffix}")
+        start, stop = renderer.slide_range(first, last)
+        if not self._run_ffmpeg(self._build_segment_command(plan, tmp_path, threads),
+                                renderer.frames(start, stop), on_progress):
+            tmp_path.unlink(missing_ok=True)
+            return False
+        os.replace(tmp_path, segment_path)
+        logger.info(f"片段编码完成: 第 {first + 1}-{last} 张图片")
+        return True
+
+    def _encode_segments(self, plan: VideoPlan, renderer: SlideshowRenderer,
+                         segments: List[Tuple[int, int]], jobs: int, output_path: Path) -> bool:
+        """
+        并行编码各个片段，再用concat分离器直接拼接（-c copy）并混入音频
+        已经编码完成的片段会保留在缓存目录中，失败后再次运行时跳过；全部成功后删除缓存目录
+        """
+        segment_dir = self._get_segment_dir()
+        segment_dir.mkdir(parents=True, exist_ok=True)
+        segment_paths = [segment_dir / f"segment_{index:04d}_{self._get_segment_key(renderer, first, last)}.mkv"
+                         for index, (first, last) in enumerate(segments)]
+
+        # 清理参数变化后不再使用的旧片段和中断时留下的临时文件
+        expected = {path.name for path in segment_paths}
+        for path in segment_dir.iterdir():
+            if path.name not in expected:
+                path.unlink(missing_ok=True)
+
+        pending = [(index, first, last) for index, (first, last) in enumerate(segments)
+                   if not segment_paths[index].exists()]
+        if len(pending) < len(segments):
+            logger.info(f"复用已编码的片段 {len(segments) - len(pending)}/{len(segments)}")
+
+        # 各片段的已编码时长和速度汇总为整体进度
+        fps = self.settings.fps
+        total_time = renderer.frame_count / fps
+        reused_time = sum((last - first) * renderer.slide_frames
+                          for index, (first, last) in enumerate(segments) if segment_paths[index].exists()) / fps
+        progress_lock = threading.Lock()
+        encoded, speeds = {}, {}
+
+        def segment_progress(index):
+            def on_progress(out_time, speed):
+                with progress_lock:
+                    encoded[index] = out_time
+                    speeds[index] = speed
+                    done = reused_time + sum(encoded.values())
+                    speed_sum = sum(value for value in speeds.values() if value) or None
+                self._report_progress("正在编码片段", done, total_time, speed_sum)
+            return on_progress
+
+        def encode(index, first, last):
+            if self.cancelled:
+                return False
+            try:
+                return self._encode_segment(plan, renderer, first, last, segment_paths[index], threads,
+                                            segment_progress(index))
+            finally:
+                with progress_lock:
+                    speeds.pop(index, None)
+
+        # 每个ffmpeg进程分到的编码线程数
+        threads = max(1, (os.cpu_count() or 1) // jobs)
+        executor = ThreadPoolExecutor(max_workers=jobs, thread_name_prefix='video-segment')
         try:
-            # 创建临时文件
-            temp_file = Path("temp_image_list.txt")
-
-            with open(temp_file, 'w', encoding='utf-8') as f:
-                # 计算每张图片的持续时间
-                image_duration = self._calculate_image_duration()
-                
-                # 如果需要循环播放图片且音频比视频长
-                if (self.settings.loop_images and 
-                    self.settings.include_audio and 
-                    self.settings.audio_path):
-                    
-                    # 获取音频时长
-                    audio_duration = self._get_music_duration()
-                    if audio_duration and audio_duration > 0:
-                        # 计算需要循环多少次
-                        total_images_needed = int(audio_duration / image_duration) + 1
-                        logger.info(f"音频时长 {audio_duration:.1f}s，图片时长 {image_duration:.1f}s，需要循环 {total_images_needed} 次")
-                        
-                        # 循环写入图片
-                        for i in range(total_images_needed):
-                            img_idx = i % len(image_paths)
-                            img_path = Path(image_paths[img_idx])
-                            if not img_path.exists():
-                                logger.warning(f"图片不存在: {img_path}")
-                                continue
-                            
-                            f.write(f"file '{img_path.absolute()}'\n")
-                            f.write(f"duration {image_duration}\n")
-                        
-                        return temp_file if temp_file.exists() else None
-                
-                # 正常模式：不循环或不需要循环
-                for image_path in image_paths:
-                    img_path = Path(image_path)
-                    if not img_path.exists():
-                        logger.warning(f"图片不存在: {img_path}")
-                        continue
-
-                    # 写入图片路径和持续时间
-                    f.write(f"file '{img_path.absolute()}'\n")
-                    f.write(f"duration {image_duration}\n")
-
-            return temp_file if temp_file.exists() else None
+            futures = [executor.submit(encode, index, first, last) for index, first, last in pending]
+            for future in as_completed(futures):
+                if not future.result():
+                    if not self.cancelled:
+                        logger.error(f"片段编码失败，已完成的片段保留在 {segment_dir}，重新运行时将继续")
+                    return False
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
 
-        except Exception as e:
-            logger.error(f"创建图片列表文件时出错: {e}")
-            return None
+        list_file = segment_dir / "segments.txt"
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for path in segment_paths:
+                f.write(f"file '{path.name}'\n")
 
-    def _calculate_image_duration(self) -> float:
-        """计算每张图片的持续时间"""
-        if self.settings.playback_mode == PlaybackMode.FIXED_DURATION:
-            return self.settings.image_duration
-        elif self.settings.playback_mode == PlaybackMode.FIT_TO_MUSIC:
-            # 需要先获取音乐时长
-            music_duration = self._get_music_duration()
-            if music_duration and len(self._get_image_paths_from_output()) > 0:
-                image_count = len(self._get_image_paths_from_output())
-                return music_duration / image_count
-            else:
-                # 回退到固定时长
-                return self.settings.image_duration
-        return self.settings.image_duration
+        cmd = self._build_ffmpeg_command(plan, output_path, list_file, copy_video=True)
+        if not self._run_ffmpeg(cmd, on_progress=lambda out_time, speed: self._report_progress(
+                "正在合并片段", out_time, plan.video_duration, speed)):
+            return False
 
-    def _get_music_duration(self) -> Optional[float]:
+        shutil.rmtree(segment_dir, ignore_errors=True)
+        return True
+
+    def _get_frame_size(self):
+        """解析分辨率"""
+        width, height = self.settings.resolution.split('x')
+        return int(width), int(height)
+
+    def _create_image_list_file(self, plan: VideoPlan, temp_dir: Path) -> Path:
+        """在临时目录中创建图片列表文件（用于ffmpeg concat）"""
+        list_file = temp_dir / "image_list.txt"
+        with open(list_file, 'w', encoding='utf-8') as f:
+            for img_path in plan.slides:
+                # 写入图片路径和持续时间
+                f.write(f"file '{img_path.absolute()}'\n")
+                f.write(f"duration {plan.image_duration}\n")
+        return list_file
+
+    def _get_music_duration(self, audio_path: Path) -> Optional[float]:
         """获取音乐时长（秒）"""
-        if not self.settings.audio_path or not Path(self.settings.audio_path).exists():
-            return None
-
         try:
             # 使用ffprobe获取音频时长（确保路径被正确引用）
-            audio_path = Path(self.settings.audio_path)
             cmd = [
                 'ffprobe',
                 '-v', 'error',
@@ -217,112 +668,74 @@ class VideoCreator:
         
         return image_paths
 
-    def _build_ffmpeg_command(self, image_list_file: Path) -> List[str]:
-        """构建ffmpeg命令"""
+    def _build_ffmpeg_command(self, plan: VideoPlan, output_path: Path, image_list_file: Optional[Path] = None,
+                              copy_video: bool = False) -> List[str]:
+        """
+        构建ffmpeg命令
+        指定图片列表文件时由ffmpeg拼接、缩放图片，否则从标准输入读取已渲染好的rgb24帧；
+        copy_video 为 True 时 image_list_file 为已编码的视频片段列表，视频流直接复制不重新编码
+        """
         cmd = ['ffmpeg', '-y']  # -y 覆盖输出文件
         
-        # 输入图片列表
-        cmd.extend(['-f', 'concat', '-safe', '0', '-i', str(image_list_file)])
+        width, height = plan.size
+        
+        video_args = [
+            '-c:v', self.settings.codec,
+            '-b:v', self.settings.bitrate,
+            '-r', str(self.settings.fps),
+            '-pix_fmt', 'yuv420p'
+        ]
+        if image_list_file:
+            # 输入图片列表（或视频片段列表）
+            cmd.extend(['-f', 'concat', '-safe', '0', '-i', str(image_list_file)])
+            if copy_video:
+                video_args = ['-c:v', 'copy']
+            else:
+                video_args.extend(['-vf', f'scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2'])
+        else:
+            # 标准输入的原始帧，已经是目标分辨率
+            cmd.extend(['-f', 'rawvideo', '-pix_fmt', 'rgb24', '-s', f'{width}x{height}',
+                        '-r', str(self.settings.fps), '-i', '-'])
         
         # 音频处理
-        if self.settings.include_audio and self.settings.audio_path:
+        if plan.audio_path is not None:
             # 添加音频输入（确保路径被正确引用）
-            audio_path = Path(self.settings.audio_path)
-            cmd.extend(['-i', str(audio_path.absolute())])
-            
-            # 解析分辨率
-            resolution = self.settings.resolution
-            width, height = resolution.split('x')
-            
-            # 获取音频时长
-            audio_duration = self._get_music_duration()
-            video_duration = self._calculate_video_duration()
-            
-            # 确定淡出开始时间：使用音频时长或视频时长中的较小值
-            if audio_duration and audio_duration > 0:
-                # 如果音频比视频长，使用视频时长作为淡出开始时间
-                fade_out_start = min(video_duration, audio_duration) - self.settings.fade_out_duration
-            else:
-                # 无法获取音频时长，使用视频时长
-                fade_out_start = video_duration - self.settings.fade_out_duration
-            
-            # 确保淡出开始时间不小于0
-            fade_out_start = max(0, fade_out_start)
+            cmd.extend(['-i', str(plan.audio_path.absolute())])
             
             # 视频编码参数（必须在音频输入之后）
             cmd.extend([
-                '-c:v', self.settings.codec,
-                '-b:v', self.settings.bitrate,
-                '-r', str(self.settings.fps),
-                '-pix_fmt', 'yuv420p',
-                '-vf', f'scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2',
+                *video_args,
                 '-c:a', 'aac',
                 '-b:a', '192k',
                 '-filter_complex',
                 f'[1:a]volume={self.settings.audio_volume}[audio];'
                 f'[audio]afade=t=in:st=0:d={self.settings.fade_in_duration},'
-                f'afade=t=out:st={fade_out_start}:d={self.settings.fade_out_duration}[final_audio]',
+                f'afade=t=out:st={plan.fade_out_start}:d={self.settings.fade_out_duration}[final_audio]',
                 '-map', '0:v',
                 '-map', '[final_audio]',
                 '-shortest'  # 以视频或音频中较短的一个为准
             ])
         else:
             # 无音频
-            # 解析分辨率
-            resolution = self.settings.resolution
-            width, height = resolution.split('x')
-            
             # 视频编码参数
             cmd.extend([
-                '-c:v', self.settings.codec,
-                '-b:v', self.settings.bitrate,
-                '-r', str(self.settings.fps),
-                '-pix_fmt', 'yuv420p',
-                '-vf', f'scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2',
+                *video_args,
                 '-an'  # 无音频
             ])
         
         # 输出文件
-        cmd.append(self.settings.output_path)
+        cmd.append(str(output_path))
         
         return cmd
 
-    def _calculate_video_duration(self) -> float:
-        """计算视频总时长"""
-        image_paths = self._get_image_paths_from_output()
-        if not image_paths:
-            return 0.0
-
-        image_duration = self._calculate_image_duration()
-        
-        # 如果需要循环播放图片且音频比视频长
-        if (self.settings.loop_images and 
-            self.settings.include_audio and 
-            self.settings.audio_path):
-            
-            # 获取音频时长
-            audio_duration = self._get_music_duration()
-            if audio_duration and audio_duration > 0:
-                # 视频时长应该等于音频时长
-                return audio_duration
-        
-        # 正常模式：不循环或不需要循环
-        return len(image_paths) * image_duration
-
-    def create_video_from_output_folder(self) -> bool:
+    def create_video_from_output_folder(self, progress_callback: Optional[ProgressCallback] = None) -> bool:
         """从output文件夹创建视频"""
         image_paths = self._get_image_paths_from_output()
         if not image_paths:
             logger.error("output文件夹中没有找到图片")
             return False
 
-        # 如果使用音乐适配模式，需要检查音乐文件
-        if self.settings.playback_mode == PlaybackMode.FIT_TO_MUSIC:
-            if not self.settings.audio_path or not Path(self.settings.audio_path).exists():
-                logger.warning("音乐适配模式需要有效的音乐文件，将使用固定时长模式")
-                self.settings.playback_mode = PlaybackMode.FIXED_DURATION
-
-        return self.create_video_from_images(image_paths)
+        return self.create_video_from_images(image_paths, progress_callback)
 
 
 def get_available_music_files() -> List[Path]:
@@ -0,0 +1,252 @@
+"""
+视频帧渲染
+每张图片只解码、缩放一次（等比缩放到目标分辨率并居中填充黑边，与 ffmpeg 的 scale+pad 效果一致），
+相邻图片之间按过渡时长生成交叉淡化帧；帧在线程池中生成，按顺序经有界队列交给调用方，
+调用方把原始 RGB 数据通过标准输入交给 ffmpeg 编码
+"""
+
+import io
+import logging
+import os
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Iterator, List, Optional, Tuple
+
+from PIL import Image
+
+from core.metadata import ORIENTATION_TAG, apply_orientation
+from core.tiled import BandSource, map_bands
+
+logger = logging.getLogger(__name__)
+
+# 排队等待写入的帧数量上限
+FRAME_QUEUE_SIZE = 24
+# 排队帧占用的内存上限（4K 分辨率下会少于 FRAME_QUEUE_SIZE 帧）
+FRAME_QUEUE_BYTES = 256 * 1024 * 1024
+# 生成帧的线程数量（Image.blend 和缩放都会释放GIL）
+FRAME_WORKERS = min(4, os.cpu_count() or 1)
+# 提前解码、缩放的图片数量
+SLIDE_PREFETCH = 2
+# 处理流程直接交给视频时，最多领先渲染的图片数量
+FEED_DEPTH = 4
+
+Slide = Tuple[Image.Image, bytes]
+
+
+def _scaled_size(image_size: Tuple[int, int], size: Tuple[int, int]) -> Tuple[int, int]:
+    ratio = min(size[0] / image_size[0], size[1] / image_size[1])
+    return max(1, round(image_size[0] * ratio)), max(1, round(image_size[1] * ratio))
+
+
+def _letterbox(img: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    frame = Image.new('RGB', size)
+    frame.paste(img, ((size[0] - img.width) // 2, (size[1] - img.height) // 2))
+    return frame
+
+
+def fit_image_to_frame(image: Image.Image, size: Tuple[int, int]) -> Image.Image:
+    """把已经在内存中的图片等比缩放到 size 以内，居中贴在黑色背景上，不修改原图"""
+    scaled_size = _scaled_size(image.size, size)
+    img = image if image.mode == 'RGB' else image.convert('RGB')
+    if scaled_size != img.size:
+        img = img.resize(scaled_size, Image.LANCZOS)
+    frame = _letterbox(img, size)
+    if img is not image:
+        img.close()
+    return frame
+
+
+def fit_bands_to_frame(bands: BandSource, size: Tuple[int, int]) -> Image.Image:
+    """分块处理的结果逐条缩小后拼成视频画面，不生成整张图片"""
+    scaled_width, scaled_height = _scaled_size(bands.size, size)
+    with Image.new('RGB', (scaled_width, scaled_height)) as scaled:
+        for top, band in map_bands(bands, lambda band: band):
+            y0 = round(top * scaled_height / bands.height)
+            y1 = round((top + band.height) * scaled_height / bands.height)
+            if y1 > y0:
+                with band.resize((scaled_width, y1 - y0), Image.BOX) as part:
+                    scaled.paste(part, (0, y0))
+            band.close()
+        return _letterbox(scaled, size)
+
+
+def fit_to_frame(path: Path, size: Tuple[int, int]) -> Image.Image:
+    """读取图片并等比缩放到 size 以内，居中贴在黑色背景上"""
+    width, height = size
+    with Image.open(path) as img:
+        orientation = img.getexif().get(ORIENTATION_TAG, 1)
+        # JPEG 解码时直接按比例缩小，方向为 5~8 时宽高互换
+        img.draft('RGB', (height, width) if orientation in (5, 6, 7, 8) else size)
+        img = apply_orientation(img.convert('RGB'), orientation)
+    frame = fit_image_to_frame(img, size)
+    img.close()
+    return frame
+
+
+class FrameFeed:
+    """
+    处理流程直接交给视频渲染的画面
+    处理方按图片顺序 put，渲染方按幻灯片序号 slide 取用；已放入但未取走的画面不超过 depth 张。
+    循环播放时同一张图片会再次出现，第一次取走后在内存中保留一份JPEG压缩的副本
+    """
+
+    def __init__(self, image_count: int, loop: bool = False, depth: int = FEED_DEPTH):
+        self.image_count = image_count
+        self.loop = loop
+        self.depth = max(depth, SLIDE_PREFETCH + 1)
+        self._frames = {}
+        self._reuse = {}
+        self._condition = threading.Condition()
+        self._closed = False
+
+    def put(self, index: int, frame: Optional[Image.Image]) -> None:
+        """放入第 index 张图片的画面，处理失败时为None；渲染方来不及取用时阻塞"""
+        with self._condition:
+            self._condition.wait_for(lambda: len(self._frames) < self.depth or self._closed)
+            if self._closed:
+                return
+            self._frames[index] = frame
+            self._condition.notify_all()
+
+    def close(self) -> None:
+        """不再放入画面（处理结束或取消），等待中的渲染方拿到None"""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def slide(self, slide_index: int) -> Optional[Image.Image]:
+        """第 slide_index 张幻灯片的画面，尚未处理完成时等待"""
+        index = slide_index % self.image_count
+        if slide_index >= self.image_count:
+            with self._condition:
+                self._condition.wait_for(lambda: index in self._reuse or self._closed)
+                data = self._reuse.get(index)
+            return Image.open(io.BytesIO(data)).convert('RGB') if data is not None else None
+
+        with self._condition:
+            self._condition.wait_for(lambda: index in self._frames or self._closed)
+            frame = self._frames.pop(index, None)
+            self._condition.notify_all()
+        if self.loop:
+            data = None
+            if frame is not None:
+                buffer = io.BytesIO()
+                frame.save(buffer, 'JPEG', quality=95)
+                data = buffer.getvalue()
+            with self._condition:
+                self._reuse[index] = data
+                self._condition.notify_all()
+        return frame
+
+
+class SlideshowRenderer:
+    """
+    幻灯片帧序列
+    每张图片占 image_duration 秒，过渡在前一张图片的最后 transition_duration 秒内进行，
+    因此视频总时长与不加过渡时相同；最后一张图片之后没有过渡
+    """
+
+    def __init__(self, image_paths: List[Path], size: Tuple[int, int], fps: int,
+                 image_duration: float, transition_duration: float = 0.0,
+                 workers: int = FRAME_WORKERS, queue_bytes: int = FRAME_QUEUE_BYTES,
+                 slide_loader: Optional[Callable[[int], Optional[Image.Image]]] = None):
+        """
+        :param slide_loader: 按幻灯片序号提供已缩放到 size 的画面（如 FrameFeed.slide），
+                             为None时从 image_paths 读取图片
+        """
+        self.image_paths = [Path(path) for path in image_paths]
+        self.slide_loader = slide_loader
+        self.size = size
+        self.fps = fps
+        self.workers = max(1, workers)
+        self.queue_bytes = queue_bytes
+        self.slide_frames = max(1, round(image_duration * fps))
+        # 过渡最多占单张图片时长的一半
+        self.transition_frames = min(max(0, round(transition_duration * fps)), self.slide_frames // 2)
+
+    @property
+    def frame_bytes(self) -> int:
+        return self.size[0] * self.size[1] * 3
+
+    @property
+    def frame_count(self) -> int:
+        return len(self.image_paths) * self.slide_frames
+
+    def frame_at(self, index: int) -> Tuple[int, Optional[int], float]:
+        """
+        第 index 帧的内容
+        :return: (当前图片序号, 过渡的下一张图片序号或None, 下一张图片的混合比例)
+        """
+        slide, offset = divmod(index, self.slide_frames)
+        start = self.slide_frames - self.transition_frames
+        if self.transition_frames and offset >= start and slide + 1 < len(self.image_paths):
+            return slide, slide + 1, (offset - start + 1) / (self.transition_frames + 1)
+        return slide, None, 0.0
+
+    def _load_slide(self, index: int) -> Slide:
+        path = self.image_paths[index]
+        try:
+            frame = self.slide_loader(index) if self.slide_loader else fit_to_frame(path, self.size)
+            if frame is None:
+                raise ValueError("图片处理失败")
+        except Exception as e:
+            logger.warning(f"读取图片失败，使用黑色画面代替: {path}: {e}")
+            frame = Image.new('RGB', self.size)
+        # 静止画面的帧数据只生成一次，之后重复写入同一个对象
+        return frame, frame.tobytes()
+
+    @staticmethod
+    def _static_frame(slide: Future) -> bytes:
+        return slide.result()[1]
+
+    @staticmethod
+    def _blend_frame(current: Future, following: Future, alpha: float) -> bytes:
+        with Image.blend(current.result()[0], following.result()[0], alpha) as frame:
+            return frame.tobytes()
+
+    def slide_range(self, first: int, last: int) -> Tuple[int, int]:
+        """第 first 到 last-1 张图片对应的帧范围 [start, stop)，包含最后一张图片末尾的过渡"""
+        return first * self.slide_frames, last * self.slide_frames
+
+    def frames(self, start: int = 0, stop: Optional[int] = None) -> Iterator[bytes]:
+        """
+        按顺序返回 [start, stop) 范围内每一帧的 rgb24 数据
+        图片和帧分别在两个线程池中生成，排队的帧数量有上限；提前结束迭代时取消未开始的任务
+        """
+        stop = self.frame_count if stop is None else min(stop, self.frame_count)
+        queue_size = max(2, min(FRAME_QUEUE_SIZE, self.queue_bytes // self.frame_bytes))
+        slide_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='video-slide')
+        frame_pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='video-frame')
+        # 范围内最后一张图片及其过渡的下一张之后不再预读
+        slide_limit = min(len(self.image_paths), (stop - 1) // self.slide_frames + 2)
+        slides = {}
+
+        def slide(index):
+            if index not in slides:
+                slides[index] = slide_pool.submit(self._load_slide, index)
+            return slides[index]
+
+        try:
+            queue = deque()
+            for index in range(start, stop):
+                current, following, alpha = self.frame_at(index)
+                for ahead in range(current, min(current + SLIDE_PREFETCH + 1, slide_limit)):
+                    slide(ahead)
+                # 已提交的帧任务持有所需图片的引用，这里只释放字典中的引用
+                for passed in [key for key in slides if key < current]:
+                    del slides[passed]
+
+                if following is None:
+                    job = frame_pool.submit(self._static_frame, slide(current))
+                else:
+                    job = frame_pool.submit(self._blend_frame, slide(current), slide(following), alpha)
+                if len(queue) >= queue_size:
+                    yield queue.popleft().result()
+                queue.append(job)
+            while queue:
+                yield queue.popleft().result()
+        finally:
+            frame_pool.shutdown(wait=True, cancel_futures=True)
+            slide_pool.shutdown(wait=True, cancel_futures=True)
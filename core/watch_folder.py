@@ -0,0 +1,399 @@
+"""
+监视文件夹自动处理
+监视输入文件夹（Linux 上使用 inotify，其他情况定时扫描），新图片写入完成（大小和修改时间
+在一段时间内不再变化）后按批交给 run_batch 处理；处理记录保存在日志数据库中，
+重启后不会重复处理已处理的图片，停止期间新增的图片在启动时补处理
+"""
+
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import sqlite3
+import struct
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from config.constant import IMAGE_EXTENSIONS
+from core.batch_processor import BatchOptions, BatchResult, plan_outputs, run_batch
+from core.cancellation import CancelToken
+from core.image_processor import ProcessorComponent
+
+logger = logging.getLogger(__name__)
+
+# 文件大小和修改时间保持不变多久（秒）后认为写入完成
+DEFAULT_SETTLE_SECONDS = 2.0
+# 定时扫描的间隔（秒）
+DEFAULT_POLL_INTERVAL = 1.0
+# 每批最多处理的图片数量
+DEFAULT_BATCH_SIZE = 32
+# 日志数据库结构版本，保存在 PRAGMA user_version 中
+JOURNAL_SCHEMA_VERSION = 1
+
+
+def is_candidate(path: Path) -> bool:
+    """是否为需要处理的图片：跳过隐藏文件（包括写入中的临时文件 .xxx.partial.jpg）"""
+    return not path.name.startswith('.') and path.suffix.lower() in IMAGE_EXTENSIONS
+
+
+def scan_images(directories: Iterable[Path], recursive: bool = False,
+                exclude: Iterable[Path] = ()) -> Dict[Path, Tuple[int, int]]:
+    """扫描文件夹中的图片，返回 路径 -> (大小, 修改时间ns)"""
+    exclude = {Path(p).resolve() for p in exclude}
+    found = {}
+    pending = [Path(d) for d in directories]
+    while pending:
+        directory = pending.pop()
+        if directory.resolve() in exclude:
+            continue
+        try:
+            with os.scandir(directory) as it:
+                for entry in it:
+                    path = Path(entry.path)
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive and not entry.name.startswith('.'):
+                            pending.append(path)
+                    elif entry.is_file() and is_candidate(path):
+                        stat = entry.stat()
+                        found[path] = (stat.st_size, stat.st_mtime_ns)
+        except OSError as e:
+            logger.warning(f"无法读取文件夹 {directory}: {e}")
+    return found
+
+
+class PollingWatcher:
+    """定时扫描文件夹，返回新增或有变化的图片"""
+
+    def __init__(self, directories: List[Path], recursive: bool = False, interval: float = DEFAULT_POLL_INTERVAL,
+                 exclude: Iterable[Path] = ()):
+        self.directories = directories
+        self.recursive = recursive
+        self.interval = interval
+        self.exclude = list(exclude)
+        self._snapshot = scan_images(directories, recursive, self.exclude)
+        self._next_scan = time.monotonic() + interval
+
+    def poll(self, timeout: float) -> Set[Path]:
+        """等待最多 timeout 秒，返回有变化的文件"""
+        delay = self._next_scan - time.monotonic()
+        if delay > timeout:
+            time.sleep(max(0.0, timeout))
+            return set()
+        time.sleep(max(0.0, delay))
+        self._next_scan = time.monotonic() + self.interval
+        snapshot = scan_images(self.directories, self.recursive, self.exclude)
+        changed = {path for path, stat in snapshot.items() if self._snapshot.get(path) != stat}
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """
+    通过 inotify 接收文件夹事件（只在Linux上可用），没有事件时不扫描文件夹；
+    事件队列溢出时扫描一次全部文件夹
+    """
+
+    IN_CLOSE_WRITE = 0x00000008
+    IN_MOVED_TO = 0x00000080
+    IN_CREATE = 0x00000100
+    IN_Q_OVERFLOW = 0x00004000
+    IN_IGNORED = 0x00008000
+    IN_ISDIR = 0x40000000
+    _MASK = IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+    _EVENT = struct.Struct('iIII')
+
+    def __init__(self, directories: List[Path], recursive: bool = False, exclude: Iterable[Path] = ()):
+        if not sys.platform.startswith('linux'):
+            raise OSError("inotify 只在Linux上可用")
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+        self.directories = directories
+        self.recursive = recursive
+        self.exclude = {Path(p).resolve() for p in exclude}
+        self._watches: Dict[int, Path] = {}
+        try:
+            for directory in directories:
+                self._add_tree(Path(directory))
+        except OSError:
+            self.close()
+            raise
+
+    def _add_watch(self, directory: Path) -> bool:
+        if directory.resolve() in self.exclude:
+            return False
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(str(directory)), self._MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"无法监视 {directory}: {os.strerror(errno)}")
+        self._watches[wd] = directory
+        return True
+
+    def _add_tree(self, directory: Path):
+        if not self._add_watch(directory) or not self.recursive:
+            return
+        for child in directory.iterdir():
+            if child.is_dir() and not child.name.startswith('.'):
+                self._add_tree(child)
+
+    def poll(self, timeout: float) -> Set[Path]:
+        """等待最多 timeout 秒，返回有事件的文件"""
+        readable, _, _ = select.select([self._fd], [], [], max(0.0, timeout))
+        if not readable:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        changed = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = self._EVENT.unpack_from(data, offset)
+            offset += self._EVENT.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & self.IN_Q_OVERFLOW:
+                logger.warning("inotify 事件队列溢出，重新扫描文件夹")
+                changed.update(scan_images(self.directories, self.recursive, self.exclude))
+                continue
+            if mask & self.IN_IGNORED:
+                self._watches.pop(wd, None)
+                continue
+            directory = self._watches.get(wd)
+            if directory is None or not name:
+                continue
+            path = directory / name
+            if mask & self.IN_ISDIR:
+                # 新建（或移入）的子文件夹：添加监视，并补上添加监视之前已经写入的文件
+                if self.recursive and not name.startswith('.'):
+                    try:
+                        self._add_tree(path)
+                    except OSError as e:
+                        logger.warning(str(e))
+                    changed.update(scan_images([path], True, self.exclude))
+            elif is_candidate(path):
+                changed.add(path)
+        return changed
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(directories: List[Path], recursive: bool = False, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                   use_inotify: bool = True, exclude: Iterable[Path] = ()):
+    """优先使用 inotify，不可用时定时扫描"""
+    if use_inotify:
+        try:
+            return InotifyWatcher(directories, recursive, exclude)
+        except (OSError, AttributeError) as e:
+            logger.info(f"inotify 不可用（{e}），改为每 {poll_interval} 秒扫描一次")
+    return PollingWatcher(directories, recursive, poll_interval, exclude)
+
+
+@dataclass
+class _Pending:
+    size: int
+    mtime_ns: int
+    stable_since: float
+
+
+class SettleTracker:
+    """
+    等待文件写入完成：文件大小和修改时间在 settle_seconds 内没有变化，且不是空文件
+    """
+
+    def __init__(self, settle_seconds: float = DEFAULT_SETTLE_SECONDS):
+        self.settle_seconds = settle_seconds
+        self._pending: Dict[Path, _Pending] = {}
+
+    def __len__(self):
+        return len(self._pending)
+
+    def add(self, paths: Iterable[Path]):
+        now = time.monotonic()
+        for path in paths:
+            # 有新事件时重新计时
+            self._pending[path] = _Pending(-1, -1, now)
+
+    def ready(self) -> List[Tuple[Path, int, int]]:
+        """返回已经写入完成的文件 [(路径, 大小, 修改时间ns)]，并停止跟踪"""
+        now = time.monotonic()
+        ready = []
+        for path, pending in list(self._pending.items()):
+            try:
+                stat = path.stat()
+            except OSError:
+                # 已被删除或移走
+                del self._pending[path]
+                continue
+            if (stat.st_size, stat.st_mtime_ns) != (pending.size, pending.mtime_ns):
+                pending.size, pending.mtime_ns, pending.stable_since = stat.st_size, stat.st_mtime_ns, now
+            elif stat.st_size > 0 and now - pending.stable_since >= self.settle_seconds:
+                ready.append((path, stat.st_size, stat.st_mtime_ns))
+                del self._pending[path]
+        return ready
+
+
+class WatchJournal:
+    """
+    处理记录：每个源文件的大小、修改时间、状态（pending / done / failed）和输出文件
+    大小或修改时间变化的文件视为新文件重新处理；处理中断（pending）的文件重启后使用原来的输出路径重新处理
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+        if version > JOURNAL_SCHEMA_VERSION:
+            raise RuntimeError(f"处理记录 {self.path} 的版本 ({version}) 高于当前程序支持的版本 ({JOURNAL_SCHEMA_VERSION})")
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER NOT NULL, "
+                "mtime_ns INTEGER NOT NULL, status TEXT NOT NULL, output TEXT, error TEXT, updated_at TEXT NOT NULL)")
+            self._connection.execute(f"PRAGMA user_version = {JOURNAL_SCHEMA_VERSION}")
+
+    def is_handled(self, path: Path, size: int, mtime_ns: int) -> bool:
+        """相同内容（大小和修改时间）的文件是否已经处理过（包括处理失败）"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT size, mtime_ns, status FROM files WHERE path = ?", (str(path),)).fetchone()
+        return row is not None and row[2] != 'pending' and (row[0], row[1]) == (size, mtime_ns)
+
+    def pending_outputs(self, paths: Iterable[Path]) -> Dict[Path, Path]:
+        """处理中断的文件上次分配的输出路径"""
+        with self._lock:
+            result = {}
+            for path in paths:
+                row = self._connection.execute(
+                    "SELECT output FROM files WHERE path = ? AND status = 'pending'", (str(path),)).fetchone()
+                if row is not None and row[0]:
+                    result[path] = Path(row[0])
+            return result
+
+    def _upsert(self, entries: Iterable[tuple]):
+        now = datetime.now().isoformat(timespec='seconds')
+        with self._lock, self._connection:
+            self._connection.executemany(
+                "INSERT INTO files (path, size, mtime_ns, status, output, error, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT(path) DO UPDATE SET size = excluded.size, mtime_ns = excluded.mtime_ns, "
+                "status = excluded.status, output = excluded.output, error = excluded.error, "
+                "updated_at = excluded.updated_at",
+                [entry + (now,) for entry in entries])
+
+    def mark_pending(self, plan: Dict[Path, Path], stats: Dict[Path, Tuple[int, int]]):
+        """处理前记录输出路径"""
+        self._upsert((str(source), *stats[source], 'pending', str(target), None) for source, target in plan.items())
+
+    def record(self, result: BatchResult, stats: Dict[Path, Tuple[int, int]]):
+        """记录处理结果，取消后没有处理的文件保持 pending"""
+        failed = set(result.failed)
+        outputs = set(result.outputs)
+        entries = []
+        for source, target in result.plan.items():
+            if source in failed:
+                entries.append((str(source), *stats[source], 'failed', None, "处理失败"))
+            elif target in outputs:
+                entries.append((str(source), *stats[source], 'done', str(target), None))
+        self._upsert(entries)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._connection.execute("SELECT status, COUNT(*) FROM files GROUP BY status"))
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+class FolderWatcher:
+    """
+    监视文件夹并自动处理新图片
+    启动时先补处理文件夹中还没有处理过的图片，然后等待新文件
+    """
+
+    def __init__(self, directories: List[Path], processor_chain: ProcessorComponent, options: BatchOptions,
+                 journal: WatchJournal, recursive: bool = False,
+                 settle_seconds: float = DEFAULT_SETTLE_SECONDS, poll_interval: float = DEFAULT_POLL_INTERVAL,
+                 batch_size: int = DEFAULT_BATCH_SIZE, use_inotify: bool = True,
+                 on_batch: Optional[Callable[[BatchResult], None]] = None):
+        """
+        :param on_batch: 每批处理完成后调用
+        """
+        self.directories = [Path(d) for d in directories]
+        self.processor_chain = processor_chain
+        self.options = options
+        self.journal = journal
+        self.recursive = recursive
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.use_inotify = use_inotify
+        self.on_batch = on_batch
+        self.tracker = SettleTracker(settle_seconds)
+        # 输出文件夹在监视范围内时不处理输出的图片
+        self._exclude = [Path(options.output_dir)]
+
+    def catch_up(self):
+        """把文件夹中还没有处理过的图片加入等待队列"""
+        existing = scan_images(self.directories, self.recursive, self._exclude)
+        new = [path for path, (size, mtime_ns) in existing.items()
+               if not self.journal.is_handled(path, size, mtime_ns)]
+        if new:
+            print(f"发现 {len(new)} 张未处理的图片")
+        self.tracker.add(new)
+
+    def process(self, ready: List[Tuple[Path, int, int]], token: Optional[CancelToken] = None) -> BatchResult:
+        """处理一批写入完成的图片，取消后没有处理的图片下次启动时补处理"""
+        stats = {path: (size, mtime_ns) for path, size, mtime_ns in ready}
+        file_list = [path for path, size, mtime_ns in ready if not self.journal.is_handled(path, size, mtime_ns)]
+        # 中断过的图片沿用原来的输出路径（覆盖写入），其他图片重新分配
+        plan = self.journal.pending_outputs(file_list)
+        plan.update(plan_outputs([path for path in file_list if path not in plan], self.options))
+        plan = {path: plan[path] for path in file_list}
+        self.journal.mark_pending(plan, stats)
+        result = run_batch(file_list, self.processor_chain, self.options, plan=plan,
+                           progress_callback=(lambda i, total, path: not token.cancelled) if token else None)
+        self.journal.record(result, stats)
+        if self.on_batch is not None:
+            self.on_batch(result)
+        return result
+
+    def run(self, token: CancelToken, once: bool = False):
+        """
+        运行直到取消
+        :param once: 处理完启动时已有的图片后结束，不等待新文件
+        """
+        watcher = None if once else create_watcher(self.directories, self.recursive, self.poll_interval,
+                                                   self.use_inotify, self._exclude)
+        try:
+            self.catch_up()
+            while not token.cancelled:
+                if watcher is not None:
+                    self.tracker.add(watcher.poll(min(self.poll_interval, self.tracker.settle_seconds / 2)
+                                                  if len(self.tracker) else self.poll_interval))
+                elif not len(self.tracker):
+                    break
+                else:
+                    token.wait(min(0.2, self.tracker.settle_seconds))
+                ready = self.tracker.ready()
+                for i in range(0, len(ready), self.batch_size):
+                    if token.cancelled:
+                        break
+                    self.process(ready[i:i + self.batch_size], token)
+        finally:
+            if watcher is not None:
+                watcher.close()
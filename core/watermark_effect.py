@@ -88,8 +88,8 @@ class WatermarkEffect(BaseEffect):
         if config is None:
             raise ValueError("WatermarkEffect需要Config对象")
         
-        # 设置背景颜色
-        config.bg_color = self.bg_color
+        # 后续的边距/边框沿用水印的背景色
+        container.context.bg_color = self.bg_color
         
         # 计算水印比例
         ratio = (.04 if container.get_ratio() >= 1 else .09) + 0.02 * config.get_font_padding_level()
@@ -154,6 +154,14 @@ def create_video_control_group(parent=None):
     
     form.addRow("输出路径:", output_layout)
     
+    # 图片来源：输出文件夹中已有的图片，或处理列表中的图片后直接交给视频
+    cb_source = QComboBox()
+    cb_source.addItem("输出文件夹", 'folder')
+    cb_source.addItem("处理列表（同时保存图片）", 'batch')
+    cb_source.addItem("处理列表（不保存图片）", 'batch_only')
+    cb_source.setToolTip("选择处理列表时，处理结果在内存中直接交给视频编码，不需要先写出再读取")
+    form.addRow("图片来源:", cb_source)
+    
     # 创建视频按钮
     btn_create_video = QPushButton("创建视频")
     btn_create_video.setStyleSheet("background-color: #4CAF50; color: white; font-weight: bold;")
@@ -178,6 +186,7 @@ def create_video_control_group(parent=None):
     return group, {
         'settings_button': btn_video_settings,
         'output_path': le_output_path,
+        'source': cb_source,
         'create_button': btn_create_video
     }
 
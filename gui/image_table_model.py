@@ -1,14 +1,21 @@
 from PyQt5.QtCore import QAbstractTableModel, Qt, QByteArray, QDataStream, QIODevice, pyqtSignal
-from PyQt5.QtCore import QMimeData
-from typing import List
+from PyQt5.QtCore import QFileSystemWatcher, QMimeData, QTimer
+from collections import defaultdict
+from typing import Iterable, List, Optional, Tuple
 import os
-from core.image_container import ImageContainer
+from core.image_metadata import ImageMetadata
+from core.metadata_store import MetadataStore, parse_filter
 from PyQt5.QtWidgets import (QPushButton, QTableView, QAbstractItemView,
                              QGroupBox, QFormLayout, QLineEdit, QComboBox,
                              QCheckBox, QHBoxLayout, QWidget, QVBoxLayout)
 
 from core.init import config
 
+# 缩略图列的表头
+THUMBNAIL_HEADER = "缩略图"
+# 文件夹变化后延迟刷新（毫秒），期间的多次变化（如批量写入时的创建、重命名）合并为一次
+DIRECTORY_REFRESH_DELAY_MS = 300
+
 
 def format_file_size(size_bytes):
     """格式化文件大小，返回Mb或Kb单位"""
@@ -28,17 +35,149 @@ def format_file_size(size_bytes):
     except (ValueError, TypeError):
         return "N/A"
 
+
+def _file_size(path) -> Optional[int]:
+    try:
+        return os.path.getsize(path)
+    except (OSError, TypeError):
+        return None
+
+
+def build_row(img: ImageMetadata, file_size: Optional[int]) -> Tuple[str, ...]:
+    """生成一行的显示内容，顺序与 ImageTableModel.all_headers 一致"""
+    return (
+        img.path.name,
+        img.path.suffix.upper(),
+        format_file_size(file_size),  # 文件大小列
+        img.make,
+        img.model,
+        img.lens_model,
+        img.focal_length + "mm",
+        "f/" + img.f_number,
+        img.iso,
+        img.exposure_time,
+        f"{img.original_width}×{img.original_height} ({img.total_pixel})",
+        img.datetime_str,
+        img.geo_info,
+        "",  # 缩略图列通过 DecorationRole 显示
+    )
+
+
+# 可以按数值、编号排序的列对应 MetadataStore 中的列，其余列按显示文本排序
+SORT_COLUMNS = {
+    "文件大小": 'file_size', "相机品牌": 'make', "相机型号": 'model', "镜头型号": 'lens',
+    "焦距": 'focal_length', "光圈": 'f_number', "ISO": 'iso', "曝光时间": 'exposure_time',
+    "分辨率": 'width', "拍摄时间": 'timestamp',
+}
+
+
 class ImageTableModel(QAbstractTableModel):
+    """
+    图片列表模型
+    每行的显示内容在添加时生成一次并缓存，绘制时不访问文件系统；
+    图片所在的文件夹有文件增删、重命名时自动刷新对应行，其余情况（如原地覆盖写入）调用 refresh。
+    排序、筛选使用列式存储的元数据（MetadataStore），不逐个访问图片对象
+    """
     order_changed = pyqtSignal()
 
-    def __init__(self, images: List[ImageContainer]):
+    def __init__(self, images: List[ImageMetadata], thumbnail_provider=None):
         super().__init__()
         self.images = images
         self.all_headers = [
             "文件名", "后缀名", "文件大小", "相机品牌", "相机型号", "镜头型号",
-            "焦距", "光圈", "ISO", "曝光时间", "分辨率", "拍摄时间", "GPS信息"
+            "焦距", "光圈", "ISO", "曝光时间", "分辨率", "拍摄时间", "GPS信息", THUMBNAIL_HEADER
         ]
+        self.thumbnail_provider = thumbnail_provider
+        if thumbnail_provider is not None:
+            thumbnail_provider.thumbnail_ready.connect(self.on_thumbnail_ready)
         self.update_visible_headers()
+
+        file_sizes = [_file_size(img.path) for img in images]
+        self._rows = [build_row(img, size) for img, size in zip(images, file_sizes)]
+        self.store = MetadataStore.from_images(images, file_sizes)
+        self._index_rows()
+        # 只监视图片所在的文件夹，数量远少于图片数量
+        self._watcher = QFileSystemWatcher(self)
+        self._watcher.directoryChanged.connect(self._on_directory_changed)
+        if self._rows_by_directory:
+            self._watcher.addPaths(sorted(self._rows_by_directory))
+        self._changed_directories = set()
+        self._refresh_timer = QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(DIRECTORY_REFRESH_DELAY_MS)
+        self._refresh_timer.timeout.connect(self._refresh_changed_directories)
+
+    def _index_rows(self):
+        """按文件夹、按路径建立行号索引，行顺序改变后重建"""
+        rows_by_directory = defaultdict(list)
+        self._row_by_path = {}
+        for row, img in enumerate(self.images):
+            rows_by_directory[str(img.path.parent)].append(row)
+            self._row_by_path[str(img.path)] = row
+        self._rows_by_directory = dict(rows_by_directory)
+
+    def refresh(self, rows: Optional[Iterable[int]] = None):
+        """
+        重新读取指定行（默认全部行）的文件信息，只通知内容有变化的行
+        """
+        rows = range(len(self.images)) if rows is None else rows
+        last_col = len(self.headers) - 1
+        for row in rows:
+            if not 0 <= row < len(self.images):
+                continue
+            file_size = _file_size(self.images[row].path)
+            self.store.set_value(row, 'file_size', file_size)
+            record = build_row(self.images[row], file_size)
+            if record != self._rows[row]:
+                self._rows[row] = record
+                self.dataChanged.emit(self.index(row, 0), self.index(row, last_col), [Qt.DisplayRole])
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        """
+        按列排序，直接调整图片列表的顺序（与拖拽调整顺序相同，处理时按排序后的顺序）
+        """
+        if not 0 <= column < len(self.column_mapping) or not self.images:
+            return
+        header = self.all_headers[self.column_mapping[column]]
+        if header == THUMBNAIL_HEADER:
+            return
+        descending = order == Qt.DescendingOrder
+        if header in SORT_COLUMNS:
+            row_order = self.store.sort_order(SORT_COLUMNS[header], descending)
+        else:
+            actual_col = self.column_mapping[column]
+            row_order = sorted(range(len(self._rows)), key=lambda row: self._rows[row][actual_col],
+                               reverse=descending)
+        if row_order != list(range(len(row_order))):
+            self._apply_order(row_order)
+
+    def _apply_order(self, row_order: List[int]):
+        """按新的行顺序（row_order[i] 为新第 i 行原来的行号）调整图片列表"""
+        self.layoutAboutToBeChanged.emit()
+        self.images[:] = [self.images[row] for row in row_order]
+        self._rows = [self._rows[row] for row in row_order]
+        self.store.take(row_order)
+        self._index_rows()
+        self.layoutChanged.emit()
+        self.order_changed.emit()
+
+    def filter_mask(self, text: str) -> bytearray:
+        """
+        筛选表达式（如 "ISO > 3200 and 镜头型号 = XF23mmF1.4 R"）对应的行标记，空表达式匹配全部行
+        :raise ValueError: 表达式无法解析
+        """
+        return self.store.mask(parse_filter(text)) if text.strip() else bytearray(b'\x01') * len(self.images)
+
+    def _on_directory_changed(self, directory):
+        # 不重启计时器：持续写入时也会每隔一段时间刷新一次
+        self._changed_directories.add(directory)
+        if not self._refresh_timer.isActive():
+            self._refresh_timer.start()
+
+    def _refresh_changed_directories(self):
+        directories, self._changed_directories = self._changed_directories, set()
+        for directory in directories:
+            self.refresh(self._rows_by_directory.get(directory, []))
     
     def update_visible_headers(self):
         """更新可见表头"""
@@ -59,6 +198,12 @@ class ImageTableModel(QAbstractTableModel):
             self.headers = self.all_headers.copy()
             self.column_mapping = list(range(len(self.all_headers)))
 
+    def thumbnail_column(self):
+        """返回缩略图列的索引，不可见时返回-1"""
+        if THUMBNAIL_HEADER in self.headers:
+            return self.headers.index(THUMBNAIL_HEADER)
+        return -1
+
     def rowCount(self, parent=None):
         return len(self.images)
 
@@ -73,10 +218,22 @@ class ImageTableModel(QAbstractTableModel):
             if 0 <= index.row() < len(self.images):
                 img = self.images[index.row()]
                 return str(img.path)
+        elif role == Qt.DecorationRole:
+            if (self.thumbnail_provider is not None and index.column() == self.thumbnail_column()
+                    and 0 <= index.row() < len(self.images)):
+                return self.thumbnail_provider.get(self.images[index.row()].path)
         return None
 
+    def on_thumbnail_ready(self, path):
+        """缩略图生成完成后刷新对应单元格"""
+        col = self.thumbnail_column()
+        row = self._row_by_path.get(path)
+        if col < 0 or row is None:
+            return
+        index = self.index(row, col)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
     def _get_display_data(self, index):
-        img = self.images[index.row()]
         col = index.column()
         
         # 获取实际的数据列索引
@@ -85,31 +242,8 @@ class ImageTableModel(QAbstractTableModel):
         else:
             return None
 
-        # 获取文件大小
-        file_size = None
-        try:
-            if img.path.exists():
-                file_size = os.path.getsize(img.path)
-        except (OSError, AttributeError):
-            file_size = None
-        
-        mapping = [
-            img.path.name,
-            img.path.suffix.upper(),
-            format_file_size(file_size),  # 文件大小列
-            img.make,
-            img.model,
-            img.lens_model,
-            img.focal_length + "mm",
-            "f/" + img.f_number,
-            img.iso,
-            img.exposure_time,
-            f"{img.original_width}×{img.original_height} ({getattr(img, '_param_dict', {}).get('total_pixel', 'N/A')})",
-            getattr(img, '_param_dict', {}).get('datetime', 'N/A'),
-            getattr(img, '_param_dict', {}).get('geo_info', 'N/A')
-
-        ]
-        return mapping[actual_col] if actual_col < len(mapping) else None
+        record = self._rows[index.row()]
+        return record[actual_col] if actual_col < len(record) else None
 
     def headerData(self, section, orientation, role=Qt.DisplayRole):
         if role == Qt.DisplayRole and orientation == Qt.Horizontal:
@@ -160,25 +294,19 @@ class ImageTableModel(QAbstractTableModel):
             dragged_rows.append(row_data)
 
         dragged_rows = sorted(set(dragged_rows), reverse=True)
-        moved_items = []
+        # 在行号列表上完成移动，再按新顺序调整图片、显示缓存和元数据
+        row_order = list(range(len(self.images)))
+        moved_rows = []
 
         for r in dragged_rows:
-            if 0 <= r < len(self.images):
-                moved_items.append(self.images[r])
-        moved_items.reverse()
+            if 0 <= r < len(row_order):
+                moved_rows.append(row_order.pop(r))
+        moved_rows.reverse()
 
-        for r in dragged_rows:
-            if 0 <= r < len(self.images):
-                self.images.pop(r)
+        insert_pos = min(begin_row, len(row_order))
+        row_order[insert_pos:insert_pos] = moved_rows
 
-        insert_pos = begin_row
-        for item in moved_items:
-            if insert_pos <= len(self.images):
-                self.images.insert(insert_pos, item)
-                insert_pos += 1
-
-        self.layoutChanged.emit()
-        self.order_changed.emit()
+        self._apply_order(row_order)
         return True
 
 def create_control_buttons():
@@ -1,28 +1,37 @@
 import logging
+from dataclasses import replace
 from pathlib import Path
 from typing import List
 from PyQt5.QtWidgets import (QMainWindow, QPushButton, QVBoxLayout, QLineEdit,
                              QComboBox, QCheckBox, QHBoxLayout, QWidget, QFileDialog, QMessageBox,
-                             QStatusBar, QSplitter, QTableView, QAbstractItemView, QProgressDialog,
-                             QApplication, QMenu, QAction,QListWidgetItem,QLabel, QTextEdit, QGroupBox, QDialog, QHeaderView)
-from PyQt5.QtCore import Qt, pyqtSignal
+                             QStatusBar, QSplitter, QTableView, QAbstractItemView,
+                             QMenu, QAction,QListWidgetItem,QLabel, QTextEdit, QGroupBox, QDialog, QHeaderView)
+from PyQt5.QtCore import Qt, pyqtSignal, QSize, QTimer
 from PyQt5.QtGui import QDragEnterEvent, QDropEvent
 from .image_table_model import ImageTableModel,create_control_buttons
+from .thumbnail_provider import ThumbnailProvider
 from .control_widget import create_image_control_group, create_video_control_group
 from .processor_control_dialog_enhanced import ProcessorControlDialogEnhanced as ProcessorControlDialog
 
-from core.image_container import ImageContainer
-from core.image_processor import ProcessorChain
+from core.image_metadata import ImageMetadata, read_image_metadata
+from core.batch_processor import BatchOptions, BatchResult, plan_outputs
+from core.encoder_profiles import ENCODER_PROFILE_NAMES, get_encoder_profile
+from core.job_store import batch_process, run_job
 
-from core.init import (WATERMARK_LEFT_LOGO_PROCESSOR, ROUNDED_CORNER_BLUR_SHADOW_PROCESSOR, EMPTY_PROCESSOR,FIT_SIZE_PROCESSOR)
-from core.init import config
+from core.init import config, get_job_store, get_registry
 
-from config.constant import DEBUG
+from config.constant import IMAGE_EXTENSIONS
 from tqdm import tqdm
 
 # 导入视频创建模块
 from core.video_creator import VideoCreator, VideoSettings, PlaybackMode
 from gui.video_settings_dialog import VideoSettingsDialog
+from gui.tasks import BackgroundTask, TaskManager
+from gui.video_task import VideoBatchJob, run_video_task
+
+
+# 表格中缩略图的显示尺寸
+THUMBNAIL_DISPLAY_SIZE = 64
 
 
 class DragDropTableView(QTableView):
@@ -71,15 +80,52 @@ class DragDropTableView(QTableView):
         else:
             event.ignore()
 
+def load_image_records(context, paths, skip_paths):
+    """
+    后台读取图片元数据（任务函数）
+    :param skip_paths: 已在表格中的图片，跳过
+    :return: (新图片记录, [(路径, 错误信息)])
+    """
+    records = []
+    errors = []
+    skip_paths = set(skip_paths)
+    for i, p in enumerate(paths, 1):
+        path = Path(p)
+        if not context.report(i, len(paths), path.name):
+            break
+        if path in skip_paths:
+            continue
+        try:
+            records.append(read_image_metadata(path))
+            skip_paths.add(path)
+        except Exception as e:
+            errors.append((path, str(e)))
+    return records, errors
+
+
+def run_batch_task(context, job_id, processor_chain, options):
+    """后台批量处理图片（任务函数），每张图片的进度记录在任务数据库中，取消或崩溃后可以继续"""
+    result = BatchResult()
+    run_job(get_job_store(), job_id, batch_process(processor_chain, options, result), token=context.token,
+            progress_callback=lambda i, total, path: context.report(i, total, path.name))
+    result.cancelled = context.cancelled
+    return job_id, result
+
+
 class MainWindow(QMainWindow):
     def __init__(self):
         super().__init__()
         self.video_controls = None
         self.image_controls = None
         self.selected_processors = []  # 存储选中的Processor ID列表
-        self.image_containers: List[ImageContainer] = []
+        self.image_containers: List[ImageMetadata] = []
         self.video_settings = VideoSettings()  # 视频设置
+        self._video_task = None  # 正在进行的视频创建任务
+        self._process_task = None  # 正在进行的批量处理任务
+        self.thumbnail_provider = ThumbnailProvider(parent=self)
         self.setup_ui()
+        # 后台任务，进度显示在状态栏
+        self.task_manager = TaskManager(self.statusBar(), self)
 
     def setup_ui(self):
         """设置用户界面"""
@@ -170,6 +216,15 @@ class MainWindow(QMainWindow):
         button_layout.addWidget(btn_configure)
         button_layout.addWidget(btn_clear)
         button_layout.addStretch()
+
+        # 筛选条件，回车后只显示（和处理）符合条件的图片
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("筛选，如 ISO > 3200 and 镜头型号 = XF23mmF1.4 R")
+        self.filter_edit.setClearButtonEnabled(True)
+        self.filter_edit.setMinimumWidth(320)
+        self.filter_edit.returnPressed.connect(self.apply_table_filter)
+        self.filter_edit.textChanged.connect(lambda text: text or self.apply_table_filter())
+        button_layout.addWidget(self.filter_edit)
         
         # 连接按钮信号
         btn_configure.clicked.connect(self.open_processor_dialog)
@@ -183,7 +238,8 @@ class MainWindow(QMainWindow):
     
     def open_processor_dialog(self):
         """打开Processor配置对话框"""
-        dialog = ProcessorControlDialog(self, self.selected_processors)
+        dialog = ProcessorControlDialog(self, self.selected_processors,
+                                        preview_path=self.get_current_image_path())
         if dialog.exec_() == QDialog.Accepted:
             # 更新选中的Processor
             self.selected_processors = dialog.get_selected_processors()
@@ -191,6 +247,15 @@ class MainWindow(QMainWindow):
             self.update_processor_display()
             print("Processor配置已更新")
     
+    def get_current_image_path(self):
+        """获取当前选中的图片路径，没有选中时返回第一张图片，列表为空时返回None"""
+        if not self.image_containers:
+            return None
+        row = self.table_view.currentIndex().row()
+        if 0 <= row < len(self.image_containers):
+            return self.image_containers[row].path
+        return self.image_containers[0].path
+    
     def clear_processor_config(self):
         """清空Processor配置"""
         reply = QMessageBox.question(
@@ -246,6 +311,7 @@ class MainWindow(QMainWindow):
 
         # 创建表格视图
         self.table_view = self.create_table_view()
+        self.update_table_row_height()
 
         # 创建控制按钮
         btn_open_file, btn_open_folder, btn_clear = create_control_buttons()
@@ -272,8 +338,16 @@ class MainWindow(QMainWindow):
         """创建并设置表格视图"""
         # 创建自定义表格视图以支持文件拖拽
         table_view = DragDropTableView()
-        self.model = ImageTableModel(self.image_containers)
+        self.model = ImageTableModel(self.image_containers, self.thumbnail_provider)
         table_view.setModel(self.model)
+        
+        # 缩略图显示尺寸；滚动停止后取消已经不可见的缩略图请求
+        table_view.setIconSize(QSize(THUMBNAIL_DISPLAY_SIZE, THUMBNAIL_DISPLAY_SIZE))
+        self.thumbnail_scroll_timer = QTimer(self)
+        self.thumbnail_scroll_timer.setSingleShot(True)
+        self.thumbnail_scroll_timer.setInterval(150)
+        self.thumbnail_scroll_timer.timeout.connect(self.cancel_offscreen_thumbnails)
+        table_view.verticalScrollBar().valueChanged.connect(self.thumbnail_scroll_timer.start)
 
         # 拖放设置
         table_view.setDragDropMode(QAbstractItemView.InternalMove)
@@ -288,6 +362,11 @@ class MainWindow(QMainWindow):
         table_view.horizontalHeader().setDragDropMode(QHeaderView.InternalMove)
         table_view.horizontalHeader().sectionMoved.connect(self.on_column_order_changed)
 
+        # 点击表头按该列排序（直接调整图片顺序）
+        table_view.horizontalHeader().setSectionsClickable(True)
+        table_view.horizontalHeader().setSortIndicatorShown(True)
+        table_view.horizontalHeader().sortIndicatorChanged.connect(lambda column, order: self.model.sort(column, order))
+
         # 连接顺序改变信号
         self.model.order_changed.connect(self.on_order_changed)
 
@@ -328,12 +407,11 @@ class MainWindow(QMainWindow):
         # 更新上次打开的文件夹路径
         config.set_last_opened_dir(folder)
 
-        image_extensions = {'.jpg', '.jpeg', '.png', '.tiff', '.bmp', '.gif', '.webp'}
         paths = []
         folder_path = Path(folder)
 
         for file in folder_path.iterdir():
-            if file.is_file() and file.suffix.lower() in image_extensions:
+            if file.is_file() and file.suffix.lower() in IMAGE_EXTENSIONS:
                 paths.append(str(file))
 
         if not paths:
@@ -349,19 +427,18 @@ class MainWindow(QMainWindow):
         
         # 收集所有图片文件路径
         all_image_paths = []
-        image_extensions = {'.jpg', '.jpeg', '.png', '.tiff', '.bmp', '.gif', '.webp'}
         
         for file_path in file_paths:
             path = Path(file_path)
             
             if path.is_file():
                 # 如果是文件，检查是否是图片
-                if path.suffix.lower() in image_extensions:
+                if path.suffix.lower() in IMAGE_EXTENSIONS:
                     all_image_paths.append(str(path))
             elif path.is_dir():
                 # 如果是文件夹，只导入当前层次的图片文件（不递归）
                 for item in path.iterdir():
-                    if item.is_file() and item.suffix.lower() in image_extensions:
+                    if item.is_file() and item.suffix.lower() in IMAGE_EXTENSIONS:
                         all_image_paths.append(str(item))
         
         if not all_image_paths:
@@ -384,9 +461,11 @@ class MainWindow(QMainWindow):
         )
         if reply == QMessageBox.Yes:
             self.image_containers = []
-            self.model = ImageTableModel(self.image_containers)
+            self.thumbnail_provider.clear()
+            self.model = ImageTableModel(self.image_containers, self.thumbnail_provider)
             self.model.order_changed.connect(self.on_order_changed)
             self.table_view.setModel(self.model)
+            self.apply_table_filter()
             self.statusBar().showMessage("表格已清空", 1500)
 
     def on_column_order_changed(self, logicalIndex, oldVisualIndex, newVisualIndex):
@@ -424,11 +503,37 @@ class MainWindow(QMainWindow):
         config.set_table_visible_columns(visible_columns)
         #print(f"列顺序已保存: {visible_columns}")
     
+    def update_table_row_height(self):
+        """缩略图列可见时增大行高"""
+        header = self.table_view.verticalHeader()
+        if self.model.thumbnail_column() >= 0:
+            header.setDefaultSectionSize(THUMBNAIL_DISPLAY_SIZE + 4)
+        else:
+            header.setDefaultSectionSize(header.minimumSectionSize() + 8)
+    
+    def cancel_offscreen_thumbnails(self):
+        """取消不在可见区域内的缩略图请求，可见行的请求会在重绘时重新提交"""
+        if not self.image_containers:
+            return
+        viewport = self.table_view.viewport()
+        first = self.table_view.rowAt(0)
+        last = self.table_view.rowAt(viewport.height() - 1)
+        if first < 0:
+            return
+        if last < 0:
+            last = len(self.image_containers) - 1
+        visible = [self.image_containers[row].path for row in range(first, last + 1)]
+        self.thumbnail_provider.cancel_except(visible)
+    
     def on_order_changed(self):
-        """处理顺序改变事件"""
-        #print("当前图片顺序（拖拽后）:")
-        self.print_current_order()
+        """处理顺序改变事件（拖拽或点击表头排序）"""
+        # 大量图片时逐行打印比排序本身慢得多，只打印一行摘要；完整顺序可用“打印图片路径”查看
+        if self.image_containers:
+            print(f"图片顺序已改变: 共 {len(self.image_containers)} 张，"
+                  f"第一张 {self.image_containers[0].path.name}，最后一张 {self.image_containers[-1].path.name}")
         self.table_view.clearSelection()
+        # 隐藏状态按行号保存，顺序改变后重新筛选
+        self.apply_table_filter()
 
     def print_current_order(self):
         """打印当前图片顺序"""
@@ -444,43 +549,25 @@ class MainWindow(QMainWindow):
         if not paths:
             return
 
-        # 创建进度对话框
-        progress = QProgressDialog("正在加载图片...", "取消", 0, len(paths), self)
-        progress.setWindowTitle("加载进度")
-        progress.setWindowModality(Qt.WindowModal)
-        progress.setMinimumDuration(0)  # 立即显示进度条
-        
-        new_images = []
-        existing_paths = {container.path for container in self.image_containers} if append else set()
-
-        for i, p in enumerate(paths, 1):
-            # 更新进度条，显示当前文件名和进度
-            progress.setLabelText(f"正在加载 ({i}/{len(paths)}): {Path(p).name}")
-            progress.setValue(i)
-            
-            # 处理取消操作
-            if progress.wasCanceled():
-                QMessageBox.information(self, "提示", "加载已取消")
-                return
-
-            try:
-                container_path = Path(p)
-                # 如果是追加模式且图片已存在，则跳过
-                if append and container_path in existing_paths:
-                    continue
-
-                container = ImageContainer(container_path)
-                new_images.append(container)
-                if append:
-                    existing_paths.add(container_path)
-            except Exception as e:
-                QMessageBox.warning(self, "错误", f"无法加载 {p}: {str(e)}")
-                
-            # 处理事件，确保UI响应
-            QApplication.processEvents()
+        existing_paths = [container.path for container in self.image_containers] if append else []
+        task = BackgroundTask("加载图片", load_image_records, list(paths), existing_paths)
+        self.task_manager.start(task, on_result=lambda result: self._on_images_loaded(result, append, task.cancelled))
+
+    def _on_images_loaded(self, result, append, cancelled):
+        """图片元数据读取完成，更新表格"""
+        new_images, errors = result
+        if errors:
+            details = "\n".join(f"{path.name}: {error}" for path, error in errors[:10])
+            if len(errors) > 10:
+                details += f"\n...共 {len(errors)} 张"
+            QMessageBox.warning(self, "错误", f"以下图片无法加载:\n{details}")
+        if cancelled:
+            return
 
-        # 关闭进度对话框
-        progress.close()
+        # 加载期间表格可能已经变化（同时进行的加载），追加时再次去重
+        if append:
+            existing_paths = {container.path for container in self.image_containers}
+            new_images = [record for record in new_images if record.path not in existing_paths]
 
         if not new_images:
             if append:
@@ -496,9 +583,11 @@ class MainWindow(QMainWindow):
             message = f"已加载 {len(new_images)} 张图片"
 
         # 更新模型
-        self.model = ImageTableModel(self.image_containers)
+        self.model = ImageTableModel(self.image_containers, self.thumbnail_provider)
         self.model.order_changed.connect(self.on_order_changed)
         self.table_view.setModel(self.model)
+        self.apply_table_filter()
+        self.update_table_row_height()
 
         print(f"当前图片顺序（{'追加后' if append else '加载后'}）:")
         self.print_current_order()
@@ -523,6 +612,7 @@ class MainWindow(QMainWindow):
         suffix = output_settings.get('suffix', '')
         format_text = output_settings.get('format', 'JPG')
         quality = output_settings.get('quality', 95)
+        encoder_profile = get_encoder_profile(output_settings.get('encoder_profile'))
         force_size = output_settings.get('force_size', False)
         output_width = output_settings.get('output_width', 1920)
         output_height = output_settings.get('output_height', 1080)
@@ -532,6 +622,7 @@ class MainWindow(QMainWindow):
         print(f"  后缀: {suffix}")
         print(f"  格式: {format_text}")
         print(f"  质量: {quality}%")
+        print(f"  编码配置: {ENCODER_PROFILE_NAMES[encoder_profile]}")
         print(f"  输出路径: {output_path}")
         print(f"  强制输出尺寸: {'是' if force_size else '否'}")
         if force_size:
@@ -597,6 +688,11 @@ class MainWindow(QMainWindow):
         selected_indexes = self.table_view.selectionModel().selectedRows()
         delete_action.setEnabled(len(selected_indexes) > 0)
         
+        # 表格中的文件信息在添加时读取，文件被其他程序修改后可以手动刷新
+        refresh_action = QAction("刷新文件信息", self)
+        refresh_action.triggered.connect(lambda: self.model.refresh())
+        menu.addAction(refresh_action)
+        
         menu.exec_(self.table_view.viewport().mapToGlobal(position))
 
     def delete_selected_images(self):
@@ -622,9 +718,10 @@ class MainWindow(QMainWindow):
                     self.image_containers.pop(row)
             
             # 更新模型
-            self.model = ImageTableModel(self.image_containers)
+            self.model = ImageTableModel(self.image_containers, self.thumbnail_provider)
             self.model.order_changed.connect(self.on_order_changed)
             self.table_view.setModel(self.model)
+            self.apply_table_filter()
             
             # 更新状态栏
             self.statusBar().showMessage(f"已删除 {len(rows_to_delete)} 张图片", 2000)
@@ -634,147 +731,197 @@ class MainWindow(QMainWindow):
 
 
     def get_image_paths(self) -> List[Path]:
-        """返回存在的图片文件Path对象列表"""
-        image_extensions = {'.jpg', '.jpeg', '.png', '.tiff', '.bmp', '.gif', '.webp'}
-
-        return [container.path for container in self.image_containers
-                if container.path.exists() and  # 检查文件是否存在
+        """返回存在的图片文件Path对象列表，设置了筛选条件时只包含表格中显示的图片"""
+        return [container.path for row, container in enumerate(self.image_containers)
+                if not self.table_view.isRowHidden(row) and
+                container.path.exists() and  # 检查文件是否存在
                 container.path.is_file() and
-                container.path.suffix.lower() in image_extensions]
-    def process_chain(self):
-        """执行流程链操作"""
-        file_list = self.get_image_paths()
-        if len(file_list) == 0:
-            print("当前没有需要处理的图片")
-            QMessageBox.information(self, "提示", "当前没有需要处理的图片")
+                container.path.suffix.lower() in IMAGE_EXTENSIONS]
+
+    def apply_table_filter(self):
+        """按筛选框中的条件显示或隐藏表格行"""
+        if not hasattr(self, 'filter_edit'):
             return
-        else:
-            print('当前共有 {} 张图片待处理'.format(len(file_list)))
-        
+        try:
+            mask = self.model.filter_mask(self.filter_edit.text())
+        except (ValueError, KeyError) as e:
+            QMessageBox.warning(self, "筛选条件错误", str(e))
+            return
+        for row, keep in enumerate(mask):
+            if self.table_view.isRowHidden(row) == bool(keep):
+                self.table_view.setRowHidden(row, not keep)
+        if self.filter_edit.text().strip():
+            self.statusBar().showMessage(f"筛选结果: {sum(mask)} / {len(mask)} 张图片", 3000)
+
+    def _prepare_batch(self):
+        """
+        按当前界面设置创建Processor链和批量输出设置
+        :return: (Processor链, BatchOptions)
+        """
         # 使用用户选择的Processor链
+        registry = get_registry()
         if self.selected_processors:
-            # 创建临时对话框来获取Processor链
-            temp_dialog = ProcessorControlDialog(self, self.selected_processors)
-            processor_chain = temp_dialog.get_processor_chain()
+            processor_chain = registry.build_chain(self.selected_processors)
         else:
             # 如果没有选择Processor，使用默认的
-            processor_chain = ProcessorChain()
-            processor_chain.add(EMPTY_PROCESSOR)
-
-
+            processor_chain = registry.build_chain(['empty'])
             QMessageBox.information(self, "提示", "使用默认Processor配置")
 
-
-
-
         # 获取输出设置
         output_settings = self.image_controls.get('output_settings', {})
-        prefix = output_settings.get('prefix', 'Img_').strip()
-        suffix = output_settings.get('suffix', '').strip()
-        format_lower = output_settings.get('format', 'JPG').lower()
-        quality = output_settings.get('quality', 95)
-        force_size = output_settings.get('force_size', False)
-        output_width = output_settings.get('output_width', 1920)
-        output_height = output_settings.get('output_height', 1080)
-
-        if force_size:
-            processor_chain.add(FIT_SIZE_PROCESSOR)
+        if output_settings.get('force_size', False):
+            processor_chain.add(registry.get('fit size'))
 
         # 获取输出目录
         output_dir = self.image_controls['output_path'].text().strip()
         if not output_dir:
             output_dir = output_settings.get('output_path', config.get_output_dir())
         
-        # 创建输出目录
-        output_path = Path(output_dir)
-        output_path.mkdir(parents=True, exist_ok=True)
-        
-        # 创建进度对话框
-        progress = QProgressDialog("正在处理图片...", "取消", 0, len(file_list), self)
-        progress.setWindowTitle("处理进度")
-        progress.setWindowModality(Qt.WindowModal)
-        progress.setMinimumDuration(0)  # 立即显示进度条
-        
-        processed_count = 0
-        error_count = 0
-        
-        for i, source_path in enumerate(file_list, 1):
-            # 更新进度条
-            progress.setLabelText(f"正在处理 ({i}/{len(file_list)}): {source_path.name}")
-            progress.setValue(i)
-            
-            # 处理取消操作
-            if progress.wasCanceled():
-                QMessageBox.information(self, "提示", "处理已取消")
+        options = BatchOptions.from_output_settings(output_settings, output_dir,
+                                                    config.use_equivalent_focal_length())
+        return processor_chain, options
+
+    def process_chain(self):
+        """执行流程链操作"""
+        if self._process_task is not None:
+            QMessageBox.warning(self, "警告", "正在处理图片，请等待完成或取消")
+            return
+
+        # 上次没有完成（取消或程序异常退出）的任务
+        store = get_job_store()
+        unfinished = [job for job in store.jobs(active_only=True) if job.params.get('source') == 'gui']
+        if unfinished:
+            job = unfinished[0]
+            reply = QMessageBox.question(
+                self, "继续处理",
+                f"上次的批量处理没有完成（{job.created_at}，共 {job.total} 张，已完成 {job.counts.get('done', 0)} 张）。\n"
+                f"是否继续处理剩余的图片？\n选择“否”将放弃上次的任务，按当前设置处理。",
+                QMessageBox.Yes | QMessageBox.No | QMessageBox.Cancel, QMessageBox.Yes
+            )
+            if reply == QMessageBox.Cancel:
                 return
-            
-            try:
-                container = ImageContainer(source_path)
-                container.is_use_equivalent_focal_length(config.use_equivalent_focal_length())
-                processor_chain.process(container)
-
-                # 构建目标文件名
-                source_stem = source_path.stem  # 原文件名（不含扩展名）
-                source_suffix = source_path.suffix  # 原扩展名
-                
-                # 如果后缀为空，使用时间戳
-                if not suffix:
-                    from datetime import datetime
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    actual_suffix = f"_{timestamp}"
-                else:
-                    actual_suffix = suffix
-                
-                # 构建新文件名：前缀 + 原文件名 + 后缀 + 格式扩展名
-                new_filename = f"{prefix}{source_stem}{actual_suffix}.{format_lower}"
-                target_path = output_path / new_filename
-                
-                # 确保文件名唯一
-                counter = 1
-                while target_path.exists():
-                    new_filename = f"{prefix}{source_stem}{actual_suffix}_{counter}.{format_lower}"
-                    target_path = output_path / new_filename
-                    counter += 1
-                
-                # 保存图片
-                container.save(target_path, quality=quality)
-                container.close()
-                processed_count += 1
-                
-                print(f"已保存: {target_path.name} (质量: {quality}%)")
-                
-            except Exception as e:
-                logging.exception(f'Error: {str(e)}')
-                error_count += 1
-                if DEBUG:
-                    raise e
-                else:
-                    print(f'\nError: 文件：{source_path} 处理失败，请检查日志')
-            
-            # 处理事件，确保UI响应
-            QApplication.processEvents()
+            if reply == QMessageBox.Yes:
+                print(f'继续处理任务 {job.id}，剩余 {job.total - job.counts.get("done", 0)} 张图片')
+                self._start_batch_job(job.id, job.params)
+                return
+            for job in unfinished:
+                store.abandon(job.id)
+
+        file_list = self.get_image_paths()
+        if len(file_list) == 0:
+            print("当前没有需要处理的图片")
+            QMessageBox.information(self, "提示", "当前没有需要处理的图片")
+            return
+        else:
+            print('当前共有 {} 张图片待处理'.format(len(file_list)))
         
-        # 关闭进度对话框
-        progress.close()
+        processor_chain, options = self._prepare_batch()
+        output_settings = self.image_controls.get('output_settings', {})
+        params = dict(source='gui', processors=list(self.selected_processors) or ['empty'],
+                      force_size=output_settings.get('force_size', False),
+                      output_width=output_settings.get('output_width', 1920),
+                      output_height=output_settings.get('output_height', 1080),
+                      options=options.to_dict())
+        try:
+            job_id = store.create_job(plan_outputs(file_list, options), params)
+        except Exception as e:
+            logging.exception(f'Error: {str(e)}')
+            QMessageBox.critical(self, "错误", f"无法创建任务记录: {e}")
+            return
+        self._start_batch_job(job_id, params, processor_chain, options)
+
+    def _start_batch_job(self, job_id, params, processor_chain=None, options=None):
+        """
+        在后台处理任务；继续上次的任务时按任务记录中的参数重新创建Processor链和输出设置
+        """
+        if processor_chain is None:
+            registry = get_registry()
+            processor_chain = registry.build_chain(params['processors'])
+            if params.get('force_size'):
+                processor_chain.add(registry.get('fit size'))
+            options = BatchOptions.from_dict(params['options'])
+
+        summary = dict(prefix=options.prefix, suffix=options.suffix, format_lower=options.format,
+                       quality=options.quality, encoder_profile=get_encoder_profile(options.encoder_profile),
+                       max_kb=options.max_bytes // 1024 if options.max_bytes else None,
+                       force_size=params.get('force_size', False), output_width=params.get('output_width'),
+                       output_height=params.get('output_height'), output_dir=options.output_dir)
+        task = BackgroundTask("处理图片", run_batch_task, job_id, processor_chain, options)
+        self._process_task = task
+        self.task_manager.start(task, on_result=lambda outcome: self._on_batch_finished(*outcome, **summary),
+                                on_error=lambda error: QMessageBox.critical(self, "错误", f"处理图片时发生错误: {error}"),
+                                on_finished=lambda cancelled: setattr(self, '_process_task', None))
+
+    def _on_batch_finished(self, job_id, result, prefix, suffix, format_lower, quality, encoder_profile, max_kb,
+                           force_size, output_width, output_height, output_dir):
+        """批量处理完成，显示处理结果"""
+        processed_count = result.processed_count
+        error_count = result.error_count
+        
+        # 处理取消操作
+        if result.cancelled:
+            QMessageBox.information(self, "提示", f"处理已取消，已保存 {processed_count} 张图片\n"
+                                                f"下次开始处理时可以继续处理剩余的图片")
+            return
         
         # 显示处理结果
         message = f"处理完成！\n成功处理: {processed_count} 张图片"
+        if result.copied:
+            message += f"\n未修改直接复制: {len(result.copied)} 张"
         if error_count > 0:
             message += f"\n处理失败: {error_count} 张图片（请查看控制台日志）"
         message += f"\n输出目录: {output_dir}"
         message += f"\n文件名格式: {prefix}[原文件名]{'[时间戳]' if not suffix else suffix}.{format_lower}"
-        message += f"\n图片质量: {quality}%"
+        if max_kb:
+            message += f"\n文件大小上限: {max_kb} KB（最高质量 {quality}%）"
+            size_targets = list(result.size_targets.values())
+            if size_targets:
+                qualities = [t.quality for t in size_targets if t.quality is not None]
+                if qualities:
+                    message += f"\n实际质量: {min(qualities)}% ~ {max(qualities)}%"
+                message += f"\n平均试编码次数: {sum(t.iterations for t in size_targets) / len(size_targets):.1f}"
+                scaled = sum(1 for t in size_targets if t.scale < 1)
+                if scaled:
+                    message += f"\n缩小尺寸: {scaled} 张"
+                unfitted = sum(1 for t in size_targets if not t.fitted)
+                if unfitted:
+                    message += f"\n未能满足大小限制: {unfitted} 张"
+        else:
+            message += f"\n图片质量: {quality}%"
+        message += f"\n编码配置: {ENCODER_PROFILE_NAMES[encoder_profile]}"
         
         if force_size:
             message += f"\n输出尺寸: 强制 {output_width}x{output_height} 像素"
         
-        QMessageBox.information(self, "处理完成", message)
+        if error_count > 0:
+            box = QMessageBox(QMessageBox.Warning, "处理完成", message, QMessageBox.Ok, self)
+            export_button = box.addButton("导出失败列表...", QMessageBox.ActionRole)
+            box.exec_()
+            if box.clickedButton() is export_button:
+                self._export_failed(job_id)
+        else:
+            QMessageBox.information(self, "处理完成", message)
         print(f"处理完成，文件已输出至 {output_dir} 文件夹中")
         print(f"文件名格式: {prefix}[原文件名]{'[时间戳]' if not suffix else suffix}.{format_lower}")
         print(f"图片质量: {quality}%")
         if force_size:
             print(f"输出尺寸: 强制 {output_width}x{output_height} 像素")
 
+    def _export_failed(self, job_id):
+        """导出处理失败的图片列表（.csv / .json 包含失败原因），之后可以用命令行重新处理"""
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "导出失败列表", f"failed_{job_id}.csv",
+            "CSV文件 (*.csv);;JSON文件 (*.json);;文本文件 (*.txt)"
+        )
+        if not file_path:
+            return
+        try:
+            count = get_job_store().export_failed(job_id, Path(file_path))
+        except OSError as e:
+            QMessageBox.critical(self, "错误", f"导出失败列表时发生错误: {e}")
+            return
+        self.statusBar().showMessage(f"已导出 {count} 张失败的图片到 {file_path}", 3000)
+
     def create_menu_bar(self):
         """创建菜单栏"""
         menubar = self.menuBar()
@@ -842,7 +989,7 @@ class MainWindow(QMainWindow):
         
         # 获取所有可用的列（包括新增的文件大小列）
         all_headers = [
-            "文件名", "后缀名", "文件大小", "相机品牌", "相机型号", "镜头型号",
+            "缩略图", "文件名", "后缀名", "文件大小", "相机品牌", "相机型号", "镜头型号",
             "焦距", "光圈", "ISO", "曝光时间", "分辨率", "拍摄时间", "GPS信息"
         ]
         
@@ -930,6 +1077,7 @@ class MainWindow(QMainWindow):
             if hasattr(self, 'model'):
                 self.model.update_visible_headers()
                 self.model.layoutChanged.emit()
+                self.update_table_row_height()
                 # 重新应用列顺序到表格
                 self.apply_column_order_to_table(selected_columns)
             
@@ -941,7 +1089,7 @@ class MainWindow(QMainWindow):
         try:
             # 定义默认可见列（所有列都可见）
             default_visible = [
-                "文件名", "后缀名", "文件大小", "相机品牌", "相机型号", "镜头型号",
+                "缩略图", "文件名", "后缀名", "文件大小", "相机品牌", "相机型号", "镜头型号",
                 "焦距", "光圈", "ISO", "曝光时间", "分辨率", "拍摄时间", "GPS信息"
             ]
             
@@ -968,6 +1116,7 @@ class MainWindow(QMainWindow):
             if hasattr(self, 'model'):
                 self.model.update_visible_headers()
                 self.model.layoutChanged.emit()
+                self.update_table_row_height()
                 # 重新应用列顺序到表格
                 self.apply_column_order_to_table(default_visible)
             
@@ -1019,6 +1168,23 @@ class MainWindow(QMainWindow):
             self.video_settings = dialog.get_settings()
             QMessageBox.information(self, "提示", "视频设置已保存")
     
+    def _on_video_finished(self, success):
+        """视频创建结束（取消时由任务管理器在状态栏提示）"""
+        if self._video_task is not None and self._video_task.cancelled:
+            return
+        
+        if success:
+            QMessageBox.information(self, "成功", f"视频创建成功！\n输出路径: {self.video_settings.output_path}")
+            self.statusBar().showMessage(f"视频创建成功: {self.video_settings.output_path}", 5000)
+        else:
+            QMessageBox.warning(self, "失败", "视频创建失败，请查看控制台日志")
+            self.statusBar().showMessage("视频创建失败", 5000)
+    
+    def closeEvent(self, event):
+        """关闭窗口时取消正在进行的后台任务"""
+        self.task_manager.cancel_all()
+        super().closeEvent(event)
+
     def show_about_dialog(self):
         """显示关于对话框"""
         QMessageBox.about(self, "关于图片处理程序", 
@@ -1027,10 +1193,13 @@ class MainWindow(QMainWindow):
                          "作者: ImageProcessor Team")
     
     def create_video(self):
-        """创建视频"""
+        """创建视频（在后台线程中运行，编码进度显示在状态栏，可以用状态栏中的按钮取消）"""
         if not self.video_controls:
             QMessageBox.warning(self, "警告", "视频控件未初始化")
             return
+        if self._video_task is not None:
+            QMessageBox.warning(self, "警告", "正在创建视频，请等待完成或取消")
+            return
         
         try:
             # 获取输出路径
@@ -1042,33 +1211,25 @@ class MainWindow(QMainWindow):
             # 更新视频设置的输出路径
             self.video_settings.output_path = output_path
             
-            # 创建视频创建器
-            creator = VideoCreator(self.video_settings)
-            
-            # 显示进度对话框
-            progress = QProgressDialog("正在创建视频...", "取消", 0, 100, self)
-            progress.setWindowTitle("视频创建进度")
-            progress.setWindowModality(Qt.WindowModal)
-            progress.setMinimumDuration(0)
-            
-            # 在单独的线程中创建视频（简化版本，实际应该使用QThread）
-            # 这里为了简单，直接调用
-            progress.setLabelText("正在准备图片...")
-            progress.setValue(10)
-            QApplication.processEvents()
+            # 使用处理列表时，处理结果直接交给视频编码
+            batch_job = None
+            source = self.video_controls['source'].currentData()
+            if source != 'folder':
+                file_list = self.get_image_paths()
+                if not file_list:
+                    QMessageBox.information(self, "提示", "当前没有需要处理的图片")
+                    return
+                processor_chain, options = self._prepare_batch()
+                options.write_outputs = source == 'batch'
+                batch_job = VideoBatchJob(file_list, processor_chain, options)
             
-            # 创建视频
-            success = creator.create_video_from_output_folder()
-            
-            progress.setValue(100)
-            progress.close()
-            
-            if success:
-                QMessageBox.information(self, "成功", f"视频创建成功！\n输出路径: {self.video_settings.output_path}")
-                self.statusBar().showMessage(f"视频创建成功: {self.video_settings.output_path}", 5000)
-            else:
-                QMessageBox.warning(self, "失败", "视频创建失败，请查看控制台日志")
-                self.statusBar().showMessage("视频创建失败", 5000)
+            # 在线程池中创建视频，进度显示在状态栏
+            task = BackgroundTask("创建视频", run_video_task, VideoCreator(replace(self.video_settings)), batch_job,
+                                  unit=None)
+            self._video_task = task
+            self.task_manager.start(task, on_result=self._on_video_finished,
+                                    on_error=lambda error: self._on_video_finished(False),
+                                    on_finished=lambda cancelled: setattr(self, '_video_task', None))
                 
         except ValueError as e:
             QMessageBox.warning(self, "输入错误", f"参数输入错误: {e}")
@@ -10,6 +10,7 @@ from PyQt5.QtWidgets import (
 )
 from PyQt5.QtCore import Qt, pyqtSignal
 from core.init import config
+from core.encoder_profiles import DEFAULT_ENCODER_PROFILE, ENCODER_PROFILE_NAMES
 
 
 class OutputSettingsDialog(QDialog):
@@ -59,6 +60,40 @@ class OutputSettingsDialog(QDialog):
         self.quality_spin.setSuffix("%")
         filename_layout.addRow("质量:", self.quality_spin)
         
+        # 编码配置
+        self.encoder_profile_combo = QComboBox()
+        for profile, name in ENCODER_PROFILE_NAMES.items():
+            self.encoder_profile_combo.addItem(name, profile.value)
+        self.encoder_profile_combo.setCurrentIndex(
+            self.encoder_profile_combo.findData(DEFAULT_ENCODER_PROFILE.value))
+        self.encoder_profile_combo.setToolTip("快速: 编码最快，文件较大\n"
+                                              "均衡: 无损的体积优化，编码稍慢\n"
+                                              "最小体积: 渐进式JPEG、最高压缩等级，编码最慢\n"
+                                              "高质量: JPEG不做色度抽样（4:4:4），保留颜色细节，文件较大")
+        filename_layout.addRow("编码:", self.encoder_profile_combo)
+        
+        # 文件大小模式：固定质量，或在质量上限内搜索满足文件大小限制的最高质量
+        self.size_mode_combo = QComboBox()
+        self.size_mode_combo.addItem("固定质量", "quality")
+        self.size_mode_combo.addItem("限制文件大小", "max_bytes")
+        filename_layout.addRow("输出模式:", self.size_mode_combo)
+        
+        self.max_kb_spin = QSpinBox()
+        self.max_kb_spin.setRange(10, 1024 * 1024)
+        self.max_kb_spin.setValue(1024)
+        self.max_kb_spin.setSuffix(" KB")
+        self.max_kb_spin.setToolTip("上面的质量作为搜索的最高质量")
+        filename_layout.addRow("最大文件大小:", self.max_kb_spin)
+        
+        self.allow_scale_checkbox = QCheckBox("最低质量仍超出时缩小尺寸")
+        filename_layout.addRow(self.allow_scale_checkbox)
+        
+        self.strip_gps_checkbox = QCheckBox("移除GPS位置信息")
+        self.strip_gps_checkbox.setToolTip("输出文件不包含拍摄地点；未修改的JPEG只改写元数据，不重新编码")
+        filename_layout.addRow(self.strip_gps_checkbox)
+        self.size_mode_combo.currentIndexChanged.connect(self.on_size_mode_changed)
+        self.on_size_mode_changed()
+        
         filename_group.setLayout(filename_layout)
         layout.addWidget(filename_group)
         
@@ -157,6 +192,12 @@ class OutputSettingsDialog(QDialog):
         self.btn_ok.clicked.connect(self.accept)
         self.btn_cancel.clicked.connect(self.reject)
         
+    def on_size_mode_changed(self, *args):
+        """切换输出模式时启用/禁用文件大小相关控件"""
+        enabled = self.size_mode_combo.currentData() == "max_bytes"
+        self.max_kb_spin.setEnabled(enabled)
+        self.allow_scale_checkbox.setEnabled(enabled)
+        
     def on_force_size_changed(self, state):
         """当强制输出尺寸复选框状态改变时"""
         enabled = state == Qt.Checked
@@ -181,6 +222,18 @@ class OutputSettingsDialog(QDialog):
                 
             self.quality_spin.setValue(self.current_settings.get('quality', 95))
             
+            index = self.encoder_profile_combo.findData(
+                self.current_settings.get('encoder_profile', DEFAULT_ENCODER_PROFILE.value))
+            if index >= 0:
+                self.encoder_profile_combo.setCurrentIndex(index)
+            
+            index = self.size_mode_combo.findData(self.current_settings.get('size_mode', 'quality'))
+            if index >= 0:
+                self.size_mode_combo.setCurrentIndex(index)
+            self.max_kb_spin.setValue(self.current_settings.get('max_kb', 1024))
+            self.allow_scale_checkbox.setChecked(self.current_settings.get('allow_scale', False))
+            self.strip_gps_checkbox.setChecked(self.current_settings.get('strip_gps', False))
+            
             force_size = self.current_settings.get('force_size', False)
             self.force_size_checkbox.setChecked(force_size)
             self.on_force_size_changed(Qt.Checked if force_size else Qt.Unchecked)
@@ -202,6 +255,11 @@ class OutputSettingsDialog(QDialog):
             'suffix': self.suffix_edit.text().strip(),
             'format': self.format_combo.currentText().upper(),
             'quality': self.quality_spin.value(),
+            'encoder_profile': self.encoder_profile_combo.currentData(),
+            'size_mode': self.size_mode_combo.currentData(),
+            'max_kb': self.max_kb_spin.value(),
+            'allow_scale': self.allow_scale_checkbox.isChecked(),
+            'strip_gps': self.strip_gps_checkbox.isChecked(),
             'force_size': self.force_size_checkbox.isChecked(),
             'auto_rotate': self.auto_rotate_checkbox.isChecked(),
             'output_width': self.width_spin.value(),
@@ -0,0 +1,169 @@
+"""
+实时预览控件
+在后台线程中把Processor链渲染到代理图上，参数频繁变化时自动合并请求并丢弃过期的渲染
+"""
+
+import threading
+from pathlib import Path
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, QTimer, Qt, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+from PyQt5.QtWidgets import QGroupBox, QLabel, QSizePolicy, QVBoxLayout
+
+from core.preview import PROXY_CACHE, PreviewCancelled, render_preview
+
+
+def pil_to_qimage(image) -> QImage:
+    """将PIL图片转换为QImage（深拷贝，不依赖原始缓冲区）"""
+    image = image.convert('RGBA')
+    data = image.tobytes('raw', 'RGBA')
+    qimage = QImage(data, image.width, image.height, image.width * 4, QImage.Format_RGBA8888)
+    return qimage.copy()
+
+
+class _PreviewSignals(QObject):
+    finished = pyqtSignal(int, QImage)
+    failed = pyqtSignal(int, str)
+    cancelled = pyqtSignal(int)
+
+
+class _PreviewTask(QRunnable):
+    """单次预览渲染任务"""
+
+    def __init__(self, generation, processor, image_path, cancel_event):
+        super().__init__()
+        self.generation = generation
+        self.processor = processor
+        self.image_path = image_path
+        self.cancel_event = cancel_event
+        self.signals = _PreviewSignals()
+
+    def run(self):
+        if self.cancel_event.is_set():
+            self.signals.cancelled.emit(self.generation)
+            return
+        try:
+            container = PROXY_CACHE.get(self.image_path)
+            try:
+                image = render_preview(self.processor, container, self.cancel_event.is_set)
+            finally:
+                container.close()
+            self.signals.finished.emit(self.generation, pil_to_qimage(image))
+        except PreviewCancelled:
+            self.signals.cancelled.emit(self.generation)
+        except Exception as e:
+            self.signals.failed.emit(self.generation, str(e))
+
+
+class PreviewWidget(QGroupBox):
+    """
+    预览面板
+
+    chain_provider 在GUI线程中调用，返回要预览的Processor（链），返回None表示无可预览内容。
+    调用 request_update() 触发重新渲染，连续调用会在 debounce_ms 内合并。
+    """
+
+    def __init__(self, chain_provider, image_path=None, parent=None, debounce_ms=250):
+        super().__init__("预览", parent)
+        self.chain_provider = chain_provider
+        self.image_path = Path(image_path) if image_path else None
+        self._generation = 0
+        self._cancel_event = threading.Event()
+        self._tasks = {}
+        self._pixmap = None
+
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(2)
+
+        self._timer = QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(debounce_ms)
+        self._timer.timeout.connect(self._start_render)
+
+        layout = QVBoxLayout()
+        self.image_label = QLabel()
+        self.image_label.setAlignment(Qt.AlignCenter)
+        self.image_label.setMinimumSize(320, 240)
+        self.image_label.setSizePolicy(QSizePolicy.Expanding, QSizePolicy.Expanding)
+        self.status_label = QLabel()
+        self.status_label.setStyleSheet("color: #666;")
+        layout.addWidget(self.image_label, 1)
+        layout.addWidget(self.status_label)
+        self.setLayout(layout)
+
+        if self.image_path is None:
+            self.image_label.setText("未选择图片，无法预览\n(请先在主界面表格中选中一张图片)")
+
+    def set_image_path(self, image_path):
+        """切换预览的图片"""
+        self.image_path = Path(image_path) if image_path else None
+        self.request_update()
+
+    def request_update(self):
+        """请求重新渲染，旧的渲染立即作废"""
+        if self.image_path is None:
+            return
+        self._cancel_event.set()
+        self._cancel_event = threading.Event()
+        self._generation += 1
+        self.status_label.setText("等待渲染...")
+        self._timer.start()
+
+    def _start_render(self):
+        # 取出还没开始执行的旧任务
+        for generation, task in list(self._tasks.items()):
+            if self._pool.tryTake(task):
+                self._tasks.pop(generation, None)
+
+        try:
+            processor = self.chain_provider()
+        except Exception as e:
+            self.status_label.setText(f"无法创建Processor: {e}")
+            return
+        if processor is None:
+            self.status_label.setText("没有可预览的Processor")
+            return
+
+        task = _PreviewTask(self._generation, processor, self.image_path, self._cancel_event)
+        task.setAutoDelete(False)
+        task.signals.finished.connect(self._on_finished)
+        task.signals.failed.connect(self._on_failed)
+        task.signals.cancelled.connect(self._on_cancelled)
+        self._tasks[self._generation] = task
+        self.status_label.setText("正在渲染...")
+        self._pool.start(task)
+
+    def _on_finished(self, generation, qimage):
+        self._tasks.pop(generation, None)
+        if generation != self._generation:
+            return
+        self._pixmap = QPixmap.fromImage(qimage)
+        self._update_pixmap()
+        self.status_label.setText(f"{self.image_path.name}  (代理图 {qimage.width()}×{qimage.height()})")
+
+    def _on_failed(self, generation, message):
+        self._tasks.pop(generation, None)
+        if generation != self._generation:
+            return
+        self.status_label.setText(f"预览失败: {message}")
+
+    def _on_cancelled(self, generation):
+        self._tasks.pop(generation, None)
+
+    def _update_pixmap(self):
+        if self._pixmap is None:
+            return
+        self.image_label.setPixmap(self._pixmap.scaled(self.image_label.size(),
+                                                       Qt.KeepAspectRatio, Qt.SmoothTransformation))
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self._update_pixmap()
+
+    def shutdown(self):
+        """关闭对话框时调用，作废所有渲染"""
+        self._timer.stop()
+        self._cancel_event.set()
+        self._pool.clear()
+        # 正在执行的渲染会在下一个Processor之前退出
+        self._pool.waitForDone()
@@ -3,8 +3,8 @@ from PyQt5.QtWidgets import (
     QPushButton, QWidget, QMessageBox, QInputDialog, QLabel, QGroupBox
 )
 from PyQt5.QtCore import Qt, pyqtSignal
-from core.init import LAYOUT_ITEMS, config
-from core.image_processor import ProcessorComponent, ProcessorChain
+from core.init import LAYOUT_ITEMS, config, get_registry
+from core.image_processor import ProcessorComponent
 import json
 from pathlib import Path
 
@@ -235,63 +235,7 @@ class ProcessorControlDialog(QDialog):
     
     def get_processor_chain(self):
         """根据当前选择创建ProcessorChain"""
-        from core.init import (
-            EMPTY_PROCESSOR, SHADOW_PROCESSOR, MARGIN_PROCESSOR, SIMPLE_PROCESSOR,
-            WATERMARK_PROCESSOR, WATERMARK_LEFT_LOGO_PROCESSOR, WATERMARK_RIGHT_LOGO_PROCESSOR,
-            DARK_WATERMARK_LEFT_LOGO_PROCESSOR, DARK_WATERMARK_RIGHT_LOGO_PROCESSOR,
-            SQUARE_PROCESSOR, PADDING_TO_ORIGINAL_RATIO_PROCESSOR,
-            BACKGROUND_BLUR_PROCESSOR, BACKGROUND_BLUR_WITH_WHITE_BORDER_PROCESSOR,
-            PURE_WHITE_MARGIN_PROCESSOR, ROUNDED_CORNER_PROCESSOR,
-            ROUNDED_CORNER_BLUR_PROCESSOR, ROUNDED_CORNER_BLUR_SHADOW_PROCESSOR,
-            config
-        )
-        from core.image_processor import CustomWatermarkProcessor
-        from core.configurable_watermark_processor import (
-            ConfigurableWatermarkProcessor,
-            create_dark_theme_processor,
-            create_light_theme_processor,
-            create_red_theme_processor,
-            create_blue_theme_processor
-        )
-        
-        # 创建映射字典
-        processor_map = {
-            'empty': EMPTY_PROCESSOR,
-            'shadow': SHADOW_PROCESSOR,
-            'margin': MARGIN_PROCESSOR,
-            'simple': SIMPLE_PROCESSOR,
-            'watermark': WATERMARK_PROCESSOR,
-            'watermark_left_logo': WATERMARK_LEFT_LOGO_PROCESSOR,
-            'watermark_right_logo': WATERMARK_RIGHT_LOGO_PROCESSOR,
-            'dark_watermark_left_logo': DARK_WATERMARK_LEFT_LOGO_PROCESSOR,
-            'dark_watermark_right_logo': DARK_WATERMARK_RIGHT_LOGO_PROCESSOR,
-            'square': SQUARE_PROCESSOR,
-            'padding_to_original_ratio': PADDING_TO_ORIGINAL_RATIO_PROCESSOR,
-            'background_blur': BACKGROUND_BLUR_PROCESSOR,
-            'background_blur_with_white_border': BACKGROUND_BLUR_WITH_WHITE_BORDER_PROCESSOR,
-            'pure_white_margin': PURE_WHITE_MARGIN_PROCESSOR,
-            'custom_watermark': CustomWatermarkProcessor(config),
-            'rounded_corner': ROUNDED_CORNER_PROCESSOR,
-            'rounded_corner_blur': ROUNDED_CORNER_BLUR_PROCESSOR,
-            'rounded_corner_blur_shadow': ROUNDED_CORNER_BLUR_SHADOW_PROCESSOR,
-            # 新的可配置水印处理器
-            'configurable_watermark': ConfigurableWatermarkProcessor(config),
-            'dark_theme_watermark': create_dark_theme_processor(config, 'left'),
-            'light_theme_watermark': create_light_theme_processor(config, 'left'),
-            'red_theme_watermark': create_red_theme_processor(config, 'left'),
-            'blue_theme_watermark': create_blue_theme_processor(config, 'left'),
-        }
-        
-        # 创建ProcessorChain
-        processor_chain = ProcessorChain()
-        
-        for processor_id in self.selected_processors:
-            if processor_id in processor_map:
-                processor_chain.add(processor_map[processor_id])
-            else:
-                print(f"警告: 未找到Processor: {processor_id}")
-        
-        return processor_chain
+        return get_registry().build_chain(self.selected_processors)
     
     def get_processor_summary(self):
         """获取Processor配置摘要"""
@@ -9,19 +9,19 @@ from PyQt5.QtWidgets import (
     QFileDialog, QMenu
 )
 from PyQt5.QtCore import Qt, pyqtSignal
-from core.init import LAYOUT_ITEMS, config
-from core.image_processor import ProcessorComponent, ProcessorChain
+from core.init import LAYOUT_ITEMS, config, get_registry
+from core.image_processor import ProcessorComponent
+from core.processor_store import config_from_dict
 from core.processor_types import (
     ProcessorConfig, CompositeProcessorConfig, generate_composite_processor_id
 )
 from core.configurable_processor import (
-    ConfigurableProcessor, ConfigurableCompositeProcessor,
     create_default_border_config, create_default_blur_config,
     create_default_transform_config, create_default_watermark_config
 )
 from gui.processor_creator_dialog import ProcessorCreatorDialog
+from gui.preview_widget import PreviewWidget
 import json
-from pathlib import Path
 from datetime import datetime
 
 
@@ -31,15 +31,17 @@ class ProcessorControlDialogEnhanced(QDialog):
     # 信号：当Processor顺序改变时发出
     processor_order_changed = pyqtSignal(list)
     
-    def __init__(self, parent=None, current_processors=None):
+    def __init__(self, parent=None, current_processors=None, preview_path=None):
         super().__init__(parent)
         self.config = config
+        self.preview_path = preview_path
         self.selected_processors = current_processors or []  # 存储选中的Processor对象
         self.custom_processors = []  # 存储自定义Processor配置
         self.setup_ui()
         self.load_default_processors()
         self.load_custom_processors()
         self.load_current_processors()
+        self.preview_widget.request_update()
         self.setWindowTitle("Processor控制")
         self.resize(1600, 1200)
         
@@ -134,6 +136,10 @@ class ProcessorControlDialogEnhanced(QDialog):
         
         right_layout.addWidget(selected_group)
         
+        # 预览当前Processor链的效果
+        self.preview_widget = PreviewWidget(self.build_preview_chain, self.preview_path, self)
+        right_layout.addWidget(self.preview_widget)
+        
         lists_layout.addWidget(left_widget, 2)
         lists_layout.addWidget(right_widget, 2)
         
@@ -238,31 +244,8 @@ class ProcessorControlDialogEnhanced(QDialog):
         self.custom_list.sortItems()
     
     def load_custom_configs(self):
-        """从文件加载自定义Processor配置"""
-        custom_configs = []
-        config_dir = Path("config/processors")
-        
-        if not config_dir.exists():
-            config_dir.mkdir(parents=True, exist_ok=True)
-            return custom_configs
-        
-        # 加载所有JSON文件
-        for config_file in config_dir.glob("*.json"):
-            try:
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config_data = json.load(f)
-                
-                # 检查是否为组合Processor
-                if "processor_ids" in config_data:
-                    processor_config = CompositeProcessorConfig.from_dict(config_data)
-                else:
-                    processor_config = ProcessorConfig.from_dict(config_data)
-                
-                custom_configs.append(processor_config)
-            except Exception as e:
-                print(f"加载配置文件 {config_file} 失败: {e}")
-        
-        return custom_configs
+        """读取自定义Processor配置，同时更新注册表中的自定义Processor"""
+        return get_registry().reload_custom()
     
     def load_current_processors(self):
         """加载当前已选的Processor"""
@@ -348,7 +331,7 @@ class ProcessorControlDialogEnhanced(QDialog):
         reply = QMessageBox.question(
             self, "确认删除",
             f"确定要删除选中的 {len(selected_items)} 个自定义Processor吗？\n"
-            "这将同时删除对应的配置文件。",
+            "这将同时删除对应的配置。",
             QMessageBox.Yes | QMessageBox.No,
             QMessageBox.No
         )
@@ -356,24 +339,16 @@ class ProcessorControlDialogEnhanced(QDialog):
         if reply != QMessageBox.Yes:
             return
         
-        deleted_count = 0
+        # 删除配置
+        processor_ids = [item.data(Qt.UserRole) for item in selected_items]
+        try:
+            deleted_count = get_registry().store.delete(processor_ids)
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"删除Processor配置失败: {str(e)}")
+            return
+        
+        # 从列表中移除
         for item in selected_items:
-            processor_id = item.data(Qt.UserRole)
-            processor_config = item.data(Qt.UserRole + 2)
-            
-            # 删除配置文件
-            config_dir = Path("config/processors")
-            config_file = config_dir / f"{processor_id}.json"
-            
-            if config_file.exists():
-                try:
-                    config_file.unlink()
-                    deleted_count += 1
-                    print(f"已删除配置文件: {config_file}")
-                except Exception as e:
-                    print(f"删除配置文件失败: {e}")
-            
-            # 从列表中移除
             row = self.custom_list.row(item)
             self.custom_list.takeItem(row)
         
@@ -393,7 +368,7 @@ class ProcessorControlDialogEnhanced(QDialog):
         reply = QMessageBox.question(
             self, "确认清空",
             f"确定要清空所有 {self.custom_list.count()} 个自定义Processor吗？\n"
-            "这将同时删除所有对应的配置文件。",
+            "这将同时删除所有对应的配置。",
             QMessageBox.Yes | QMessageBox.No,
             QMessageBox.No
         )
@@ -401,21 +376,13 @@ class ProcessorControlDialogEnhanced(QDialog):
         if reply != QMessageBox.Yes:
             return
         
-        # 删除所有配置文件
-        config_dir = Path("config/processors")
-        deleted_count = 0
-        
-        for i in range(self.custom_list.count()):
-            item = self.custom_list.item(i)
-            processor_id = item.data(Qt.UserRole)
-            
-            config_file = config_dir / f"{processor_id}.json"
-            if config_file.exists():
-                try:
-                    config_file.unlink()
-                    deleted_count += 1
-                except Exception as e:
-                    print(f"删除配置文件失败: {e}")
+        # 删除所有配置
+        try:
+            deleted_count = get_registry().store.clear()
+        except Exception as e:
+            QMessageBox.critical(self, "错误", f"清空Processor配置失败: {str(e)}")
+            return
+        get_registry().reload_custom()
         
         # 清空列表
         self.custom_list.clear()
@@ -443,10 +410,22 @@ class ProcessorControlDialogEnhanced(QDialog):
         print("当前Processor顺序:")
         for i, processor_id in enumerate(self.selected_processors):
             print(f"  {i + 1}. {processor_id}")
+        
+        self.preview_widget.request_update()
+    
+    def build_preview_chain(self):
+        """为预览创建ProcessorChain，未选择Processor时返回None"""
+        if not self.selected_processors:
+            return None
+        return self.get_processor_chain()
+    
+    def done(self, result):
+        self.preview_widget.shutdown()
+        super().done(result)
     
     def create_new_processor(self):
         """创建新的Processor"""
-        dialog = ProcessorCreatorDialog(self.config, self)
+        dialog = ProcessorCreatorDialog(self.config, self, preview_path=self.preview_path)
         dialog.processor_created.connect(self.on_processor_created)
         dialog.exec_()
     
@@ -574,13 +553,9 @@ class ProcessorControlDialogEnhanced(QDialog):
             
             # 如果是自定义Processor，获取配置对象
             if source_type == "custom":
-                for j in range(self.custom_list.count()):
-                    custom_item = self.custom_list.item(j)
-                    if custom_item.data(Qt.UserRole) == processor_id:
-                        processor_config = custom_item.data(Qt.UserRole + 2)
-                        if processor_config:
-                            processor_configs.append(processor_config.to_dict())
-                        break
+                processor_config = get_registry().store.get(processor_id)
+                if processor_config:
+                    processor_configs.append(processor_config.to_dict())
         
         # 构建导出数据
         export_data = {
@@ -625,21 +600,17 @@ class ProcessorControlDialogEnhanced(QDialog):
                 return
             
             # 导入Processor配置
-            imported_count = 0
+            processor_configs = []
             for config_dict in import_data.get("processor_configs", []):
                 try:
-                    # 检查是否为组合Processor
-                    if "processor_ids" in config_dict:
-                        processor_config = CompositeProcessorConfig.from_dict(config_dict)
-                    else:
-                        processor_config = ProcessorConfig.from_dict(config_dict)
-                    
-                    # 保存配置
-                    self.save_processor_config(processor_config)
-                    imported_count += 1
+                    processor_configs.append(config_from_dict(config_dict))
                 except Exception as e:
                     print(f"导入Processor配置失败: {e}")
             
+            # 在一个事务中保存
+            get_registry().store.save_many(processor_configs)
+            imported_count = len(processor_configs)
+            
             # 重新加载自定义Processor
             self.load_custom_processors()
             
@@ -650,91 +621,11 @@ class ProcessorControlDialogEnhanced(QDialog):
     
     def get_processor_chain(self):
         """根据当前选择创建ProcessorChain"""
-        from core.init import (
-            EMPTY_PROCESSOR, SHADOW_PROCESSOR, MARGIN_PROCESSOR, SIMPLE_PROCESSOR,
-            WATERMARK_PROCESSOR, WATERMARK_LEFT_LOGO_PROCESSOR, WATERMARK_RIGHT_LOGO_PROCESSOR,
-            DARK_WATERMARK_LEFT_LOGO_PROCESSOR, DARK_WATERMARK_RIGHT_LOGO_PROCESSOR,
-            SQUARE_PROCESSOR, PADDING_TO_ORIGINAL_RATIO_PROCESSOR,
-            BACKGROUND_BLUR_PROCESSOR, BACKGROUND_BLUR_WITH_WHITE_BORDER_PROCESSOR,
-            PURE_WHITE_MARGIN_PROCESSOR, ROUNDED_CORNER_PROCESSOR,
-            ROUNDED_CORNER_BLUR_PROCESSOR, ROUNDED_CORNER_BLUR_SHADOW_PROCESSOR,
-            config
-        )
-        from core.image_processor import CustomWatermarkProcessor
-        from core.configurable_watermark_processor import (
-            ConfigurableWatermarkProcessor,
-            create_dark_theme_processor,
-            create_light_theme_processor,
-            create_red_theme_processor,
-            create_blue_theme_processor
-        )
-        
-        # 创建映射字典
-        processor_map = {
-            'empty': EMPTY_PROCESSOR,
-            'shadow': SHADOW_PROCESSOR,
-            'margin': MARGIN_PROCESSOR,
-            'simple': SIMPLE_PROCESSOR,
-            'watermark': WATERMARK_PROCESSOR,
-            'watermark_left_logo': WATERMARK_LEFT_LOGO_PROCESSOR,
-            'watermark_right_logo': WATERMARK_RIGHT_LOGO_PROCESSOR,
-            'dark_watermark_left_logo': DARK_WATERMARK_LEFT_LOGO_PROCESSOR,
-            'dark_watermark_right_logo': DARK_WATERMARK_RIGHT_LOGO_PROCESSOR,
-            'square': SQUARE_PROCESSOR,
-            'padding_to_original_ratio': PADDING_TO_ORIGINAL_RATIO_PROCESSOR,
-            'background_blur': BACKGROUND_BLUR_PROCESSOR,
-            'background_blur_with_white_border': BACKGROUND_BLUR_WITH_WHITE_BORDER_PROCESSOR,
-            'pure_white_margin': PURE_WHITE_MARGIN_PROCESSOR,
-            'custom_watermark': CustomWatermarkProcessor(config),
-            'rounded_corner': ROUNDED_CORNER_PROCESSOR,
-            'rounded_corner_blur': ROUNDED_CORNER_BLUR_PROCESSOR,
-            'rounded_corner_blur_shadow': ROUNDED_CORNER_BLUR_SHADOW_PROCESSOR,
-            # 新的可配置水印处理器
-            'configurable_watermark': ConfigurableWatermarkProcessor(config),
-            'dark_theme_watermark': create_dark_theme_processor(config, 'left'),
-            'light_theme_watermark': create_light_theme_processor(config, 'left'),
-            'red_theme_watermark': create_red_theme_processor(config, 'left'),
-            'blue_theme_watermark': create_blue_theme_processor(config, 'left'),
-        }
-        
-        # 创建ProcessorChain
-        processor_chain = ProcessorChain()
-        
-        for processor_id in self.selected_processors:
-            if processor_id in processor_map:
-                processor_chain.add(processor_map[processor_id])
-            else:
-                # 尝试从自定义Processor创建
-                processor = self.create_processor_from_id(processor_id)
-                if processor:
-                    processor_chain.add(processor)
-                else:
-                    print(f"警告: 未找到Processor: {processor_id}")
-        
-        return processor_chain
+        return get_registry().build_chain(self.selected_processors)
     
     def create_processor_from_id(self, processor_id):
-        """根据ID创建Processor"""
-        # 在自定义列表中查找
-        for i in range(self.custom_list.count()):
-            item = self.custom_list.item(i)
-            if item.data(Qt.UserRole) == processor_id:
-                processor_config = item.data(Qt.UserRole + 2)
-                if processor_config:
-                    # 检查是否为组合Processor
-                    if isinstance(processor_config, CompositeProcessorConfig):
-                        # 创建组合Processor
-                        return ConfigurableCompositeProcessor(
-                            self.config,
-                            processor_config.processor_configs,
-                            processor_config.name,
-                            processor_config.id
-                        )
-                    else:
-                        # 创建单个Processor
-                        return ConfigurableProcessor(self.config, processor_config)
-        
-        return None
+        """根据ID获取Processor"""
+        return get_registry().get(processor_id)
     
     def get_processor_summary(self):
         """获取Processor配置摘要"""
@@ -770,16 +661,10 @@ class ProcessorControlDialogEnhanced(QDialog):
         return self.selected_processors.copy()
     
     def save_processor_config(self, processor_config: ProcessorConfig):
-        """保存Processor配置到文件"""
-        config_dir = Path("config/processors")
-        config_dir.mkdir(parents=True, exist_ok=True)
-        
-        config_file = config_dir / f"{processor_config.id}.json"
-        
+        """保存Processor配置"""
         try:
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(processor_config.to_dict(), f, indent=2, ensure_ascii=False)
-            print(f"Processor配置已保存到: {config_file}")
+            get_registry().store.save(processor_config)
+            print(f"Processor配置已保存: {processor_config.id}")
         except Exception as e:
             QMessageBox.critical(self, "错误", f"保存Processor配置失败: {str(e)}")
     
@@ -811,14 +696,9 @@ class ProcessorControlDialogEnhanced(QDialog):
             
             # 如果是自定义Processor，获取配置对象
             if source_type == "custom":
-                # 从自定义列表中查找配置
-                for j in range(self.custom_list.count()):
-                    custom_item = self.custom_list.item(j)
-                    if custom_item.data(Qt.UserRole) == processor_id:
-                        processor_config = custom_item.data(Qt.UserRole + 2)
-                        if processor_config:
-                            processor_configs.append(processor_config)
-                        break
+                processor_config = get_registry().store.get(processor_id)
+                if processor_config:
+                    processor_configs.append(processor_config)
         
         # 创建组合配置
         composite_id = generate_composite_processor_id()
@@ -830,14 +710,8 @@ class ProcessorControlDialogEnhanced(QDialog):
         )
         
         # 保存组合配置
-        config_dir = Path("config/processors")
-        config_dir.mkdir(parents=True, exist_ok=True)
-        
-        config_file = config_dir / f"{composite_id}.json"
-        
         try:
-            with open(config_file, 'w', encoding='utf-8') as f:
-                json.dump(composite_config.to_dict(), f, indent=2, ensure_ascii=False)
+            get_registry().store.save(composite_config)
             
             QMessageBox.information(self, "成功", f"组合Processor '{name}' 已保存")
             
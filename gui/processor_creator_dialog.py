@@ -17,7 +17,9 @@ from core.processor_types import (
     TransformParams, WatermarkParams, ProcessorConfig,
     generate_processor_id, get_default_processor_name
 )
+from core.configurable_processor import ConfigurableProcessor
 from config.image_config import Config
+from gui.preview_widget import PreviewWidget
 import json
 from datetime import datetime
 
@@ -28,17 +30,22 @@ class ProcessorCreatorDialog(QDialog):
     # 信号：当Processor创建完成时发出
     processor_created = pyqtSignal(ProcessorConfig)
     
-    def __init__(self, config: Config, parent=None):
+    def __init__(self, config: Config, parent=None, preview_path=None):
         super().__init__(parent)
         self.config = config
         self.current_category = ProcessorCategory.BORDER
+        self.preview_path = preview_path
         self.setup_ui()
         self.setWindowTitle("创建Processor")
-        self.resize(600, 500)
+        self.resize(1100, 500)
         
     def setup_ui(self):
         """设置UI界面"""
+        main_layout = QHBoxLayout()
         layout = QVBoxLayout()
+
+        # 预览面板（需在参数控件之前创建，参数控件会连接到预览刷新）
+        self.preview_widget = PreviewWidget(self.build_preview_processor, self.preview_path, self)
         
         # 标题
         title_label = QLabel("创建新的Processor")
@@ -75,6 +82,7 @@ class ProcessorCreatorDialog(QDialog):
         
         # 初始化参数配置
         self.init_border_params()
+        self.connect_preview_signals()
         
         # 按钮
         button_layout = QHBoxLayout()
@@ -89,7 +97,9 @@ class ProcessorCreatorDialog(QDialog):
         
         layout.addLayout(button_layout)
         
-        self.setLayout(layout)
+        main_layout.addLayout(layout, 1)
+        main_layout.addWidget(self.preview_widget, 1)
+        self.setLayout(main_layout)
         
         # 连接信号
         self.btn_create.clicked.connect(self.create_processor)
@@ -117,6 +127,27 @@ class ProcessorCreatorDialog(QDialog):
             except Exception as e:
                 print({e})
 
+        self.connect_preview_signals()
+
+    def connect_preview_signals(self):
+        """将参数控件的变化连接到预览刷新"""
+        for spin in self.params_widget.findChildren((QSpinBox, QDoubleSpinBox)):
+            spin.valueChanged.connect(self.preview_widget.request_update)
+        for combo in self.params_widget.findChildren(QComboBox):
+            combo.currentIndexChanged.connect(self.preview_widget.request_update)
+        for line_edit in self.params_widget.findChildren(QLineEdit):
+            line_edit.textChanged.connect(self.preview_widget.request_update)
+        for check in self.params_widget.findChildren(QCheckBox):
+            check.toggled.connect(self.preview_widget.request_update)
+        self.preview_widget.request_update()
+
+    def build_preview_processor(self):
+        """根据当前参数创建用于预览的Processor"""
+        return ConfigurableProcessor(self.config, self.build_processor_config())
+
+    def done(self, result):
+        self.preview_widget.shutdown()
+        super().done(result)
 
     
     def clear_params_layout(self):
@@ -763,83 +794,59 @@ class ProcessorCreatorDialog(QDialog):
             bold_font_rb=bold_font_rb
         )
     
+    def build_processor_config(self) -> ProcessorConfig:
+        """根据当前界面参数构建Processor配置"""
+        # 获取类别
+        category = self.current_category
+        
+        # 获取参数
+        if category == ProcessorCategory.BORDER:
+            params = self.get_border_params()
+        elif category == ProcessorCategory.BLUR:
+            params = self.get_blur_params()
+        elif category == ProcessorCategory.TRANSFORM:
+            params = self.get_transform_params()
+        elif category == ProcessorCategory.WATERMARK:
+            params = self.get_watermark_params()
+        else:
+            raise ValueError(f"未知的Processor类别: {category}")
+        
+        # 生成ID和名称
+        processor_id = generate_processor_id(category)
+        processor_name = self.name_edit.text().strip()
+        
+        if not processor_name:
+            processor_name = get_default_processor_name(category)
+        
+        # 创建Processor配置
+        return ProcessorConfig(
+            id=processor_id,
+            name=processor_name,
+            category=category,
+            params=params
+        )
+    
     def create_processor(self):
         """创建Processor"""
         try:
-            # 获取类别
-            category = self.current_category
-            
-            # 获取参数
-            if category == ProcessorCategory.BORDER:
-                params = self.get_border_params()
-            elif category == ProcessorCategory.BLUR:
-                params = self.get_blur_params()
-            elif category == ProcessorCategory.TRANSFORM:
-                params = self.get_transform_params()
-            elif category == ProcessorCategory.WATERMARK:
-                params = self.get_watermark_params()
-            else:
-                raise ValueError(f"未知的Processor类别: {category}")
-            
-            # 生成ID和名称
-            processor_id = generate_processor_id(category)
-            processor_name = self.name_edit.text().strip()
-            
-            if not processor_name:
-                processor_name = get_default_processor_name(category)
-            
-            # 创建Processor配置
-            processor_config = ProcessorConfig(
-                id=processor_id,
-                name=processor_name,
-                category=category,
-                params=params
-            )
-            
-            # 发出信号
-            self.processor_created.emit(processor_config)
-            
-            # 显示成功消息
-            QMessageBox.information(self, "成功", f"Processor '{processor_name}' 创建成功！")
-            
-            # 关闭对话框
-            self.accept()
-            
+            processor_config = self.build_processor_config()
         except Exception as e:
             QMessageBox.critical(self, "错误", f"创建Processor失败: {str(e)}")
+            return
+        
+        # 发出信号（接收方保存Processor），之后不再报告创建失败，避免重复创建
+        self.processor_created.emit(processor_config)
+        
+        # 显示成功消息
+        QMessageBox.information(self, "成功", f"Processor '{processor_config.name}' 创建成功！")
+        
+        # 关闭对话框
+        self.accept()
     
     def preview_json(self):
         """预览JSON配置"""
         try:
-            # 获取类别
-            category = self.current_category
-            
-            # 获取参数
-            if category == ProcessorCategory.BORDER:
-                params = self.get_border_params()
-            elif category == ProcessorCategory.BLUR:
-                params = self.get_blur_params()
-            elif category == ProcessorCategory.TRANSFORM:
-                params = self.get_transform_params()
-            elif category == ProcessorCategory.WATERMARK:
-                params = self.get_watermark_params()
-            else:
-                raise ValueError(f"未知的Processor类别: {category}")
-            
-            # 生成ID和名称
-            processor_id = generate_processor_id(category)
-            processor_name = self.name_edit.text().strip()
-            
-            if not processor_name:
-                processor_name = get_default_processor_name(category)
-            
-            # 创建Processor配置
-            processor_config = ProcessorConfig(
-                id=processor_id,
-                name=processor_name,
-                category=category,
-                params=params
-            )
+            processor_config = self.build_processor_config()
             
             # 显示JSON
             json_str = processor_config.to_json()
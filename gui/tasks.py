@@ -0,0 +1,195 @@
+"""
+后台任务
+耗时操作（加载图片、批量处理、创建视频）在独立的线程池中运行：
+进度、结果和错误通过信号交给GUI线程，取消通过 CancelToken 传递；
+每个运行中的任务在状态栏显示进度、处理速度和取消按钮，多个任务可以同时进行
+"""
+
+import time
+import traceback
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtWidgets import QHBoxLayout, QLabel, QProgressBar, QStatusBar, QToolButton, QWidget
+
+from core.cancellation import CancelToken, TaskCancelled
+
+# 同时运行的任务数量上限
+MAX_RUNNING_TASKS = 4
+
+
+@dataclass
+class TaskProgress:
+    """任务进度"""
+    done: int
+    total: int
+    message: str = ""
+
+    @property
+    def fraction(self) -> float:
+        return min(1.0, self.done / self.total) if self.total > 0 else 0.0
+
+
+class _TaskSignals(QObject):
+    progress = pyqtSignal(object)   # TaskProgress
+    result = pyqtSignal(object)     # 任务函数的返回值
+    error = pyqtSignal(str)         # 异常信息
+    finished = pyqtSignal(bool)     # 是否已取消，result / error 之后发出
+
+
+class TaskContext:
+    """传给任务函数的上下文，在工作线程中使用"""
+
+    def __init__(self, token: CancelToken, signals: _TaskSignals):
+        self.token = token
+        self._signals = signals
+
+    @property
+    def cancelled(self) -> bool:
+        return self.token.cancelled
+
+    def report(self, done: int, total: int, message: str = "") -> bool:
+        """报告进度，返回是否继续（未取消）"""
+        self._signals.progress.emit(TaskProgress(done, total, message))
+        return not self.token.cancelled
+
+
+class BackgroundTask(QRunnable):
+    """
+    后台任务
+    fn(context, *args, **kwargs) 在线程池中执行，返回值通过 result 信号发出；
+    fn 抛出 TaskCancelled 视为取消，其他异常通过 error 信号发出
+    """
+
+    def __init__(self, name: str, fn: Callable[..., Any], *args, unit: Optional[str] = "张", **kwargs):
+        """
+        :param name: 任务名称，显示在状态栏
+        :param unit: 进度单位，用于显示处理速度；为None时不显示速度
+        """
+        super().__init__()
+        self.name = name
+        self.unit = unit
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.token = CancelToken()
+        self.signals = _TaskSignals()
+
+    @property
+    def cancelled(self) -> bool:
+        return self.token.cancelled
+
+    def cancel(self):
+        """可以在任意线程中调用"""
+        self.token.cancel()
+
+    def run(self):
+        try:
+            result = self.fn(TaskContext(self.token, self.signals), *self.args, **self.kwargs)
+            self.signals.result.emit(result)
+        except TaskCancelled:
+            pass
+        except Exception as e:
+            traceback.print_exc()
+            self.signals.error.emit(str(e))
+        self.signals.finished.emit(self.token.cancelled)
+
+
+class _TaskStatusWidget(QWidget):
+    """状态栏中的任务进度：名称、进度、速度和取消按钮"""
+
+    def __init__(self, task: BackgroundTask, parent=None):
+        super().__init__(parent)
+        self.task = task
+        self._started = time.monotonic()
+
+        self.label = QLabel(f"{task.name}: 准备中")
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setRange(0, 0)
+        self.progress_bar.setMaximumWidth(160)
+        self.progress_bar.setMaximumHeight(16)
+        self.cancel_button = QToolButton()
+        self.cancel_button.setText("取消")
+        self.cancel_button.clicked.connect(self.on_cancel)
+
+        layout = QHBoxLayout()
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addWidget(self.label)
+        layout.addWidget(self.progress_bar)
+        layout.addWidget(self.cancel_button)
+        self.setLayout(layout)
+
+    def on_cancel(self):
+        self.task.cancel()
+        self.cancel_button.setEnabled(False)
+        self.label.setText(f"{self.task.name}: 正在取消...")
+
+    def update_progress(self, progress: TaskProgress):
+        if self.task.cancelled:
+            return
+        if progress.total > 0:
+            self.progress_bar.setRange(0, progress.total)
+            self.progress_bar.setValue(min(progress.done, progress.total))
+        text = f"{self.task.name}: {progress.done}/{progress.total}"
+        elapsed = time.monotonic() - self._started
+        if self.task.unit and elapsed > 0.5 and progress.done > 0:
+            text += f"（{progress.done / elapsed:.1f} {self.task.unit}/秒）"
+        if progress.message:
+            text += f" {progress.message}"
+        self.label.setText(text)
+
+
+class TaskManager(QObject):
+    """
+    运行后台任务，并在状态栏显示每个任务的进度
+    """
+
+    def __init__(self, status_bar: QStatusBar, parent=None):
+        super().__init__(parent)
+        self.status_bar = status_bar
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(MAX_RUNNING_TASKS)
+        self._tasks: List[BackgroundTask] = []
+
+    @property
+    def tasks(self) -> List[BackgroundTask]:
+        return list(self._tasks)
+
+    def start(self, task: BackgroundTask,
+              on_result: Optional[Callable[[Any], None]] = None,
+              on_error: Optional[Callable[[str], None]] = None,
+              on_finished: Optional[Callable[[bool], None]] = None) -> BackgroundTask:
+        """
+        启动任务，回调都在GUI线程中执行
+        :param on_result: 任务完成时调用（取消后任务函数正常返回时也会调用）
+        :param on_error: 任务出错时调用
+        :param on_finished: 任务结束时调用 (是否已取消)
+        """
+        widget = _TaskStatusWidget(task)
+        self.status_bar.addPermanentWidget(widget)
+        task.signals.progress.connect(widget.update_progress)
+        if on_result is not None:
+            task.signals.result.connect(on_result)
+        if on_error is not None:
+            task.signals.error.connect(on_error)
+        task.signals.finished.connect(lambda cancelled: self._on_finished(task, widget, cancelled, on_finished))
+
+        self._tasks.append(task)
+        self._pool.start(task)
+        return task
+
+    def _on_finished(self, task, widget, cancelled, on_finished):
+        self._tasks.remove(task)
+        self.status_bar.removeWidget(widget)
+        widget.deleteLater()
+        if cancelled:
+            self.status_bar.showMessage(f"{task.name}已取消", 3000)
+        if on_finished is not None:
+            on_finished(cancelled)
+
+    def cancel_all(self, wait_ms: int = -1) -> bool:
+        """取消所有任务并等待结束，返回是否全部结束"""
+        for task in self._tasks:
+            task.cancel()
+        return self._pool.waitForDone(wait_ms)
@@ -0,0 +1,107 @@
+"""
+缩略图提供者
+在后台线程池中生成缩略图，最近请求的（可见的）行优先，滚出可见区域的请求会被取消
+"""
+
+from collections import OrderedDict
+
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+from PyQt5.QtGui import QImage, QPixmap
+
+from core.thumbnail_cache import ThumbnailCache
+from gui.preview_widget import pil_to_qimage
+
+
+class _ThumbnailSignals(QObject):
+    finished = pyqtSignal(str, QImage)
+    failed = pyqtSignal(str)
+
+
+class _ThumbnailTask(QRunnable):
+    """单张缩略图生成任务"""
+
+    def __init__(self, cache, path):
+        super().__init__()
+        self.cache = cache
+        self.path = path
+        self.signals = _ThumbnailSignals()
+
+    def run(self):
+        try:
+            thumb = self.cache.get(self.path)
+            self.signals.finished.emit(self.path, pil_to_qimage(thumb))
+        except Exception as e:
+            print(f"生成缩略图失败: {self.path} - {e}")
+            self.signals.failed.emit(self.path)
+
+
+class ThumbnailProvider(QObject):
+    """
+    缩略图提供者
+    get() 立即返回内存中的缩略图，没有时提交后台任务并返回None，
+    生成完成后通过 thumbnail_ready 信号通知
+    """
+
+    thumbnail_ready = pyqtSignal(str)
+
+    def __init__(self, cache: ThumbnailCache = None, parent=None, memory_capacity=512):
+        super().__init__(parent)
+        self.cache = cache or ThumbnailCache()
+        self.memory_capacity = memory_capacity
+        self._pixmaps = OrderedDict()
+        self._pending = {}
+        self._failed = set()
+        # 请求序号作为优先级，越晚请求的越先执行（对应当前可见的行）
+        self._priority = 0
+
+        self._pool = QThreadPool(self)
+        self._pool.setMaxThreadCount(max(1, min(4, QThreadPool.globalInstance().maxThreadCount())))
+
+    def get(self, path) -> QPixmap:
+        path = str(path)
+        pixmap = self._pixmaps.get(path)
+        if pixmap is not None:
+            self._pixmaps.move_to_end(path)
+            return pixmap
+        if path not in self._pending and path not in self._failed:
+            self._request(path)
+        return None
+
+    def _request(self, path):
+        task = _ThumbnailTask(self.cache, path)
+        task.setAutoDelete(False)
+        task.signals.finished.connect(self._on_finished)
+        task.signals.failed.connect(self._on_failed)
+        self._pending[path] = task
+        self._priority += 1
+        self._pool.start(task, self._priority)
+
+    def cancel_except(self, paths) -> None:
+        """取消不在给定集合（当前可见行）中且尚未开始的请求"""
+        keep = {str(p) for p in paths}
+        for path, task in list(self._pending.items()):
+            if path not in keep and self._pool.tryTake(task):
+                del self._pending[path]
+
+    def _on_finished(self, path, qimage):
+        self._pending.pop(path, None)
+        self._pixmaps[path] = QPixmap.fromImage(qimage)
+        self._pixmaps.move_to_end(path)
+        while len(self._pixmaps) > self.memory_capacity:
+            self._pixmaps.popitem(last=False)
+        self.thumbnail_ready.emit(path)
+
+    def _on_failed(self, path):
+        self._pending.pop(path, None)
+        self._failed.add(path)
+
+    def clear(self) -> None:
+        """清空内存中的缩略图并取消所有未开始的请求"""
+        self._pool.clear()
+        self._pending.clear()
+        self._pixmaps.clear()
+        self._failed.clear()
+
+    def shutdown(self) -> None:
+        self._pool.clear()
+        self._pool.waitForDone()
@@ -13,7 +13,7 @@ from PyQt5.QtWidgets import (QDialog, QVBoxLayout, QHBoxLayout, QFormLayout,
                              QFileDialog, QMessageBox)
 from PyQt5.QtCore import Qt
 
-from core.video_creator import VideoSettings, PlaybackMode, get_available_music_files
+from core.video_creator import VideoSettings, PlaybackMode, RenderMode, get_available_music_files
 
 
 class VideoSettingsDialog(QDialog):
@@ -77,6 +77,11 @@ class VideoSettingsDialog(QDialog):
         self.sb_transition_duration.setDecimals(1)
         playback_layout.addRow("过渡时长:", self.sb_transition_duration)
         
+        self.cb_render_mode = QComboBox()
+        self.cb_render_mode.addItem("逐帧渲染（支持过渡）", RenderMode.FRAMES)
+        self.cb_render_mode.addItem("直接拼接（无过渡）", RenderMode.CONCAT)
+        playback_layout.addRow("渲染方式:", self.cb_render_mode)
+        
         self.cb_loop_images = QCheckBox("循环播放图片")
         playback_layout.addRow(self.cb_loop_images)
         
@@ -104,6 +109,12 @@ class VideoSettingsDialog(QDialog):
         self.le_bitrate.setPlaceholderText("例如: 10M, 5M, 2M")
         video_layout.addRow("码率:", self.le_bitrate)
         
+        self.sb_parallel_jobs = QSpinBox()
+        self.sb_parallel_jobs.setRange(0, 16)
+        self.sb_parallel_jobs.setSpecialValueText("自动")
+        self.sb_parallel_jobs.setToolTip("逐帧渲染时同时运行的ffmpeg进程数，图片较多时分段并行编码")
+        video_layout.addRow("并行编码:", self.sb_parallel_jobs)
+        
         video_group.setLayout(video_layout)
         layout.addWidget(video_group)
         
@@ -208,6 +219,7 @@ class VideoSettingsDialog(QDialog):
         
         self.sb_image_duration.setValue(self.settings.image_duration)
         self.sb_transition_duration.setValue(self.settings.transition_duration)
+        self.cb_render_mode.setCurrentIndex(self.cb_render_mode.findData(self.settings.render_mode))
         self.cb_loop_images.setChecked(self.settings.loop_images)
         
         # 视频编码
@@ -215,6 +227,7 @@ class VideoSettingsDialog(QDialog):
         self.cb_resolution.setCurrentText(self.settings.resolution)
         self.sb_fps.setValue(self.settings.fps)
         self.le_bitrate.setText(self.settings.bitrate)
+        self.sb_parallel_jobs.setValue(self.settings.parallel_jobs)
         
         # 音频设置
         self.cb_include_audio.setChecked(self.settings.include_audio)
@@ -260,7 +273,9 @@ class VideoSettingsDialog(QDialog):
             audio_volume=self.sb_audio_volume.value(),
             fade_in_duration=self.sb_fade_in.value(),
             fade_out_duration=self.sb_fade_out.value(),
-            image_path=image_path
+            image_path=image_path,
+            render_mode=self.cb_render_mode.currentData(),
+            parallel_jobs=self.sb_parallel_jobs.value()
         )
         
         return settings
@@ -286,6 +301,7 @@ if __name__ == "__main__":
         print(f"  播放模式: {settings.playback_mode}")
         print(f"  单图时长: {settings.image_duration}s")
         print(f"  过渡时长: {settings.transition_duration}s")
+        print(f"  渲染方式: {settings.render_mode}")
         print(f"  编码格式: {settings.codec}")
         print(f"  分辨率: {settings.resolution}")
         print(f"  帧率: {settings.fps}fps")
@@ -0,0 +1,47 @@
+"""
+后台创建视频
+作为 BackgroundTask 的任务函数在线程池中运行 VideoCreator，编码进度转换为任务进度；
+取消时结束ffmpeg进程
+"""
+
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from core.batch_processor import BatchOptions
+from core.image_processor import ProcessorComponent
+from core.video_creator import VideoCreator, VideoProgress
+from gui.tasks import TaskContext
+
+# 视频进度按千分比报告
+PROGRESS_STEPS = 1000
+
+
+@dataclass
+class VideoBatchJob:
+    """处理图片的同时创建视频时的处理参数"""
+    file_list: List[Path]
+    processor_chain: ProcessorComponent
+    options: BatchOptions
+
+
+def run_video_task(context: TaskContext, creator: VideoCreator, batch_job: Optional[VideoBatchJob] = None) -> bool:
+    """
+    创建视频：batch_job 为None时使用图片文件夹中的图片，否则边处理边编码
+    :return: 是否创建成功
+    """
+    context.token.on_cancel(creator.cancel)
+
+    def on_progress(progress: VideoProgress):
+        message = f"{progress.stage} {progress.out_time:.0f}s / {progress.total_time:.0f}s"
+        if progress.speed:
+            message += f"（{progress.speed:.2f}x）"
+        context.report(int(progress.fraction * PROGRESS_STEPS), PROGRESS_STEPS, message)
+
+    if batch_job is None:
+        return creator.create_video_from_output_folder(on_progress)
+    success, result = creator.create_video_from_batch(
+        batch_job.file_list, batch_job.processor_chain, batch_job.options, on_progress)
+    if result is not None and result.failed:
+        print(f"{len(result.failed)} 张图片处理失败，视频中使用黑色画面代替")
+    return success
@@ -0,0 +1,8 @@
+"""
+本地HTTP渲染服务，供其他工具按处理链获取处理后的图片，不依赖PyQt5：
+    python -m service --help
+接口说明见 service.server，调用方式见 service.client
+"""
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
@@ -0,0 +1,55 @@
+"""
+启动渲染服务：
+    python -m service --port 8765 --workers 4 --timeout 30
+Ctrl+C 或 SIGTERM 结束
+"""
+
+import argparse
+import asyncio
+import signal
+import sys
+from typing import List, Optional
+
+from service import DEFAULT_HOST, DEFAULT_PORT
+from service.server import DEFAULT_MAX_BODY, DEFAULT_MAX_QUEUE, DEFAULT_TIMEOUT, RenderService, ServiceOptions
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog='python -m service', description="本地HTTP渲染服务")
+    parser.add_argument('--host', default=DEFAULT_HOST, help="监听地址")
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help="监听端口，0 表示自动选择")
+    parser.add_argument('-j', '--workers', type=int, default=0, help="工作进程数，0 表示CPU核数")
+    parser.add_argument('--max-concurrency', type=int, default=0, help="同时处理的请求数，0 表示与工作进程数相同")
+    parser.add_argument('--max-queue', type=int, default=DEFAULT_MAX_QUEUE, help="最多等待的请求数，超过时返回429")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="每个请求的处理时限（秒）")
+    parser.add_argument('--max-mb', type=int, default=DEFAULT_MAX_BODY // (1024 * 1024), help="上传大小上限（MB）")
+    return parser
+
+
+async def serve(options: ServiceOptions):
+    service = RenderService(options)
+    await service.start()
+    loop = asyncio.get_running_loop()
+    stopped = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stopped.set)
+    print(f"渲染服务已启动: http://{options.host}:{service.port} (工作进程: {options.workers})", file=sys.stderr)
+    try:
+        await stopped.wait()
+    finally:
+        await service.stop()
+    print("渲染服务已停止", file=sys.stderr)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    args = build_parser().parse_args(argv)
+    options = ServiceOptions(host=args.host, port=args.port, workers=args.workers,
+                             max_concurrency=args.max_concurrency, max_queue=args.max_queue,
+                             timeout=args.timeout, max_body=args.max_mb * 1024 * 1024)
+    asyncio.run(serve(options))
+    return 0
+
+
+# 工作进程以 spawn 方式启动时会重新导入主模块，只在直接运行时执行
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,124 @@
+"""
+渲染服务的客户端（只使用标准库），供其他工具调用或测试服务：
+
+    client = ServiceClient('127.0.0.1', 8765)
+    result = client.render(Path('photo.jpg'), chain='watermark_left_logo', format='webp', quality=85)
+    Path('out.webp').write_bytes(result.data)
+"""
+
+import http.client
+import json
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Union
+from urllib.parse import urlencode
+
+from service import DEFAULT_HOST, DEFAULT_PORT
+
+
+class ServiceError(Exception):
+    """服务返回了错误状态"""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(f"{status}: {message}")
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+@dataclass
+class RenderResponse:
+    data: bytes
+    content_type: str
+    headers: Dict[str, str]  # 名称为小写
+
+    @property
+    def width(self) -> int:
+        return int(self.headers['x-image-width'])
+
+    @property
+    def height(self) -> int:
+        return int(self.headers['x-image-height'])
+
+
+class ServiceClient:
+    def __init__(self, host: str = DEFAULT_HOST, port: int = DEFAULT_PORT, timeout: float = 60.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._connection: Optional[http.client.HTTPConnection] = None
+
+    def _request(self, method: str, path: str, body: Optional[bytes] = None,
+                 headers: Optional[Dict[str, str]] = None) -> http.client.HTTPResponse:
+        for retry in (False, True):
+            if self._connection is None:
+                self._connection = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._connection.request(method, path, body=body, headers=headers or {})
+                return self._connection.getresponse()
+            except (ConnectionError, http.client.RemoteDisconnected):
+                # 保持的连接已被服务端关闭（如空闲超时），重新连接一次
+                self.close()
+                if retry:
+                    raise
+
+    def _read(self, response: http.client.HTTPResponse) -> bytes:
+        data = response.read()
+        headers = {name.lower(): value for name, value in response.getheaders()}
+        if headers.get('connection', '').lower() == 'close':
+            self.close()
+        if response.status != 200:
+            try:
+                message = json.loads(data)['error']
+            except (ValueError, KeyError, TypeError):
+                message = data.decode('utf-8', 'replace')
+            raise ServiceError(response.status, message, headers)
+        return data
+
+    def _get_json(self, path: str) -> dict:
+        return json.loads(self._read(self._request('GET', path)))
+
+    def health(self) -> dict:
+        return self._get_json('/health')
+
+    def metrics(self) -> dict:
+        return self._get_json('/metrics')
+
+    def processors(self) -> dict:
+        return self._get_json('/processors')
+
+    def render(self, image: Union[bytes, Path], chain: Union[str, list, dict] = 'empty',
+               filename: Optional[str] = None, **options) -> RenderResponse:
+        """
+        处理一张图片
+        :param image: 图片文件内容或路径
+        :param chain: 逗号分隔的Processor ID，或JSON格式的处理链（列表或字典）
+        :param filename: 图片文件名（用于水印中的文件名），image 为路径时默认使用其文件名
+        :param options: 其他参数：format、quality、encoder_profile、max_kb、allow_scale、strip_gps
+        :raise ServiceError: 服务返回错误
+        """
+        if isinstance(image, Path):
+            filename = filename or image.name
+            image = image.read_bytes()
+        params = {'chain': chain if isinstance(chain, str) else json.dumps(chain, ensure_ascii=False)}
+        if filename:
+            params['filename'] = filename
+        for name, value in options.items():
+            if value is not None:
+                params[name] = str(int(value)) if isinstance(value, bool) else str(value)
+        response = self._request('POST', f"/render?{urlencode(params)}", body=image,
+                                 headers={'Content-Type': 'application/octet-stream'})
+        data = self._read(response)
+        return RenderResponse(data, response.getheader('Content-Type', ''),
+                              {name.lower(): value for name, value in response.getheaders()})
+
+    def close(self):
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,110 @@
+"""
+渲染服务的工作进程：按处理链处理上传的图片，编码后返回文件内容
+在进程池中运行，参数和返回值都可以在进程间传递
+"""
+
+import io
+import json
+import signal
+import sys
+import time
+from collections import OrderedDict
+from contextlib import closing, redirect_stdout
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import List, Optional
+
+from cli.batch import ChainStep, build_chain
+from core.batch_processor import BatchOptions
+from core.encoder_profiles import LOSSY_FORMATS, format_for_path
+from core.image_container import ImageContainer
+from core.image_processor import ProcessorChain
+from core.ingest import SourceFile
+from core.init import get_config
+
+# 每个工作进程缓存的处理链数量
+CHAIN_CACHE_SIZE = 32
+
+_chains: 'OrderedDict[str, ProcessorChain]' = OrderedDict()
+
+
+class RenderTimeout(Exception):
+    """处理超过了请求的截止时间"""
+
+
+@dataclass
+class RenderResult:
+    data: bytes
+    image_format: str
+    width: int
+    height: int
+    quality: Optional[int]  # 无损格式为None
+    elapsed: float  # 工作进程中处理和编码的耗时（秒）
+
+
+def init_worker():
+    # 由服务进程处理 Ctrl+C，工作进程提前加载配置和Processor模块
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    get_config()
+
+
+def warm_up() -> int:
+    """在工作进程中执行一次空任务，启动时提前创建进程"""
+    return 0
+
+
+def _get_chain(steps: List[ChainStep]) -> ProcessorChain:
+    key = json.dumps([asdict(step) for step in steps], sort_keys=True, ensure_ascii=False)
+    chain = _chains.get(key)
+    if chain is None:
+        chain = build_chain(steps)
+        _chains[key] = chain
+        if len(_chains) > CHAIN_CACHE_SIZE:
+            _chains.popitem(last=False)
+    else:
+        _chains.move_to_end(key)
+    return chain
+
+
+def _check_deadline(deadline: Optional[float]):
+    if deadline is not None and time.time() > deadline:
+        raise RenderTimeout("处理超时")
+
+
+def render(image_data: bytes, filename: str, steps: List[ChainStep], options: BatchOptions,
+           deadline: Optional[float] = None) -> RenderResult:
+    """
+    处理一张图片
+    :param image_data: 上传的图片文件内容
+    :param filename: 上传的文件名，用于水印中的文件名
+    :param steps: 处理链
+    :param options: 输出格式、质量、文件大小上限等设置（output_dir 不使用）
+    :param deadline: 截止时间（time.time()），每个Processor开始前检查，超过时抛出 RenderTimeout；
+                     正在运行的Processor不会被中断
+    :raise RenderTimeout: 超过截止时间
+    """
+    _check_deadline(deadline)
+    started = time.perf_counter()
+    image_format = format_for_path(Path(f"output.{options.format}"))
+    chain = _get_chain(steps)
+    source = SourceFile(Path(filename), image_data)
+    with redirect_stdout(sys.stderr), closing(ImageContainer(source.path, source=source)) as container:
+        container.is_use_equivalent_focal_length(options.use_equivalent_focal_length)
+        for component in chain.components:
+            _check_deadline(deadline)
+            component.process(container)
+        _check_deadline(deadline)
+        buffer = io.BytesIO()
+        size_target = container.write_to(buffer, image_format, quality=options.quality,
+                                         profile=options.encoder_profile, max_bytes=options.max_bytes,
+                                         allow_scale=options.allow_scale, strip_gps=options.strip_gps)
+        image = container.get_output_image()
+        width, height = image.size
+        if size_target is not None:
+            width, height = round(width * size_target.scale), round(height * size_target.scale)
+    if size_target is not None:
+        quality = size_target.quality
+    else:
+        quality = options.quality if image_format in LOSSY_FORMATS else None
+    return RenderResult(data=buffer.getvalue(), image_format=image_format, width=width, height=height,
+                        quality=quality, elapsed=time.perf_counter() - started)
@@ -0,0 +1,487 @@
+"""
+本地HTTP渲染服务：上传图片和处理链，返回处理后的图片
+只使用标准库（asyncio），处理在进程池中进行；接口：
+
+    GET  /health        服务状态，工作进程不可用时返回503
+    GET  /metrics       请求计数和处理耗时（JSON）
+    GET  /processors    可用的Processor ID
+    POST /render        处理图片，返回编码后的图片
+
+POST /render 的请求体可以是图片文件本身，参数放在查询字符串中；也可以是 multipart/form-data，
+图片放在 image 字段，参数作为其他字段。参数：
+    chain           处理链：逗号分隔的Processor ID，或JSON（ID和配置组成的列表、单个配置、对话框导出的数据）
+    format          输出格式 jpg/png/webp/tiff，默认使用 config.yaml 中的输出设置
+    quality         有损格式的质量 1-100
+    encoder_profile 编码配置 fast/balanced/smallest/quality
+    max_kb          文件大小上限（KB）
+    allow_scale     限制文件大小时允许缩小尺寸（1/true）
+    strip_gps       移除GPS位置信息（1/true）
+    filename        图片文件名（用于水印中的文件名），multipart 上传时默认使用上传的文件名
+"""
+
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from email.policy import HTTP
+from http import HTTPStatus
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, quote, urlsplit
+
+from PIL import Image, UnidentifiedImageError
+
+from cli.batch import resolve_chain_data
+from core.batch_processor import BatchOptions
+from core.encoder_profiles import EncoderProfile, format_for_path
+from core.init import get_config, get_registry
+from service import DEFAULT_HOST, DEFAULT_PORT
+from service.render import RenderResult, RenderTimeout, init_worker, render, warm_up
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TIMEOUT = 30.0            # 每个请求的处理时限（秒），包括排队时间
+DEFAULT_MAX_QUEUE = 16            # 所有工作进程都忙时最多等待的请求数，超过时返回429
+DEFAULT_MAX_BODY = 64 * 1024 * 1024
+# 保持连接时等待下一个请求的时间（秒）
+KEEP_ALIVE_TIMEOUT = 15.0
+# 返回图片时每次写入的大小
+CHUNK_SIZE = 64 * 1024
+# 计算耗时分位数时保留的最近请求数
+LATENCY_WINDOW = 1000
+
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus, message: str = '', headers: Optional[Dict[str, str]] = None):
+        super().__init__(message or status.phrase)
+        self.status = status
+        self.message = message or status.phrase
+        self.headers = headers or {}
+
+
+@dataclass
+class Request:
+    method: str
+    path: str
+    query: Dict[str, str]
+    headers: Dict[str, str]  # 名称为小写
+    body: bytes = b''
+    keep_alive: bool = True
+
+
+@dataclass
+class ServiceOptions:
+    host: str = DEFAULT_HOST
+    port: int = DEFAULT_PORT  # 0 表示自动选择空闲端口
+    workers: int = 0          # 工作进程数，0 表示CPU核数
+    max_concurrency: int = 0  # 同时处理的请求数，0 表示与工作进程数相同
+    max_queue: int = DEFAULT_MAX_QUEUE
+    timeout: float = DEFAULT_TIMEOUT
+    max_body: int = DEFAULT_MAX_BODY
+
+    def __post_init__(self):
+        self.workers = self.workers if self.workers > 0 else (os.cpu_count() or 1)
+        self.max_concurrency = self.max_concurrency if self.max_concurrency > 0 else self.workers
+
+
+@dataclass
+class Metrics:
+    """请求计数和处理耗时"""
+    started_at: float = field(default_factory=time.time)
+    requests: int = 0
+    statuses: Counter = field(default_factory=Counter)
+    rendered: int = 0
+    rejected: int = 0   # 队列已满
+    timeouts: int = 0
+    failed: int = 0
+    in_flight: int = 0  # 正在工作进程中处理
+    queued: int = 0     # 等待空闲的工作进程
+    bytes_in: int = 0
+    bytes_out: int = 0
+    latencies: deque = field(default_factory=lambda: deque(maxlen=LATENCY_WINDOW))
+
+    def to_dict(self) -> dict:
+        latencies = sorted(self.latencies)
+
+        def percentile(p: float) -> Optional[float]:
+            if not latencies:
+                return None
+            return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))], 4)
+
+        return {
+            'uptime_seconds': round(time.time() - self.started_at, 1),
+            'requests': self.requests,
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+            'rendered': self.rendered,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'failed': self.failed,
+            'in_flight': self.in_flight,
+            'queued': self.queued,
+            'bytes_in': self.bytes_in,
+            'bytes_out': self.bytes_out,
+            'render_seconds': {'count': len(latencies), 'p50': percentile(0.5), 'p95': percentile(0.95),
+                               'max': round(latencies[-1], 4) if latencies else None},
+        }
+
+
+def _parse_bool(value: Optional[str]) -> bool:
+    return value is not None and value.strip().lower() in ('1', 'true', 'yes', 'on')
+
+
+def parse_multipart(content_type: str, body: bytes) -> Tuple[Dict[str, str], Optional[Tuple[str, bytes]]]:
+    """
+    解析 multipart/form-data
+    :return: (文本字段, (上传的文件名, 图片内容))，没有 image 字段时后者为None
+    """
+    message = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {content_type}\r\n\r\n".encode('latin-1') + body)
+    if not message.is_multipart():
+        raise HttpError(HTTPStatus.BAD_REQUEST, "无法解析 multipart/form-data")
+    fields, image = {}, None
+    for part in message.iter_parts():
+        name = part.get_param('name', header='content-disposition')
+        payload = part.get_payload(decode=True) or b''
+        if name == 'image':
+            image = (part.get_filename() or 'upload.jpg', payload)
+        elif name:
+            fields[name] = payload.decode(part.get_content_charset() or 'utf-8')
+    return fields, image
+
+
+def parse_chain(text: Optional[str]):
+    """解析 chain 参数，返回 ChainStep 列表"""
+    text = (text or '').strip() or 'empty'
+    try:
+        if text[0] in '[{':
+            data = json.loads(text)
+        else:
+            data = [part.strip() for part in text.split(',') if part.strip()]
+        return resolve_chain_data(data)
+    except ValueError as e:
+        # json.JSONDecodeError 也是 ValueError
+        raise HttpError(HTTPStatus.BAD_REQUEST, str(e)) from e
+
+
+def parse_render_options(params: Dict[str, str]) -> BatchOptions:
+    """按请求参数覆盖 config.yaml 中的输出设置"""
+    config = get_config()
+    settings = dict(config.get_output_settings())
+    try:
+        if params.get('format'):
+            settings['format'] = params['format'].lower().lstrip('.')
+        if params.get('quality'):
+            quality = int(params['quality'])
+            if not 1 <= quality <= 100:
+                raise ValueError("quality 应在 1-100 之间")
+            settings['quality'] = quality
+        if params.get('encoder_profile'):
+            settings['encoder_profile'] = EncoderProfile(params['encoder_profile']).value
+        if params.get('max_kb'):
+            max_kb = int(params['max_kb'])
+            if max_kb <= 0:
+                raise ValueError("max_kb 应大于0")
+            settings.update(size_mode='max_bytes', max_kb=max_kb)
+        else:
+            # 服务默认不限制文件大小，与图形界面中的设置无关
+            settings['size_mode'] = None
+    except ValueError as e:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"参数无效: {e}") from e
+    if 'allow_scale' in params:
+        settings['allow_scale'] = _parse_bool(params['allow_scale'])
+    if 'strip_gps' in params:
+        settings['strip_gps'] = _parse_bool(params['strip_gps'])
+    options = BatchOptions.from_output_settings(settings, output_dir=Path('.'),
+                                                use_equivalent_focal_length=config.use_equivalent_focal_length())
+    if format_for_path(Path(f"output.{options.format}")) is None:
+        raise HttpError(HTTPStatus.BAD_REQUEST, f"不支持的输出格式: {options.format}")
+    return options
+
+
+class RenderService:
+    """
+    渲染服务
+    用法：
+        service = RenderService(ServiceOptions(port=0))
+        await service.start()
+        ...  # service.port 为实际监听的端口
+        await service.stop()
+    """
+
+    def __init__(self, options: Optional[ServiceOptions] = None):
+        self.options = options or ServiceOptions()
+        self.metrics = Metrics()
+        self.port: Optional[int] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._connections = set()
+
+    # ---- 生命周期 ----
+
+    def _create_pool(self) -> ProcessPoolExecutor:
+        # 服务进程中有事件循环和线程，用 spawn 启动工作进程，不复制这些状态
+        return ProcessPoolExecutor(max_workers=self.options.workers, initializer=init_worker,
+                                   mp_context=multiprocessing.get_context('spawn'))
+
+    async def _warm_up(self):
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(self._pool, warm_up) for _ in range(self.options.workers)))
+
+    async def start(self):
+        self._slots = asyncio.Semaphore(self.options.max_concurrency)
+        self._pool = self._create_pool()
+        await self._warm_up()
+        self._server = await asyncio.start_server(self._handle_connection, self.options.host, self.options.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self):
+        await self._server.serve_forever()
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            for writer in list(self._connections):
+                writer.close()
+            await self._server.wait_closed()
+            self._server = None
+        if self._pool is not None:
+            pool, self._pool = self._pool, None
+            await asyncio.get_running_loop().run_in_executor(None, lambda: pool.shutdown(cancel_futures=True))
+
+    @property
+    def healthy(self) -> bool:
+        return self._pool is not None and not getattr(self._pool, '_broken', False)
+
+    # ---- HTTP ----
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self._connections.add(writer)
+        try:
+            while True:
+                try:
+                    request = await self._read_request(reader, writer)
+                except HttpError as e:
+                    # 请求不完整时无法继续读取同一连接
+                    await self._send_error(writer, e, keep_alive=False)
+                    break
+                if request is None:
+                    break
+                self.metrics.requests += 1
+                self.metrics.bytes_in += len(request.body)
+                try:
+                    await self._dispatch(request, writer)
+                except HttpError as e:
+                    await self._send_error(writer, e, request.keep_alive)
+                except Exception as e:
+                    logger.exception(f'Error: {e}')
+                    await self._send_error(writer, HttpError(HTTPStatus.INTERNAL_SERVER_ERROR, str(e)),
+                                           request.keep_alive)
+                if not request.keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._connections.discard(writer)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> Optional[Request]:
+        """读取一个请求，连接关闭或空闲超时时返回None"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEP_ALIVE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            return None
+        except asyncio.LimitOverrunError:
+            raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, target, version = lines[0].split(' ')
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "无法解析请求行")
+        headers = {}
+        for line in filter(None, lines[1:]):
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+        connection = headers.get('connection', '').lower()
+        keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+        url = urlsplit(target)
+        request = Request(method.upper(), url.path, dict(parse_qsl(url.query)), headers, keep_alive=keep_alive)
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HttpError(HTTPStatus.LENGTH_REQUIRED, "不支持分块上传，需要 Content-Length")
+        if 'content-length' not in headers:
+            if request.method == 'POST':
+                raise HttpError(HTTPStatus.LENGTH_REQUIRED)
+            return request
+        try:
+            length = int(headers['content-length'])
+        except ValueError:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Content-Length 无效")
+        if length > self.options.max_body:
+            raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE,
+                            f"请求体超过 {self.options.max_body // (1024 * 1024)} MB")
+        if headers.get('expect', '').lower() == '100-continue':
+            writer.write(b'HTTP/1.1 100 Continue\r\n\r\n')
+            await writer.drain()
+        request.body = await reader.readexactly(length)
+        return request
+
+    async def _send(self, writer: asyncio.StreamWriter, status: HTTPStatus, body: bytes, content_type: str,
+                    keep_alive: bool = True, headers: Optional[Dict[str, str]] = None):
+        self.metrics.statuses[status.value] += 1
+        self.metrics.bytes_out += len(body)
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}",
+                 f"Content-Type: {content_type}",
+                 f"Content-Length: {len(body)}",
+                 f"Connection: {'keep-alive' if keep_alive else 'close'}"]
+        lines.extend(f"{name}: {value}" for name, value in (headers or {}).items())
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        # 分块写入，客户端接收较慢时等待，不在内存中堆积
+        for offset in range(0, len(body), CHUNK_SIZE):
+            writer.write(body[offset:offset + CHUNK_SIZE])
+            await writer.drain()
+        await writer.drain()
+
+    async def _send_json(self, writer: asyncio.StreamWriter, data, status: HTTPStatus = HTTPStatus.OK,
+                         keep_alive: bool = True, headers: Optional[Dict[str, str]] = None):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        await self._send(writer, status, body, 'application/json; charset=utf-8', keep_alive, headers)
+
+    async def _send_error(self, writer: asyncio.StreamWriter, error: HttpError, keep_alive: bool):
+        await self._send_json(writer, {'error': error.message, 'status': error.status.value}, error.status,
+                              keep_alive, error.headers)
+
+    async def _dispatch(self, request: Request, writer: asyncio.StreamWriter):
+        routes = {
+            ('GET', '/health'): self._health,
+            ('GET', '/metrics'): self._metrics,
+            ('GET', '/processors'): self._processors,
+            ('POST', '/render'): self._render,
+        }
+        handler = routes.get((request.method, request.path))
+        if handler is None:
+            if any(path == request.path for _, path in routes):
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED)
+            raise HttpError(HTTPStatus.NOT_FOUND)
+        await handler(request, writer)
+
+    # ---- 接口 ----
+
+    async def _health(self, request: Request, writer: asyncio.StreamWriter):
+        status = HTTPStatus.OK if self.healthy else HTTPStatus.SERVICE_UNAVAILABLE
+        await self._send_json(writer, {
+            'status': 'ok' if self.healthy else 'unavailable',
+            'workers': self.options.workers,
+            'in_flight': self.metrics.in_flight,
+            'queued': self.metrics.queued,
+        }, status, request.keep_alive)
+
+    async def _metrics(self, request: Request, writer: asyncio.StreamWriter):
+        await self._send_json(writer, self.metrics.to_dict(), keep_alive=request.keep_alive)
+
+    async def _processors(self, request: Request, writer: asyncio.StreamWriter):
+        registry = get_registry()
+        custom = [{'id': c.id, 'name': c.name} for c in registry.custom_configs()]
+        registry.store.close()
+        await self._send_json(writer, {'builtin': registry.builtin_ids(), 'custom': custom},
+                              keep_alive=request.keep_alive)
+
+    async def _render(self, request: Request, writer: asyncio.StreamWriter):
+        deadline = time.time() + self.options.timeout
+        params = dict(request.query)
+        content_type = request.headers.get('content-type', '')
+        if content_type.lower().startswith('multipart/form-data'):
+            fields, image = parse_multipart(content_type, request.body)
+            params.update(fields)
+            if image is None:
+                raise HttpError(HTTPStatus.BAD_REQUEST, "缺少 image 字段")
+            filename, image_data = image
+        else:
+            filename, image_data = 'upload.jpg', request.body
+        if not image_data:
+            raise HttpError(HTTPStatus.BAD_REQUEST, "没有上传图片")
+        filename = Path(params.get('filename') or filename).name
+        steps = parse_chain(params.get('chain'))
+        options = parse_render_options(params)
+
+        result = await self._submit(image_data, filename, steps, options, deadline)
+        self.metrics.rendered += 1
+        self.metrics.latencies.append(result.elapsed)
+        output_name = f"{Path(filename).stem}.{options.format}"
+        headers = {
+            # 文件名可能包含中文，按 RFC 5987 编码，同时提供ASCII文件名
+            'Content-Disposition': f"inline; filename=\"render.{options.format}\"; "
+                                   f"filename*=UTF-8''{quote(output_name)}",
+            'X-Image-Width': str(result.width),
+            'X-Image-Height': str(result.height),
+            'X-Render-Seconds': f"{result.elapsed:.4f}",
+        }
+        if result.quality is not None:
+            headers['X-Quality'] = str(result.quality)
+        await self._send(writer, HTTPStatus.OK, result.data,
+                         Image.MIME.get(result.image_format, 'application/octet-stream'),
+                         request.keep_alive, headers)
+
+    async def _submit(self, image_data: bytes, filename: str, steps, options: BatchOptions,
+                      deadline: float) -> RenderResult:
+        if self._slots.locked() and self.metrics.queued >= self.options.max_queue:
+            self.metrics.rejected += 1
+            raise HttpError(HTTPStatus.TOO_MANY_REQUESTS, "服务繁忙，请稍后重试",
+                            {'Retry-After': str(max(1, round(self.options.timeout / 10)))})
+        if not self.healthy:
+            raise HttpError(HTTPStatus.SERVICE_UNAVAILABLE, "工作进程不可用")
+
+        self.metrics.queued += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), max(0.0, deadline - time.time()))
+        except asyncio.TimeoutError:
+            self.metrics.timeouts += 1
+            raise HttpError(HTTPStatus.GATEWAY_TIMEOUT, "等待处理超时")
+        finally:
+            self.metrics.queued -= 1
+
+        loop = asyncio.get_running_loop()
+        pool = self._pool
+        try:
+            future = loop.run_in_executor(pool, render, image_data, filename, steps, options, deadline)
+        except BaseException:
+            self._slots.release()
+            raise
+        # 超时后工作进程仍在处理，处理结束才释放名额，避免进程池中堆积任务
+        self.metrics.in_flight += 1
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), max(0.0, deadline - time.time()))
+        except (asyncio.TimeoutError, RenderTimeout):
+            self.metrics.timeouts += 1
+            raise HttpError(HTTPStatus.GATEWAY_TIMEOUT, f"处理超过 {self.options.timeout:g} 秒")
+        except UnidentifiedImageError:
+            self.metrics.failed += 1
+            raise HttpError(HTTPStatus.UNPROCESSABLE_ENTITY, f"无法识别图片格式: {filename}")
+        except Image.DecompressionBombError as e:
+            self.metrics.failed += 1
+            raise HttpError(HTTPStatus.UNPROCESSABLE_ENTITY, str(e))
+        except BrokenProcessPool:
+            self.metrics.failed += 1
+            # 工作进程异常退出，重新创建进程池（同时失败的其他请求不再重复创建）
+            if self._pool is pool:
+                pool.shutdown(wait=False)
+                self._pool = self._create_pool()
+            raise HttpError(HTTPStatus.SERVICE_UNAVAILABLE, "工作进程异常退出")
+        except Exception:
+            self.metrics.failed += 1
+            raise
+
+    def _release(self, future: asyncio.Future):
+        self.metrics.in_flight -= 1
+        self._slots.release()
+        if not future.cancelled():
+            # 超时的请求不再等待结果，在这里取出异常，避免事件循环记录未处理的异常
+            future.exception()
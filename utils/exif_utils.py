@@ -31,15 +31,19 @@ def get_file_list(path):
             if file_path.is_file() and file_path.suffix in ['.jpg', '.jpeg', '.JPG', '.JPEG', '.png', '.PNG']]
 
 
-def get_exif(path) -> dict:
+def get_exif(path, data: bytes = None) -> dict:
     """
     获取exif信息
     :param path: 照片路径
+    :param data: 已读入内存的文件内容，指定时通过标准输入传给 exiftool，不再读取文件
     :return: exif信息
     """
     exif_dict = {}
     try:
-        output_bytes = subprocess.check_output([EXIFTOOL_PATH, '-d', '%Y-%m-%d %H:%M:%S%3f%z', path])
+        if data is None:
+            output_bytes = subprocess.check_output([EXIFTOOL_PATH, '-d', '%Y-%m-%d %H:%M:%S%3f%z', path])
+        else:
+            output_bytes = subprocess.check_output([EXIFTOOL_PATH, '-d', '%Y-%m-%d %H:%M:%S%3f%z', '-'], input=data)
         output = output_bytes.decode('utf-8', errors='ignore')
 
         lines = output.splitlines()
@@ -68,19 +72,6 @@ def get_exif(path) -> dict:
     return exif_dict
 
 
-def insert_exif(source_path, target_path) -> None:
-    """
-    复制照片的 exif 信息
-    :param source_path: 源照片路径
-    :param target_path: 目的照片路径
-    """
-    try:
-        # 将 exif 信息转换为字节串
-        subprocess.check_output([EXIFTOOL_PATH, '-tagsfromfile', source_path, '-overwrite_original', target_path])
-    except ValueError as e:
-        logger.exception(f'ValueError: {source_path}: cannot insert exif {str(e)}')
-
-
 def calculate_pixel_count(width: int, height: int) -> str:
     # 计算像素总数
     pixel_count = width * height